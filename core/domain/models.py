@@ -38,6 +38,13 @@ class Book:
     created: datetime = field(default_factory=datetime.now)
     modified: datetime = field(default_factory=datetime.now)
 
+    def __post_init__(self):
+        """
+        Post-initialization method to validate book creation logic.
+        """
+        if not self.title or not self.publisher or not self.category:
+            raise ValueError("Book must have a valid title, publisher, and category")
+
     def lend_out(self):
         """
         Mark the book as lent out.
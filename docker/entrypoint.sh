@@ -42,9 +42,19 @@ fi
 #    fi
 #done
 
+# Uvicorn workers serve the ASGI application, so the async views run on an event loop;
+# the default sync workers serve the WSGI application
+GUNICORN_WORKER_CLASS="${GUNICORN_WORKER_CLASS:-sync}"
+if [[ "${GUNICORN_WORKER_CLASS}" == uvicorn* ]]; then
+    GUNICORN_APP="library_managemet.asgi:application"
+else
+    GUNICORN_APP="library_managemet.wsgi:application"
+fi
+
 # Start Gunicorn server
-echo "Starting Gunicorn server..."
-gunicorn library_managemet.wsgi:application \
+echo "Starting Gunicorn server with ${GUNICORN_WORKER_CLASS} workers..."
+gunicorn "${GUNICORN_APP}" \
+    --worker-class "${GUNICORN_WORKER_CLASS}" \
     --bind ":${GUNICORN_PORT:-8000}" \
     --workers "${GUNICORN_WORKERS:-3}" \
     --log-level "${GUNICORN_LOG_LEVEL:-info}" \
@@ -0,0 +1,122 @@
+"""
+Cache counters
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import caches
+
+LOG = logging.getLogger(__name__)
+
+# Counters reported for each cache namespace
+REPORTED = {
+    'book': ('hits', 'misses', 'invalidations', 'errors'),
+    'user': ('hits', 'misses', 'invalidations', 'errors'),
+    'catalogue': ('hits', 'misses', 'invalidations', 'errors'),
+    'event': ('duplicates', 'errors'),
+    'event_metrics': ('errors',),
+}
+
+# Seconds increments are held in the process before being added to the shared counters
+FLUSH_INTERVAL = 5.0
+
+
+def increment(cache, increments):
+    """
+    Add to integer counters kept in a cache, creating the missing ones.
+    :param cache: Django cache.
+    :param increments: Dictionary of cache key to the amount to add.
+    """
+    for key, delta in increments.items():
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, delta)
+
+
+class CacheCounters:
+    """
+    Hit, miss, invalidation and error counts of the caches, kept in the cache itself,
+    so every process adds to the same figures and the metrics endpoint can report them.
+    Increments are held in the process and added every FLUSH_INTERVAL seconds, so counting
+    a cache hit costs no extra round trip; counts held by a process that is killed are lost.
+    """
+
+    def __init__(self, namespace='cache_counters', alias='default'):
+        """
+        Initialize the counters.
+        :param namespace: Prefix for the cache keys.
+        :param alias: Django cache alias to use.
+        """
+        self.namespace = namespace
+        self.alias = alias
+        self.pending = Counter()
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+    def key(self, name):
+        """
+        Build the cache key of a counter.
+        :param name: Counter name, e.g. 'book.hits'.
+        :return str:
+        """
+        return f"{self.namespace}:{name}"
+
+    def add(self, name, count=1):
+        """
+        Count an operation, adding the counts held so far once FLUSH_INTERVAL seconds passed.
+        :param name: Counter name, e.g. 'book.hits'.
+        :param count: Amount to add.
+        """
+        with self.lock:
+            self.pending[name] += count
+            due = time.monotonic() - self.flushed >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Add the counts held by this process to the shared counters.
+        """
+        with self.lock:
+            pending, self.pending, self.flushed = self.pending, Counter(), time.monotonic()
+        if not pending:
+            return
+        try:
+            increment(caches[self.alias], {self.key(name): count for name, count in pending.items()})
+        except Exception as e:
+            LOG.warning(f"Cache counters write failed: {e}")
+
+    def snapshot(self):
+        """
+        Read the shared counters, after adding the counts held by this process.
+        :return: Dictionary of counter name to value, for every reported counter.
+        """
+        self.flush()
+        names = [f"{namespace}.{counter}" for namespace, counters in REPORTED.items() for counter in counters]
+        values = caches[self.alias].get_many([self.key(name) for name in names])
+        return {name: values.get(self.key(name), 0) for name in names}
+
+    def render(self):
+        """
+        Report the counters in the Prometheus text exposition format.
+        :return str:
+        """
+        lines = [
+            '# HELP library_cache_operations_total Cache hits, misses, invalidations, skipped duplicates and errors.',
+            '# TYPE library_cache_operations_total counter',
+        ]
+        for name, value in self.snapshot().items():
+            namespace, counter = name.split('.')
+            lines.append(f'library_cache_operations_total{{cache="{namespace}",result="{counter}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Counters of every cache
+COUNTERS = CacheCounters()
+
+atexit.register(COUNTERS.flush)
@@ -0,0 +1,145 @@
+"""
+Entity Cache
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from infrastructure.cache.cache_counters import COUNTERS
+
+LOG = logging.getLogger(__name__)
+
+# Written on invalidation so a reader that loaded the row before the write cannot re-populate it
+TOMBSTONE = '__invalidated__'
+TOMBSTONE_TIMEOUT = 10
+
+
+class EntityCache:
+    """
+    Read-through cache of single rows, keyed by database and primary key.
+    Entries hold the serialized instance, so a hit neither touches the database nor serializes again.
+    Invalidation leaves a short-lived tombstone and population only adds missing keys,
+    so a slow reader cannot put back a row that was changed after it was read.
+    """
+    counters = COUNTERS
+
+    def __init__(self, namespace, alias='default', timeout=None):
+        """
+        Initialize the cache for a namespace.
+        :param namespace: Prefix for the cache keys, usually the entity name.
+        :param alias: Django cache alias to use.
+        :param timeout: Expiry in seconds, defaults to settings.CACHES_EXPIRY.
+        """
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = settings.CACHES_EXPIRY if timeout is None else timeout
+
+    @property
+    def cache(self):
+        """
+        The underlying Django cache.
+        :return:
+        """
+        return caches[self.alias]
+
+    def key(self, database, identifier):
+        """
+        Build the cache key for an entity in a database.
+        :param database: Database identifier.
+        :param identifier: Primary key of the entity.
+        :return str:
+        """
+        return f"{self.namespace}:{database}:{identifier}"
+
+    def get(self, database, identifier):
+        """
+        Fetch a cached payload and count the hit or miss.
+        :param database: Database identifier.
+        :param identifier: Primary key of the entity.
+        :return: Payload or None on a miss.
+        """
+        try:
+            payload = self.cache.get(self.key(database, identifier))
+        except Exception as e:
+            LOG.warning(f"Cache read failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+            return None
+        return self._count(payload)
+
+    async def aget(self, database, identifier):
+        """
+        Async version of get.
+        :param database: Database identifier.
+        :param identifier: Primary key of the entity.
+        :return: Payload or None on a miss.
+        """
+        try:
+            payload = await self.cache.aget(self.key(database, identifier))
+        except Exception as e:
+            LOG.warning(f"Cache read failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+            return None
+        return self._count(payload)
+
+    def _count(self, payload):
+        """
+        Count a read as a hit or a miss, treating tombstones as misses.
+        :param payload: Value read from the cache.
+        :return: Payload or None on a miss.
+        """
+        if payload is None or payload == TOMBSTONE:
+            self.counters.add(f"{self.namespace}.misses")
+            return None
+        self.counters.add(f"{self.namespace}.hits")
+        return payload
+
+    def set(self, database, identifier, payload):
+        """
+        Store a payload unless the key holds a newer entry or a tombstone.
+        :param database: Database identifier.
+        :param identifier: Primary key of the entity.
+        :param payload: Serialized instance to cache.
+        """
+        try:
+            self.cache.add(self.key(database, identifier), payload, self.timeout)
+        except Exception as e:
+            LOG.warning(f"Cache write failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+
+    async def aset(self, database, identifier, payload):
+        """
+        Async version of set.
+        :param database: Database identifier.
+        :param identifier: Primary key of the entity.
+        :param payload: Serialized instance to cache.
+        """
+        try:
+            await self.cache.aadd(self.key(database, identifier), payload, self.timeout)
+        except Exception as e:
+            LOG.warning(f"Cache write failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+
+    def delete(self, databases, identifiers):
+        """
+        Invalidate the cached payloads of entities in the given databases.
+        :param databases: Database identifiers.
+        :param identifiers: Primary keys of the entities.
+        """
+        keys = [self.key(db, identifier) for db in databases for identifier in identifiers]
+        if not keys:
+            return
+        try:
+            self.cache.set_many({key: TOMBSTONE for key in keys}, TOMBSTONE_TIMEOUT)
+            self.counters.add(f"{self.namespace}.invalidations", len(keys))
+        except Exception as e:
+            LOG.warning(f"Cache invalidation failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+
+    @classmethod
+    def stats(cls):
+        """
+        Report the hit, miss, invalidation and error counters of every process.
+        :return dict:
+        """
+        return cls.counters.snapshot()
@@ -0,0 +1,80 @@
+"""
+Applied event log
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from infrastructure.cache.cache_counters import COUNTERS
+
+LOG = logging.getLogger(__name__)
+
+
+class EventLog:
+    """
+    Ids of the events the worker already applied, kept in the cache for EVENT_DEDUP_TTL seconds
+    so redelivered events are skipped with one lookup per batch.
+    The log is an optimisation over idempotent writes: when the cache is unavailable,
+    events are applied again rather than dropped.
+    """
+    counters = COUNTERS
+
+    def __init__(self, namespace='event', alias='default', timeout=None):
+        """
+        Initialize the log.
+        :param namespace: Prefix for the cache keys.
+        :param alias: Django cache alias to use.
+        :param timeout: Expiry in seconds, defaults to settings.EVENT_DEDUP_TTL.
+        """
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = settings.EVENT_DEDUP_TTL if timeout is None else timeout
+
+    @property
+    def cache(self):
+        """
+        The underlying Django cache.
+        :return:
+        """
+        return caches[self.alias]
+
+    def key(self, event_id):
+        """
+        Build the cache key for an event.
+        :param event_id: Event identifier.
+        :return str:
+        """
+        return f"{self.namespace}:{event_id}"
+
+    def applied(self, event_ids):
+        """
+        Tell which of the given events were already applied.
+        :param event_ids: Event identifiers.
+        :return: Set of the identifiers found in the log.
+        """
+        keys = {self.key(event_id): event_id for event_id in event_ids}
+        if not keys:
+            return set()
+        try:
+            found = self.cache.get_many(list(keys))
+        except Exception as e:
+            LOG.warning(f"Event log read failed: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+            return set()
+        self.counters.add(f"{self.namespace}.duplicates", len(found))
+        return {keys[key] for key in found}
+
+    def record(self, event_ids):
+        """
+        Record events as applied.
+        :param event_ids: Event identifiers.
+        """
+        keys = [self.key(event_id) for event_id in event_ids]
+        if not keys:
+            return
+        try:
+            self.cache.set_many(dict.fromkeys(keys, 1), self.timeout)
+        except Exception as e:
+            LOG.warning(f"Event log write failed: {e}")
+            self.counters.add(f"{self.namespace}.errors")
@@ -0,0 +1,191 @@
+"""
+Event pipeline metrics
+"""
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from infrastructure.cache.cache_counters import COUNTERS, increment
+
+LOG = logging.getLogger(__name__)
+
+# Topics and actions reported, the ones the worker knows how to apply
+TOPICS = ("book_events", "enroll_events", "borrow_events")
+ACTIONS = ("add", "remove")
+
+# Upper bounds, in seconds, of the buckets of the publish to apply delay histogram
+DELAY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+# Durations are stored as integer microseconds, cache increments being integral
+MICROSECONDS = 1_000_000
+
+
+def _bucket(delay):
+    """
+    Label of the histogram bucket a delay falls in.
+    :param delay: Delay in seconds.
+    :return str:
+    """
+    for bound in DELAY_BUCKETS:
+        if delay <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def _labels(**labels):
+    """
+    Format Prometheus labels.
+    :return str:
+    """
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+class EventMetrics:
+    """
+    Outcome, publish to apply delay, processing time and SQL time per database of the events the worker
+    applies, per topic and action. They are kept as counters in the cache, so every worker process adds to
+    the same figures and any web process can report them.
+    The delay runs from the publish stamp of the event, taken on the web server's clock, to the end of
+    its apply on the worker's, so it includes the outbox relay and queueing time and relies on synced clocks.
+    Like the event log, the metrics are best effort: a cache failure is logged and never fails an event.
+    """
+    counters = COUNTERS
+
+    def __init__(self, namespace='event_metrics', alias='default'):
+        """
+        Initialize the metrics.
+        :param namespace: Prefix for the cache keys.
+        :param alias: Django cache alias to use.
+        """
+        self.namespace = namespace
+        self.alias = alias
+
+    @property
+    def cache(self):
+        """
+        The underlying Django cache.
+        :return:
+        """
+        return caches[self.alias]
+
+    def key(self, *parts):
+        """
+        Build the cache key of a counter.
+        :param parts: Metric name and label values.
+        :return str:
+        """
+        return ':'.join((self.namespace, *parts))
+
+    def observe(self, topic, action, events, seconds, databases=None, failed=False):
+        """
+        Record a run of events with the same action, applied together or failed together.
+        :param topic: Event topic.
+        :param action: Event action.
+        :param events: Event payloads of the run.
+        :param seconds: Time spent processing the run.
+        :param databases: Dictionary of database alias to the SQL time spent on it, in seconds.
+        :param failed: Whether the run failed, in which case no delay is recorded.
+        """
+        increments = Counter()
+        increments[self.key('events', topic, action, 'failure' if failed else 'success')] += len(events)
+        increments[self.key('processing', topic, action, 'sum')] += round(seconds * MICROSECONDS)
+        increments[self.key('processing', topic, action, 'count')] += len(events)
+        for alias, sql_seconds in (databases or {}).items():
+            increments[self.key('apply', topic, action, alias, 'sum')] += round(sql_seconds * MICROSECONDS)
+            increments[self.key('apply', topic, action, alias, 'count')] += len(events)
+        if not failed:
+            now = time.time()
+            for event in events:
+                if event.get('published_at') is None:
+                    continue
+                delay = max(0.0, now - event['published_at'])
+                increments[self.key('delay', topic, action, _bucket(delay))] += 1
+                increments[self.key('delay', topic, action, 'sum')] += round(delay * MICROSECONDS)
+                increments[self.key('delay', topic, action, 'count')] += 1
+        try:
+            increment(self.cache, increments)
+        except Exception as e:
+            LOG.warning(f"Event metrics write failed: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+
+    def snapshot(self):
+        """
+        Read every counter.
+        :return: Dictionary of cache key to value, counters never incremented being 0.
+        """
+        keys = []
+        for topic in TOPICS:
+            for action in ACTIONS:
+                keys += [self.key('events', topic, action, outcome) for outcome in ('success', 'failure')]
+                keys += [self.key('processing', topic, action, part) for part in ('sum', 'count')]
+                keys += [
+                    self.key('apply', topic, action, alias, part)
+                    for alias in settings.DATABASES for part in ('sum', 'count')
+                ]
+                keys += [
+                    self.key('delay', topic, action, part)
+                    for part in [*map(str, DELAY_BUCKETS), '+Inf', 'sum', 'count']
+                ]
+        values = self.cache.get_many(keys)
+        return {key: values.get(key, 0) for key in keys}
+
+    def render(self):
+        """
+        Report the metrics in the Prometheus text exposition format.
+        :return str:
+        """
+        values = self.snapshot()
+        lines = [
+            '# HELP library_events_total Events the worker applied, or failed to apply, retried attempts included.',
+            '# TYPE library_events_total counter',
+        ]
+        for topic in TOPICS:
+            for action in ACTIONS:
+                for outcome in ('success', 'failure'):
+                    labels = _labels(topic=topic, action=action, outcome=outcome)
+                    lines.append(f"library_events_total{labels} {values[self.key('events', topic, action, outcome)]}")
+
+        lines += [
+            '# HELP library_event_delay_seconds Time from publishing an event to the worker having applied it.',
+            '# TYPE library_event_delay_seconds histogram',
+        ]
+        for topic in TOPICS:
+            for action in ACTIONS:
+                cumulative = 0
+                for bound in [*map(str, DELAY_BUCKETS), '+Inf']:
+                    cumulative += values[self.key('delay', topic, action, bound)]
+                    labels = _labels(topic=topic, action=action, le=bound)
+                    lines.append(f"library_event_delay_seconds_bucket{labels} {cumulative}")
+                lines += self._summary('library_event_delay_seconds', values, _labels(topic=topic, action=action),
+                                       'delay', topic, action)
+
+        lines += [
+            '# HELP library_event_processing_seconds Worker time spent processing events, per event.',
+            '# TYPE library_event_processing_seconds summary',
+        ]
+        for topic in TOPICS:
+            for action in ACTIONS:
+                lines += self._summary('library_event_processing_seconds', values,
+                                       _labels(topic=topic, action=action), 'processing', topic, action)
+
+        lines += [
+            '# HELP library_event_apply_seconds SQL time spent applying events on each database, per event.',
+            '# TYPE library_event_apply_seconds summary',
+        ]
+        for topic in TOPICS:
+            for action in ACTIONS:
+                for alias in settings.DATABASES:
+                    lines += self._summary('library_event_apply_seconds', values,
+                                           _labels(topic=topic, action=action, database=alias),
+                                           'apply', topic, action, alias)
+        return '\n'.join(lines) + '\n'
+
+    def _summary(self, name, values, labels, *parts):
+        """
+        Format the sum, in seconds, and count lines of a metric.
+        """
+        total = values[self.key(*parts, 'sum')] / MICROSECONDS
+        return [f"{name}_sum{labels} {total}", f"{name}_count{labels} {values[self.key(*parts, 'count')]}"]
@@ -0,0 +1,159 @@
+"""
+Generation Cache
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from infrastructure.cache.cache_counters import COUNTERS
+
+LOG = logging.getLogger(__name__)
+
+
+class GenerationCache:
+    """
+    Cache of query results stored under a shared generation number.
+    Bumping the generation makes every stored result unreachable in O(1), without scanning keys;
+    the orphaned entries simply expire. The generation lives in Redis, so a bump is seen by every process.
+    """
+    counters = COUNTERS
+
+    def __init__(self, namespace, alias='default', timeout=None):
+        """
+        Initialize the cache for a namespace.
+        :param namespace: Prefix for the cache keys.
+        :param alias: Django cache alias to use.
+        :param timeout: Expiry of results in seconds, defaults to settings.CACHES_EXPIRY.
+        """
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = settings.CACHES_EXPIRY if timeout is None else timeout
+
+    @property
+    def cache(self):
+        """
+        The underlying Django cache.
+        :return:
+        """
+        return caches[self.alias]
+
+    @property
+    def generation_key(self):
+        """
+        Key holding the current generation number.
+        :return str:
+        """
+        return f"{self.namespace}:generation"
+
+    def generation(self) -> int:
+        """
+        Read the current generation, starting one if none exists.
+        A new generation is seeded from the clock, so a lost key can never revive older results.
+        :return int:
+        """
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, int(time.time() * 1000), None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    async def ageneration(self) -> int:
+        """
+        Async version of generation.
+        :return int:
+        """
+        generation = await self.cache.aget(self.generation_key)
+        if generation is None:
+            await self.cache.aadd(self.generation_key, int(time.time() * 1000), None)
+            generation = await self.cache.aget(self.generation_key)
+        return generation
+
+    def bump(self):
+        """
+        Move to a new generation, invalidating every stored result.
+        """
+        try:
+            try:
+                self.cache.incr(self.generation_key)
+            except ValueError:
+                self.generation()
+                self.cache.incr(self.generation_key)
+            self.counters.add(f"{self.namespace}.invalidations")
+        except Exception as e:
+            LOG.warning(f"Generation bump failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+
+    def key(self, generation, variant):
+        """
+        Build the cache key of a result variant in a generation.
+        :param generation: Generation number.
+        :param variant: Any value whose repr identifies the query.
+        :return str:
+        """
+        digest = hashlib.md5(repr(variant).encode()).hexdigest()
+        return f"{self.namespace}:{generation}:{digest}"
+
+    def get_or_load(self, variant, loader):
+        """
+        Return the stored result of a query variant, loading and storing it on a miss.
+        The generation is read before loading, so a result computed across a bump is never
+        stored under the newer generation.
+        :param variant: Any value whose repr identifies the query.
+        :param loader: Callable computing the result.
+        :return: The result.
+        """
+        try:
+            key = self.key(self.generation(), variant)
+            result = self.cache.get(key)
+        except Exception as e:
+            LOG.warning(f"Cache read failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+            return loader()
+        if result is not None:
+            self.counters.add(f"{self.namespace}.hits")
+            return result
+        self.counters.add(f"{self.namespace}.misses")
+        result = loader()
+        try:
+            self.cache.set(key, result, self.timeout)
+        except Exception as e:
+            LOG.warning(f"Cache write failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+        return result
+
+    async def aget_or_load(self, variant, loader):
+        """
+        Async version of get_or_load.
+        :param variant: Any value whose repr identifies the query.
+        :param loader: Coroutine function computing the result.
+        :return: The result.
+        """
+        try:
+            key = self.key(await self.ageneration(), variant)
+            result = await self.cache.aget(key)
+        except Exception as e:
+            LOG.warning(f"Cache read failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+            return await loader()
+        if result is not None:
+            self.counters.add(f"{self.namespace}.hits")
+            return result
+        self.counters.add(f"{self.namespace}.misses")
+        result = await loader()
+        try:
+            await self.cache.aset(key, result, self.timeout)
+        except Exception as e:
+            LOG.warning(f"Cache write failed for {self.namespace}: {e}")
+            self.counters.add(f"{self.namespace}.errors")
+        return result
+
+    @classmethod
+    def stats(cls):
+        """
+        Report the hit, miss, invalidation and error counters of every process.
+        :return dict:
+        """
+        return cls.counters.snapshot()
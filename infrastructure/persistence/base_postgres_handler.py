@@ -1,6 +1,7 @@
 """
 Persistence base class.
 """
+import uuid
 
 from core.domain.models import Book, User, BorrowRecord
 from shared.brokers.database_broker import DataBaseBroker
@@ -18,13 +19,22 @@ class BasePostgresHandler:
         """
         self.database_broker = DataBaseBroker(source=database)
 
+    def _publish(self, topic, event):
+        """
+        Publish an event tagged with a unique id, so the worker can skip redelivered events.
+        :param topic:
+        :param event:
+        :return:
+        """
+        return self.database_broker.publish(topic, {**event, "event_id": str(uuid.uuid4())})
+
     def add_book(self, book: Book):
         """
         Add a new book to the catalogue.
         :param book:
         :return:
         """
-        result = self.database_broker.publish("book_events", {"action": "add", "book": book.__dict__})
+        result = self._publish("book_events", {"action": "add", "book": book.__dict__})
         return result
 
     def remove_book(self, book_uuid):
@@ -34,39 +44,95 @@ class BasePostgresHandler:
         :return:
         """
         #NOTE: the two databases cannot maintain the same id, so you need to use a uuid that is not auto generated
-        self.database_broker.publish("book_events", {"action": "remove", "book_uuid": book_uuid})
+        self._publish("book_events", {"action": "remove", "book_uuid": book_uuid})
         return True
 
-    def list_available_books(self):
+    def list_available_books(self, after=None, page_size=None):
         """
-        List all available books.
-        :return:
+        List a page of available books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
         """
-        return self.database_broker.list_available_books()
+        return self.database_broker.list_available_books(after, page_size)
 
-    def list_unavailable_books(self):
+    async def alist_available_books(self, after=None, page_size=None):
         """
-        List all unavailable books.
-        :return:
+        Async version of list_available_books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
         """
-        return self.database_broker.list_unavailable_books()
+        return await self.database_broker.alist_available_books(after, page_size)
+
+    def list_unavailable_books(self, after=None, page_size=None):
+        """
+        List a page of unavailable books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
+        """
+        return self.database_broker.list_unavailable_books(after, page_size)
 
     def get_book_by_id(self, book_uuid):
         """
         Fetch a single book by its ID.
         :param book_uuid:
-        :return:
+        :return: Serialized book, as BookSerializer renders it, or None if not found.
         """
         return self.database_broker.get_book_by_id(book_uuid)
 
-    def filter_books(self, publisher=None, category=None):
+    async def aget_book_by_id(self, book_uuid):
         """
-        Filter books by publisher or category.
+        Async version of get_book_by_id.
+        :param book_uuid:
+        :return: Serialized book, as BookSerializer renders it, or None if not found.
+        """
+        return await self.database_broker.aget_book_by_id(book_uuid)
+
+    def filter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
+        """
+        Filter a page of books by publisher or category.
+        :param publisher:
+        :param category:
+        :param after:
+        :param page_size:
+        :param fuzzy:
+        :return: Page of serialized books.
+        """
+        return self.database_broker.filter_books(publisher, category, after, page_size, fuzzy)
+
+    async def afilter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
+        """
+        Async version of filter_books.
         :param publisher:
         :param category:
+        :param after:
+        :param page_size:
+        :param fuzzy:
+        :return: Page of serialized books.
+        """
+        return await self.database_broker.afilter_books(publisher, category, after, page_size, fuzzy)
+
+    def suggest_values(self, field, query, limit):
+        """
+        Suggest distinct publisher or category values for a partial input.
+        :param field:
+        :param query:
+        :param limit:
         :return:
         """
-        return self.database_broker.filter_books(publisher, category)
+        return self.database_broker.suggest_values(field, query, limit)
+
+    def search_books(self, query, after=None, page_size=None):
+        """
+        Full-text search of book titles.
+        :param query:
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
+        """
+        return self.database_broker.search_books(query, after, page_size)
 
     def enroll_user(self, user: User):
         """
@@ -74,7 +140,7 @@ class BasePostgresHandler:
         :param user:
         :return:
         """
-        self.database_broker.publish("enroll_events", {"action": "add", "user": user.__dict__})
+        self._publish("enroll_events", {"action": "add", "user": user.__dict__})
         return True
 
     def list_users(self):
@@ -84,11 +150,18 @@ class BasePostgresHandler:
         """
         return self.database_broker.list_users()
 
+    def iter_users(self):
+        """
+        Lazily iterate over all users enrolled in the library.
+        :return:
+        """
+        return self.database_broker.iter_users()
+
     def get_user_by_id(self, user_uuid):
         """
         Fetch a user by their ID.
         :param user_uuid:
-        :return:
+        :return: Serialized user, as UserSerializer renders it, or None if not found.
         """
         return self.database_broker.get_user_by_id(user_uuid)
 
@@ -98,7 +171,7 @@ class BasePostgresHandler:
         :param borrow_record:
         :return:
         """
-        self.database_broker.publish("borrow_events", {"action": "add", **borrow_record.__dict__})
+        self._publish("borrow_events", {"action": "add", **borrow_record.__dict__})
         return True
 
     def get_borrow_record(self, user_uuid, book_uuid):
@@ -110,6 +183,14 @@ class BasePostgresHandler:
         """
         return self.database_broker.get_borrow_record(user_uuid, book_uuid)
 
+    def list_user_borrow_records(self, user_uuid):
+        """
+        List the borrow records of a user.
+        :param user_uuid:
+        :return:
+        """
+        return self.database_broker.list_user_borrow_records(user_uuid)
+
     def list_borrow_records(self):
         """
         List all borrow records.
@@ -117,6 +198,13 @@ class BasePostgresHandler:
         """
         return self.database_broker.list_borrow_records()
 
+    def iter_borrow_records(self):
+        """
+        Lazily iterate over all borrow records.
+        :return:
+        """
+        return self.database_broker.iter_borrow_records()
+
 
 class PostgresHandlerFrontend(BasePostgresHandler):
     """
@@ -1,19 +1,47 @@
 """
 Base Repository
 """
+import uuid
 from typing import List, Union, Dict, Any
 
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from infrastructure.cache.entity_cache import EntityCache
+from infrastructure.cache.generation_cache import GenerationCache
+from infrastructure.repositories.fanout import fan_out
+from shared.instrumentation import timed
+from shared.pagination import Page, clamp_page_size
+
 
 class BaseRepository:
     """
     Base repository class for handling common database operations.
     """
+    # Columns written by exports, as values() field names and alias=expression pairs
+    export_fields = ()
+    export_expressions = {}
+    # Fields compared between databases besides the primary key; timestamps are left out,
+    # as each database stamps its own when it applies an event
+    compare_fields = ()
+    # Serializer rendering the instances returned by get_cached and listed pages, whose output the caches store
+    serializer_class = None
 
-    def __init__(self, model_class, databases: Union[str, List[str]] = None):
+    def __init__(
+        self,
+        model_class,
+        databases: Union[str, List[str]] = None,
+        cache: EntityCache = None,
+        page_cache: GenerationCache = None,
+    ):
         """
         Initialize the repository with a list of databases.
         :param model_class: The model class for this repository.
         :param databases: List of database identifiers or a single identifier.
+        :param cache: Optional read-through cache for lookups by primary key.
+        :param page_cache: Optional versioned cache for listed pages.
         """
         if databases is None:
             databases = ['default', 'admin']
@@ -22,6 +50,8 @@ class BaseRepository:
         self.databases = databases
         self.model_class = model_class
         self.orm = model_class
+        self.cache = cache
+        self.page_cache = page_cache
 
     def _get_queryset(self, database):
         """
@@ -31,18 +61,87 @@ class BaseRepository:
         """
         return self.orm.objects.using(database)
 
+    def _fan_out(self, operation):
+        """
+        Run an operation once per specified database, concurrently when settings.REPOSITORY_FANOUT
+        is 'parallel' and no atomic block is open, so latency tracks the slowest database, not the sum.
+        :param operation: Callable taking a database identifier.
+        :return: Dictionary of results for each database.
+        """
+        return fan_out(self.databases, operation)
+
     def add(self, instance):
         """
         Add a new instance to all specified databases.
         :param instance: Instance to add.
         :return: List of results for each database operation.
         """
-        results = []
-        for db in self.databases:
-            model_instance = self.model_class(**instance)
-            result = model_instance.save(using=db)
-            results.append(result)
-        return results
+        return list(self._fan_out(lambda db: self.model_class(**instance).save(using=db)).values())
+
+    def add_many(self, instances, batch_size=None, ignore_conflicts=False):
+        """
+        Add many instances to all specified databases with batched INSERTs, one transaction per database.
+        :param instances: Instances to add.
+        :param batch_size: Rows per INSERT, defaults to settings.REPOSITORY_BATCH_SIZE.
+        :param ignore_conflicts: Skip instances whose primary key already exists instead of failing,
+            which makes replaying the same instances harmless.
+        :return: Dictionary of inserted row counts for each database (attempted rows when ignoring conflicts).
+        """
+        batch_size = batch_size or settings.REPOSITORY_BATCH_SIZE
+
+        def add_to(db):
+            model_instances = [self.model_class(**instance) for instance in instances]
+            with transaction.atomic(using=db):
+                return len(self._get_queryset(db).bulk_create(
+                    model_instances, batch_size=batch_size, ignore_conflicts=ignore_conflicts
+                ))
+
+        return self._fan_out(add_to)
+
+    def update_many(self, instances, fields, batch_size=None):
+        """
+        Update fields of many instances, identified by primary key, in all specified databases.
+        Each batch is a single UPDATE, and each database is updated in one transaction.
+        The modification time is bumped as well, so incremental sync picks the rows up.
+        :param instances: Instances holding the primary key and the new values.
+        :param fields: Names of the fields to update.
+        :param batch_size: Rows per UPDATE, defaults to settings.REPOSITORY_BATCH_SIZE.
+        :return: Dictionary of updated row counts for each database.
+        """
+        batch_size = batch_size or settings.REPOSITORY_BATCH_SIZE
+        fields = [*fields, 'modified'] if 'modified' not in fields else fields
+        now = timezone.now()
+
+        def update_in(db):
+            model_instances = [self.model_class(**instance) for instance in instances]
+            for model_instance in model_instances:
+                model_instance.modified = now
+            with transaction.atomic(using=db):
+                return self._get_queryset(db).bulk_update(model_instances, fields, batch_size=batch_size)
+
+        return self._fan_out(update_in)
+
+    def remove_many(self, identifiers, batch_size=None):
+        """
+        Remove many instances, identified by primary key, from all specified databases.
+        Each batch is a single DELETE ... WHERE pk IN (...), and each database is cleaned in one transaction.
+        :param identifiers: Primary keys of the instances to remove.
+        :param batch_size: Keys per DELETE, defaults to settings.REPOSITORY_BATCH_SIZE.
+        :return: Dictionary of removed instance counts for each database.
+        """
+        batch_size = batch_size or settings.REPOSITORY_BATCH_SIZE
+        identifiers = list(identifiers)
+
+        def remove_from(db):
+            removed = 0
+            with transaction.atomic(using=db):
+                for start in range(0, len(identifiers), batch_size):
+                    batch = identifiers[start:start + batch_size]
+                    _, deleted = self._get_queryset(db).filter(pk__in=batch).delete()
+                    removed += deleted.get(self.model_class._meta.label, 0)
+            return removed
+
+        return self._fan_out(remove_from)
 
     def remove(self, **kwargs):
         """
@@ -50,15 +149,15 @@ class BaseRepository:
         :param kwargs: Filters for the instance to remove.
         :return: Dictionary of results for each database operation.
         """
-        results = {}
-        for db in self.databases:
+        def remove_from(db):
             try:
                 instance = self._get_queryset(db).get(**kwargs)
                 instance.delete()
-                results[db] = True
+                return True
             except self.model_class.DoesNotExist:
-                results[db] = False
-        return results
+                return False
+
+        return self._fan_out(remove_from)
 
     def get(self, **kwargs):
         """
@@ -73,6 +172,91 @@ class BaseRepository:
                 continue
         return None
 
+    async def aget(self, **kwargs):
+        """
+        Async version of get, using Django's async ORM.
+        :param kwargs: Filters for the instance to fetch.
+        :return: Instance or None if not found.
+        """
+        for db in self.databases:
+            try:
+                return await self._get_queryset(db).aget(**kwargs)
+            except self.model_class.DoesNotExist:
+                continue
+        return None
+
+    def get_cached(self, identifier):
+        """
+        Fetch an instance by primary key, serialized, from the first database that has it.
+        The cache holds the serializer output, so a hit is returned as is, without a query or serializing again.
+        :param identifier: Primary key of the instance.
+        :return: Serialized instance or None if not found.
+        """
+        identifier = str(identifier)
+        for db in self.databases:
+            payload = self.cache.get(db, identifier) if self.cache is not None else None
+            if payload is not None:
+                return payload
+            instance = self._get_queryset(db).filter(pk=identifier).first()
+            if instance is not None:
+                payload = self._serialize(instance)
+                if self.cache is not None:
+                    self.cache.set(db, identifier, payload)
+                return payload
+        return None
+
+    async def aget_cached(self, identifier):
+        """
+        Async version of get_cached.
+        :param identifier: Primary key of the instance.
+        :return: Serialized instance or None if not found.
+        """
+        identifier = str(identifier)
+        for db in self.databases:
+            payload = await self.cache.aget(db, identifier) if self.cache is not None else None
+            if payload is not None:
+                return payload
+            instance = await self._get_queryset(db).filter(pk=identifier).afirst()
+            if instance is not None:
+                payload = self._serialize(instance)
+                if self.cache is not None:
+                    await self.cache.aset(db, identifier, payload)
+                return payload
+        return None
+
+    def _serialize(self, instance):
+        """
+        Serialize an instance with the serializer of the repository.
+        :param instance: Model instance.
+        :return dict:
+        """
+        return dict(self.serializer_class(instance).data)
+
+    def _serialize_page(self, page) -> Page:
+        """
+        Serialize the instances of a page with the serializer of the repository.
+        :param page: Page of instances.
+        :return: Page of serialized instances.
+        """
+        with timed('serialize'):
+            items = [dict(item) for item in self.serializer_class(page.items, many=True).data]
+        return Page(items=items, next_key=page.next_key)
+
+    def invalidate_pages(self):
+        """
+        Drop every cached page of this repository by moving to a new cache generation.
+        """
+        if self.page_cache is not None:
+            self.page_cache.bump()
+
+    def invalidate(self, *identifiers):
+        """
+        Drop cached instances from all specified databases.
+        :param identifiers: Primary keys of the instances.
+        """
+        if self.cache is not None:
+            self.cache.delete(self.databases, [str(identifier) for identifier in identifiers])
+
     def list(self, **filters):
         """
         List instances from all specified databases with optional filters.
@@ -80,21 +264,286 @@ class BaseRepository:
         :return: List of instances from all databases.
         """
         results = []
-        for db in self.databases:
-            queryset = self._get_queryset(db).filter(**filters)
-            results.extend(queryset)
+        for instances in self._fan_out(lambda db: list(self._get_queryset(db).filter(**filters))).values():
+            results.extend(instances)
         return results
 
+    def list_page(self, after=None, page_size=None, **filters) -> Page:
+        """
+        List one page of instances ordered by primary key, starting after a given key.
+        Each database is read with a bounded keyset query, so no OFFSET scan is needed.
+        :param after: Primary key of the last instance of the previous page.
+        :param page_size: Maximum number of instances to return.
+        :param filters: Filters for listing instances.
+        :return: Page of serialized instances with the key to continue from.
+        """
+        page_size = clamp_page_size(page_size)
+        variant = ('page', tuple(self.databases), after, page_size, sorted(filters.items()))
+        return self._cached_page(variant, lambda: self._list_page(after, page_size, filters))
+
+    async def alist_page(self, after=None, page_size=None, **filters) -> Page:
+        """
+        Async version of list_page.
+        :param after: Primary key of the last instance of the previous page.
+        :param page_size: Maximum number of instances to return.
+        :param filters: Filters for listing instances.
+        :return: Page of serialized instances with the key to continue from.
+        """
+        page_size = clamp_page_size(page_size)
+        variant = ('page', tuple(self.databases), after, page_size, sorted(filters.items()))
+        return await self._acached_page(variant, lambda: self._alist_page(after, page_size, filters))
+
+    def _cached_page(self, variant, load_page) -> Page:
+        """
+        Serve a serialized page from the page cache, loading, serializing and storing it on a miss.
+        The cache holds the serializer output, so a hit is returned as is, without serializing again.
+        :param variant: Value identifying the query behind the page.
+        :param load_page: Callable returning the Page of instances.
+        :return: Page of serialized instances.
+        """
+        if self.page_cache is None:
+            return self._serialize_page(load_page())
+
+        def load():
+            page = self._serialize_page(load_page())
+            return {'items': page.items, 'next_key': page.next_key}
+
+        cached = self.page_cache.get_or_load(variant, load)
+        return Page(items=cached['items'], next_key=cached['next_key'])
+
+    async def _acached_page(self, variant, load_page) -> Page:
+        """
+        Async version of _cached_page.
+        :param variant: Value identifying the query behind the page.
+        :param load_page: Coroutine function returning the Page of instances.
+        :return: Page of serialized instances.
+        """
+        if self.page_cache is None:
+            return self._serialize_page(await load_page())
+
+        async def load():
+            page = self._serialize_page(await load_page())
+            return {'items': page.items, 'next_key': page.next_key}
+
+        cached = await self.page_cache.aget_or_load(variant, load)
+        return Page(items=cached['items'], next_key=cached['next_key'])
+
+    def _list_page(self, after, page_size, filters) -> Page:
+        """
+        Run the keyset query behind list_page.
+        :param after: Primary key of the last instance of the previous page.
+        :param page_size: Maximum number of instances to return.
+        :param filters: Filters for listing instances.
+        :return: Page of instances.
+        """
+        results = []
+        for instances in self._fan_out(lambda db: list(self._page_queryset(db, after, page_size, filters))).values():
+            results.extend(instances)
+        return self._merge_page(results, page_size)
+
+    async def _alist_page(self, after, page_size, filters) -> Page:
+        """
+        Async version of _list_page.
+        :param after: Primary key of the last instance of the previous page.
+        :param page_size: Maximum number of instances to return.
+        :param filters: Filters for listing instances.
+        :return: Page of instances.
+        """
+        results = []
+        for db in self.databases:
+            results.extend([instance async for instance in self._page_queryset(db, after, page_size, filters)])
+        return self._merge_page(results, page_size)
+
+    @staticmethod
+    def _merge_page(results, page_size) -> Page:
+        """
+        Merge the keyset pages read from each database into one page.
+        :param results: Instances read from all databases.
+        :param page_size: Maximum number of instances to return.
+        :return: Page of instances.
+        """
+        results.sort(key=lambda instance: instance.pk)
+        if len(results) <= page_size:
+            return Page(items=results)
+        items = results[:page_size]
+        return Page(items=items, next_key=str(items[-1].pk))
+
+    def _page_queryset(self, database, after, page_size, filters):
+        """
+        Build the keyset query for one page in a database.
+        One row more than the page size is fetched to tell whether a next page exists.
+        :param database: Database identifier.
+        :param after: Primary key of the last instance of the previous page.
+        :param page_size: Maximum number of instances to return.
+        :param filters: Filters for listing instances.
+        :return: Sliced QuerySet.
+        """
+        queryset = self._get_queryset(database).filter(**filters)
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        return queryset.order_by('pk')[:page_size + 1]
+
+    def export_queryset(self, database, since=None):
+        """
+        Build the query behind an export of one database: the export columns in primary key order,
+        optionally limited to rows modified since a point in time for incremental exports.
+        :param database: Database identifier.
+        :param since: Only include rows modified at or after this datetime.
+        :return: Values QuerySet.
+        """
+        queryset = self._get_queryset(database)
+        if since is not None:
+            queryset = queryset.filter(modified__gte=since)
+        return queryset.order_by('pk').values(*self.export_fields, **self.export_expressions)
+
+    def changed_since(self, database, after, until, limit):
+        """
+        Fetch the next rows modified after a watermark, in (modified, primary key) order.
+        :param database: Database identifier.
+        :param after: (modified, primary key) of the last row already seen, or None to start from the beginning.
+        :param until: Only include rows modified at or before this datetime.
+        :param limit: Maximum number of rows.
+        :return: List of model instances.
+        """
+        queryset = self._get_queryset(database).filter(modified__lte=until)
+        if after is not None:
+            modified, key = after
+            queryset = queryset.filter(Q(modified__gt=modified) | Q(modified=modified, pk__gt=key))
+        return list(queryset.order_by('modified', 'pk')[:limit])
+
+    def _row_sql(self, connection):
+        """
+        SQL fragments shared by the reconciliation queries: the table, the primary key column,
+        and a 64-bit hash of the compared columns of a row (hashtextextended, which is stable
+        across servers and versions since hash partitioning relies on it).
+        :param connection: Database connection.
+        :return: Tuple of (table, primary key, row hash) SQL.
+        """
+        quote = connection.ops.quote_name
+        meta = self.model_class._meta
+        pk = quote(meta.pk.column)
+        columns = [pk] + [quote(meta.get_field(name).column) for name in self.compare_fields]
+        return quote(meta.db_table), pk, f"hashtextextended(ROW({', '.join(columns)})::text, 0)"
+
+    @staticmethod
+    def _key_range(pk, prefix):
+        """
+        Turn a hexadecimal prefix of UUID primary keys into an indexable range condition.
+        :param pk: Quoted primary key column.
+        :param prefix: Hexadecimal prefix, '' for the whole table.
+        :return: Tuple of the WHERE clause and its parameters.
+        """
+        if not prefix:
+            return '', []
+        lower = uuid.UUID(prefix.ljust(32, '0'))
+        upper = int(prefix, 16) + 1
+        if upper == 16 ** len(prefix):
+            return f"WHERE {pk} >= %s", [lower]
+        return f"WHERE {pk} >= %s AND {pk} < %s", [lower, uuid.UUID(f"{upper:0{len(prefix)}x}".ljust(32, '0'))]
+
+    def range_digests(self, database, prefix, depth):
+        """
+        Hash the rows of a key range in sub-ranges, one per primary key prefix of the given length.
+        The digest of a sub-range is the sum of its row hashes: it needs no sort, and equal digests
+        mean equal compared columns.
+        :param database: Database identifier.
+        :param prefix: Hexadecimal prefix of the range, '' for the whole table.
+        :param depth: Length of the sub-range prefixes, at most 8.
+        :return: Dictionary of sub-range prefix to (row count, digest).
+        """
+        connection = connections[database]
+        table, pk, row_hash = self._row_sql(connection)
+        where, params = self._key_range(pk, prefix)
+        sql = (
+            f"SELECT left({pk}::text, %s), count(*), sum({row_hash}::numeric) "
+            f"FROM {table} {where} GROUP BY 1"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [depth, *params])
+            return {bucket: (count, digest) for bucket, count, digest in cursor.fetchall()}
+
+    def range_rows(self, database, prefix):
+        """
+        Fetch the hash and modification time of every row in a key range.
+        :param database: Database identifier.
+        :param prefix: Hexadecimal prefix of the range.
+        :return: Dictionary of primary key to (row hash, modified).
+        """
+        connection = connections[database]
+        table, pk, row_hash = self._row_sql(connection)
+        where, params = self._key_range(pk, prefix)
+        modified = connection.ops.quote_name(self.model_class._meta.get_field('modified').column)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {pk}, {row_hash}, {modified} FROM {table} {where}", params)
+            return {pk_value: (digest, stamp) for pk_value, digest, stamp in cursor.fetchall()}
+
+    def upsert_many(self, database, instances, newer_only=False, batch_size=None):
+        """
+        Write instances read from another database as they are, timestamps included,
+        inserting missing rows and overwriting existing ones in batched INSERT ... ON CONFLICT statements.
+        :param database: Database identifier.
+        :param instances: Model instances to write.
+        :param newer_only: Only overwrite rows whose compared columns differ and that were not modified later.
+        :param batch_size: Rows per statement, defaults to settings.REPOSITORY_BATCH_SIZE.
+        :return: Number of rows inserted or updated.
+        """
+        batch_size = batch_size or settings.REPOSITORY_BATCH_SIZE
+        instances = list(instances)
+        connection = connections[database]
+        quote = connection.ops.quote_name
+        meta = self.model_class._meta
+        fields = [field for field in meta.concrete_fields if not field.generated]
+        table, pk = quote(meta.db_table), quote(meta.pk.column)
+        updates = ', '.join(
+            f"{quote(field.column)} = EXCLUDED.{quote(field.column)}" for field in fields if not field.primary_key
+        )
+        condition = ''
+        if newer_only:
+            compared = [quote(meta.get_field(name).column) for name in self.compare_fields]
+            modified = quote(meta.get_field('modified').column)
+            condition = (
+                f" WHERE ({', '.join(f'{table}.{column}' for column in compared)}) IS DISTINCT FROM "
+                f"({', '.join(f'EXCLUDED.{column}' for column in compared)}) "
+                f"AND {table}.{modified} <= EXCLUDED.{modified}"
+            )
+        row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+        written = 0
+        with transaction.atomic(using=database), connection.cursor() as cursor:
+            for start in range(0, len(instances), batch_size):
+                batch = instances[start:start + batch_size]
+                params = [
+                    field.get_db_prep_save(getattr(instance, field.attname), connection)
+                    for instance in batch for field in fields
+                ]
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)}) "
+                    f"VALUES {', '.join([row] * len(batch))} "
+                    f"ON CONFLICT ({pk}) DO UPDATE SET {updates}{condition}",
+                    params,
+                )
+                written += cursor.rowcount
+        return written
+
+    def iterate(self, chunk_size=None, **filters):
+        """
+        Lazily iterate over instances from all specified databases with optional filters.
+        Rows are read through a server-side cursor, so memory stays flat regardless of the result size.
+        :param chunk_size: Number of rows fetched from the cursor per round trip.
+        :param filters: Filters for listing instances.
+        :return: Generator of instances from all databases.
+        """
+        chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        for db in self.databases:
+            queryset = self._get_queryset(db).filter(**filters).order_by('pk')
+            yield from queryset.iterator(chunk_size=chunk_size)
+
     def update(self, filters: Dict[str, Any], updates: Dict[str, Any]):
         """
-        Update instances matching the filters in all specified databases.
+        Update instances matching the filters in all specified databases, bumping their modification time.
         :param filters: Filters for selecting instances to update.
         :param updates: Fields and values to update.
         :return: Dictionary of results for each database operation.
         """
-        results = {}
-        for db in self.databases:
-            queryset = self._get_queryset(db).filter(**filters)
-            count = queryset.update(**updates)
-            results[db] = count
-        return results
+        updates = {'modified': timezone.now(), **updates}
+        return self._fan_out(lambda db: self._get_queryset(db).filter(**filters).update(**updates))
@@ -1,17 +1,40 @@
 """
 Book Repository
 """
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, When
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+
+from infrastructure.cache.entity_cache import EntityCache
+from infrastructure.cache.generation_cache import GenerationCache
+from infrastructure.persistence.copy import copy_from
 from infrastructure.repositories.base_repository import BaseRepository
-from library.models import Book
+from library.models import Book, TITLE_SEARCH_VECTOR
+from library.serializers import BookSerializer
+from shared.pagination import Page, clamp_page_size
+
+# Columns of the rows passed to import_books; line orders duplicates so the last one wins
+IMPORT_COLUMNS = ('line', 'book_uuid', 'title', 'publisher', 'category', 'availability_status')
+IMPORT_STAGING_TABLE = 'book_import_staging'
 
 
 class BookRepository(BaseRepository):
     """
     Repository for handling Book-related database operations.
     """
+    export_fields = ('book_uuid', 'title', 'publisher', 'category', 'availability_status', 'created', 'modified')
+    compare_fields = ('title', 'publisher', 'category', 'availability_status')
+    serializer_class = BookSerializer
 
     def __init__(self, databases=None):
-        super().__init__(model_class=Book, databases=databases)
+        super().__init__(
+            model_class=Book,
+            databases=databases,
+            cache=EntityCache('book'),
+            page_cache=GenerationCache('catalogue'),
+        )
 
     def add_book(self, book: Book):
         """
@@ -21,6 +44,78 @@ class BookRepository(BaseRepository):
         """
         return self.add(book)
 
+    def add_books(self, books, batch_size=None, ignore_conflicts=False):
+        """
+        Add many books to all specified databases with batched INSERTs.
+        :param books: Book payloads to add.
+        :param batch_size: Rows per INSERT.
+        :param ignore_conflicts: Skip books that already exist.
+        :return: Dictionary of inserted row counts for each database.
+        """
+        return self.add_many(books, batch_size, ignore_conflicts)
+
+    def update_books(self, books, fields, batch_size=None):
+        """
+        Update fields of many books in all specified databases with batched UPDATEs.
+        :param books: Book payloads holding book_uuid and the new values.
+        :param fields: Names of the fields to update.
+        :param batch_size: Rows per UPDATE.
+        :return: Dictionary of updated row counts for each database.
+        """
+        return self.update_many(books, fields, batch_size)
+
+    def import_books(self, books):
+        """
+        Upsert many books into all specified databases: the rows are COPYed into a staging table
+        and merged into the catalogue with one INSERT ... ON CONFLICT per database.
+        Existing books get their title, publisher and category updated but keep their availability,
+        which belongs to the borrow records.
+        :param books: Tuples of the IMPORT_COLUMNS values.
+        :return: Dictionary of the inserted count and the IDs of the updated books for each database.
+        """
+        return self._fan_out(lambda db: self._import_into(db, books))
+
+    def _import_into(self, database, books):
+        """
+        Run the staged upsert behind import_books in one transaction on a database.
+        :param database: Database identifier.
+        :param books: Tuples of the IMPORT_COLUMNS values.
+        :return: Tuple of the inserted count and the IDs of the updated books.
+        """
+        connection = connections[database]
+        quote = connection.ops.quote_name
+        table = quote(self.model_class._meta.db_table)
+        # Qualified with pg_temp, so a regular table of the same name is never dropped or loaded instead
+        staging = f"pg_temp.{quote(IMPORT_STAGING_TABLE)}"
+        catalogue = ', '.join(quote(column) for column in IMPORT_COLUMNS[1:])
+        compared = ('title', 'publisher', 'category')
+        current = ', '.join(f'{table}.{quote(column)}' for column in compared)
+        excluded = ', '.join(f'EXCLUDED.{quote(column)}' for column in compared)
+        assignments = ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in (*compared, 'modified'))
+        now = timezone.now()
+        with transaction.atomic(using=database), connection.cursor() as cursor:
+            # Left over when an outer transaction is still open, e.g. several chunks in one atomic block
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT 0::bigint AS {quote('line')}, {catalogue} FROM {table} WITH NO DATA"
+            )
+            copy_from(cursor, IMPORT_STAGING_TABLE, IMPORT_COLUMNS, books, schema='pg_temp')
+            cursor.execute(
+                f"WITH upserted AS ("
+                f"INSERT INTO {table} ({catalogue}, {quote('created')}, {quote('modified')}) "
+                f"SELECT DISTINCT ON ({quote('book_uuid')}) {catalogue}, %s, %s FROM {staging} "
+                f"ORDER BY {quote('book_uuid')}, {quote('line')} DESC "
+                f"ON CONFLICT ({quote('book_uuid')}) DO UPDATE SET {assignments} "
+                # Unchanged rows are left alone, so re-importing a file rewrites nothing
+                f"WHERE ({current}) IS DISTINCT FROM ({excluded}) "
+                f"RETURNING {quote('book_uuid')}, xmax = 0 AS inserted) "
+                f"SELECT count(*) FILTER (WHERE inserted), "
+                f"coalesce(array_agg({quote('book_uuid')}) FILTER (WHERE NOT inserted), '{{}}') FROM upserted",
+                [now, now],
+            )
+            return cursor.fetchone()
+
     def remove_book(self, book_uuid):
         """
         Remove a book from all specified databases.
@@ -29,41 +124,197 @@ class BookRepository(BaseRepository):
         """
         return self.remove(book_uuid=book_uuid)
 
+    def remove_books(self, book_uuids, batch_size=None):
+        """
+        Remove many books from all specified databases with batched DELETEs.
+        :param book_uuids: IDs of the books to remove.
+        :param batch_size: Keys per DELETE.
+        :return: Dictionary of removed book counts for each database.
+        """
+        return self.remove_many(book_uuids, batch_size)
+
     def get_book_by_id(self, book_uuid):
         """
-        Fetch a book by its ID from the first available database.
+        Fetch a book by its ID from the cache or the first available database.
+        :param book_uuid: ID of the book to fetch.
+        :return: Serialized book or None if not found.
+        """
+        return self.get_cached(book_uuid)
+
+    async def aget_book_by_id(self, book_uuid):
+        """
+        Async version of get_book_by_id.
         :param book_uuid: ID of the book to fetch.
-        :return: Book instance or None if not found.
+        :return: Serialized book or None if not found.
+        """
+        return await self.aget_cached(book_uuid)
+
+    def list_available_books(self, after=None, page_size=None):
+        """
+        List a page of available books from all specified databases.
+        :param after: Key of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Page of serialized books from all databases.
+        """
+        return self.list_page(after=after, page_size=page_size, availability_status=True)
+
+    async def alist_available_books(self, after=None, page_size=None):
+        """
+        Async version of list_available_books.
+        :param after: Key of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Page of serialized books from all databases.
         """
-        return self.get(book_uuid=book_uuid)
+        return await self.alist_page(after=after, page_size=page_size, availability_status=True)
 
-    def list_available_books(self):
+    def list_unavailable_books(self, after=None, page_size=None):
         """
-        List all available books from all specified databases.
-        :return: List of books from all databases.
+        List a page of unavailable books from all specified databases.
+        :param after: Key of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Page of serialized books from all databases.
         """
-        return self.list(availability_status=True)
+        return self.list_page(after=after, page_size=page_size, availability_status=False)
 
-    def list_unavailable_books(self):
+    def filter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
         """
-        List all unavailable books from all specified databases.
-        :return: List of books from all databases.
+        Filter a page of books by publisher or category from all specified databases.
+        :param publisher: Publisher to filter by.
+        :param category: Category to filter by.
+        :param after: Key of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :param fuzzy: Match misspelt values and prefixes instead of exact values.
+        :return: Page of serialized filtered books from all databases.
         """
-        return self.list(availability_status=False)
+        filters = self._catalogue_filters(publisher, category, fuzzy)
+        return self.list_page(after=after, page_size=page_size, **filters)
 
-    def filter_books(self, publisher=None, category=None):
+    async def afilter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
         """
-        Filter books by publisher or category from all specified databases.
+        Async version of filter_books.
         :param publisher: Publisher to filter by.
         :param category: Category to filter by.
-        :return: List of filtered books from all databases.
+        :param after: Key of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :param fuzzy: Match misspelt values and prefixes instead of exact values.
+        :return: Page of serialized filtered books from all databases.
         """
+        filters = self._catalogue_filters(publisher, category, fuzzy)
+        return await self.alist_page(after=after, page_size=page_size, **filters)
+
+    @staticmethod
+    def _catalogue_filters(publisher, category, fuzzy):
+        """
+        Build the filters of a catalogue query over available books.
+        :param publisher: Publisher to filter by.
+        :param category: Category to filter by.
+        :param fuzzy: Use the trigram lookup instead of exact matching.
+        :return dict:
+        """
+        lookup = '__fuzzy' if fuzzy else ''
         filters = {'availability_status': True}
-        if publisher and category:
-            filters['publisher'] = publisher
-            filters['category'] = category
         if publisher:
-            filters['publisher'] = publisher
+            filters[f'publisher{lookup}'] = publisher
         if category:
-            filters['category'] = category
-        return self.list(**filters)
+            filters[f'category{lookup}'] = category
+        return filters
+
+    def suggest_values(self, field, query, limit):
+        """
+        Suggest distinct publisher or category values for a partial, possibly misspelt, input.
+        Prefix matches come first, then the closest trigram matches, then the most common values.
+        :param field: Name of the field to suggest values for.
+        :param query: Partial input.
+        :param limit: Maximum number of values to return.
+        :return: List of dictionaries with the value and its number of books.
+        """
+        def load():
+            suggestions = {}
+            rows = self._fan_out(lambda db: list(self._suggest_queryset(db, field, query, limit)))
+            for db_rows in rows.values():
+                for row in db_rows:
+                    suggestion = suggestions.setdefault(row['value'], dict(row, books=0))
+                    suggestion['books'] += row['books']
+            ranked = sorted(
+                suggestions.values(),
+                key=lambda row: (-row['prefix'], -row['similarity'], -row['books'], row['value']),
+            )
+            return [{'value': row['value'], 'books': row['books']} for row in ranked[:limit]]
+
+        if self.page_cache is None:
+            return load()
+        variant = ('suggest', tuple(self.databases), field, query, limit)
+        return self.page_cache.get_or_load(variant, load)
+
+    def _suggest_queryset(self, database, field, query, limit):
+        """
+        Build the grouped suggestion query for a database.
+        :param database: Database identifier.
+        :param field: Name of the field to suggest values for.
+        :param query: Partial input.
+        :param limit: Maximum number of values to return.
+        :return: Sliced QuerySet of value, books, prefix and similarity rows.
+        """
+        return (
+            self.model_class.objects.using(database)
+            .filter(**{f'{field}__fuzzy': query})
+            .values(value=F(field))
+            .annotate(
+                books=Count('pk'),
+                prefix=Case(When(**{f'{field}__istartswith': query}, then=1), default=0, output_field=IntegerField()),
+                similarity=Greatest(TrigramSimilarity(field, query), TrigramWordSimilarity(query, field)),
+            )
+            .order_by('-prefix', '-similarity', '-books', 'value')[:limit]
+        )
+
+    def search_books(self, query, after=None, page_size=None):
+        """
+        Full-text search of book titles, best matches first, from all specified databases.
+        Pages are keyset on (rank, book_uuid), so deep pages cost the same as the first one.
+        :param query: Search terms, in web search syntax.
+        :param after: Rank and ID of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Page of serialized matching books from all databases.
+        """
+        page_size = clamp_page_size(page_size)
+        variant = ('search', tuple(self.databases), query, after, page_size)
+        return self._cached_page(variant, lambda: self._search_page(query, after, page_size))
+
+    def _search_page(self, query, after, page_size) -> Page:
+        """
+        Run the ranked search behind search_books.
+        :param query: Search terms.
+        :param after: Rank and ID of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Page of books.
+        """
+        results = []
+        for books in self._fan_out(lambda db: list(self._search_queryset(db, query, after, page_size))).values():
+            results.extend(books)
+        results.sort(key=lambda book: (-book.rank, book.pk))
+        if len(results) <= page_size:
+            return Page(items=results)
+        items = results[:page_size]
+        return Page(items=items, next_key=[items[-1].rank, str(items[-1].pk)])
+
+    def _search_queryset(self, database, query, after, page_size):
+        """
+        Build the ranked search query for one page in a database.
+        Ranks are normalised by title length so short exact titles come first, and cast to double
+        precision so they survive the round trip through the cursor exactly.
+        :param database: Database identifier.
+        :param query: Search terms.
+        :param after: Rank and ID of the last book of the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Sliced QuerySet annotated with rank.
+        """
+        search_query = SearchQuery(query, search_type='websearch', config='english')
+        queryset = self._get_queryset(database).alias(search_vector=TITLE_SEARCH_VECTOR).filter(
+            search_vector=search_query
+        ).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query, normalization=1), FloatField())
+        )
+        if after is not None:
+            after_rank, after_uuid = after
+            queryset = queryset.filter(Q(rank__lt=after_rank) | Q(rank=after_rank, book_uuid__gt=after_uuid))
+        return queryset.order_by('-rank', 'book_uuid')[:page_size + 1]
@@ -1,30 +1,131 @@
 """
 Borrow Repository
 """
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
 from infrastructure.repositories.base_repository import BaseRepository
-from infrastructure.repositories.book_repository import BookRepository
-from library.models import BorrowRecord
+from library.models import Book, BorrowRecord
+
+BORROW_COLUMNS = ('created', 'modified', 'record_uuid', 'borrow_date', 'due_date', 'book', 'user')
 
 
 class BorrowRepository(BaseRepository):
     """
     Repository for handling BorrowRecord-related database operations.
     """
+    export_fields = ('record_uuid', 'borrow_date', 'due_date', 'created', 'modified')
+    export_expressions = {'book_uuid': F('book_id'), 'user_uuid': F('user_id')}
+    compare_fields = ('book', 'user', 'borrow_date', 'due_date')
 
     def __init__(self, databases=None):
         super().__init__(model_class=BorrowRecord, databases=databases)
 
-    def create_borrow_record(self, borrow_record: BorrowRecord):
+    def _get_queryset(self, database):
         """
-        Create a new borrow record in all specified databases.
+        Get the queryset for a specific database, joining the book and user of each record
+        so listings do not issue one query per record.
+        :param database: Database identifier.
+        :return: QuerySet for the specified database.
+        """
+        return super()._get_queryset(database).select_related('book', 'user')
+
+    def create_borrow_record(self, borrow_record: BorrowRecord, ignore_conflicts=False):
+        """
+        Create a new borrow record in all specified databases and mark the book unavailable.
         :param borrow_record: BorrowRecord instance to create.
-        :return: List of results for each database operation.
+        :param ignore_conflicts: Skip the record if it already exists.
+        :return: Dictionary of inserted row counts for each database.
+        """
+        return self.create_borrow_records([borrow_record.__dict__], ignore_conflicts=ignore_conflicts)
+
+    def create_borrow_records(self, borrow_records, batch_size=None, ignore_conflicts=False):
         """
-        record_instance = borrow_record.__dict__
-        record = self.add(record_instance)
-        book_update = BookRepository()
-        book_update.update(filters={"book_uuid": record_instance["book_uuid"]}, updates={"availability_status": False})
-        return record
+        Create many borrow records in all specified databases and mark their books unavailable.
+        Each batch is a single statement per database: the records are inserted and their books
+        flipped in one data-modifying CTE, so a borrow costs one round trip and no lookups.
+        :param borrow_records: Borrow record payloads with book_uuid and user_uuid.
+        :param batch_size: Rows per statement, defaults to settings.REPOSITORY_BATCH_SIZE.
+        :param ignore_conflicts: Skip records that already exist, leaving their books untouched.
+        :return: Dictionary of inserted row counts for each database.
+        """
+        batch_size = batch_size or settings.REPOSITORY_BATCH_SIZE
+
+        def create_in(db):
+            inserted = 0
+            for start in range(0, len(borrow_records), batch_size):
+                inserted += self._insert_and_lend(db, borrow_records[start:start + batch_size], ignore_conflicts)
+            return inserted
+
+        return self._fan_out(create_in)
+
+    def _insert_and_lend(self, database, borrow_records, ignore_conflicts=False):
+        """
+        Insert borrow records and mark their books unavailable with one statement.
+        :param database: Database identifier.
+        :param borrow_records: Borrow record payloads with book_uuid and user_uuid.
+        :param ignore_conflicts: Skip records whose record_uuid already exists.
+        :return: Number of records inserted.
+        """
+        connection = connections[database]
+        quote = connection.ops.quote_name
+        fields = [self.model_class._meta.get_field(name) for name in BORROW_COLUMNS]
+        book_pk = quote(Book._meta.pk.column)
+        availability = quote(Book._meta.get_field('availability_status').column)
+        book_modified = quote(Book._meta.get_field('modified').column)
+        now = timezone.now()
+
+        params = []
+        for record in borrow_records:
+            values = {
+                'created': now,
+                'modified': now,
+                'record_uuid': record['record_uuid'],
+                'borrow_date': record['borrow_date'],
+                'due_date': record['due_date'],
+                'book': record['book_uuid'],
+                'user': record['user_uuid'],
+            }
+            params.extend(field.get_db_prep_save(values[field.name], connection) for field in fields)
+
+        row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        sql = (
+            f"WITH inserted AS ("
+            f"INSERT INTO {quote(self.model_class._meta.db_table)} "
+            f"({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES {', '.join([row] * len(borrow_records))} "
+            f"{'ON CONFLICT DO NOTHING ' if ignore_conflicts else ''}"
+            f"RETURNING {quote(self.model_class._meta.get_field('book').column)}), "
+            f"lent AS ("
+            f"UPDATE {quote(Book._meta.db_table)} SET {availability} = false, {book_modified} = %s "
+            f"WHERE {book_pk} IN (SELECT * FROM inserted)) "
+            f"SELECT count(*) FROM inserted"
+        )
+        params.append(Book._meta.get_field('modified').get_db_prep_save(now, connection))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def update_borrow_records(self, borrow_records, fields, batch_size=None):
+        """
+        Update fields of many borrow records in all specified databases with batched UPDATEs.
+        :param borrow_records: Borrow record payloads holding record_uuid and the new values.
+        :param fields: Names of the fields to update.
+        :param batch_size: Rows per UPDATE.
+        :return: Dictionary of updated row counts for each database.
+        """
+        return self.update_many(borrow_records, fields, batch_size)
+
+    def remove_borrow_records(self, record_uuids, batch_size=None):
+        """
+        Remove many borrow records from all specified databases with batched DELETEs.
+        :param record_uuids: IDs of the borrow records to remove.
+        :param batch_size: Keys per DELETE.
+        :return: Dictionary of removed record counts for each database.
+        """
+        return self.remove_many(record_uuids, batch_size)
 
     def get_borrow_record(self, user_uuid, book_uuid):
         """
@@ -35,6 +136,14 @@ class BorrowRepository(BaseRepository):
         """
         return self.get(user_id=user_uuid, book_id=book_uuid)
 
+    def list_user_borrow_records(self, user_uuid):
+        """
+        List the borrow records of a user from all specified databases.
+        :param user_uuid: User ID.
+        :return: List of the user's borrow records from all databases.
+        """
+        return self.list(user_id=user_uuid)
+
     def list_borrow_records(self):
         """
         List all borrow records from all specified databases.
@@ -42,3 +151,9 @@ class BorrowRepository(BaseRepository):
         """
         return self.list()
 
+    def iter_borrow_records(self):
+        """
+        Lazily iterate over all borrow records from all specified databases.
+        :return: Generator of borrow records from all databases.
+        """
+        return self.iterate()
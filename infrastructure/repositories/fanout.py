@@ -0,0 +1,129 @@
+"""
+Database fan-out
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+class FanOutError(Exception):
+    """
+    Raised when an operation fanned out in parallel failed on some databases.
+    Every database is still attempted, so the results of those that succeeded are kept next to the errors.
+    """
+
+    def __init__(self, results, errors):
+        """
+        Initialize the error.
+        :param results: Dictionary of results for each database that succeeded.
+        :param errors: Dictionary of exceptions for each database that failed.
+        """
+        self.results = results
+        self.errors = errors
+        super().__init__(", ".join(f"{db}: {error!r}" for db, error in errors.items()))
+
+    def __reduce__(self):
+        """
+        Pickle with the constructor arguments, so Celery can report the error of a failed task.
+        """
+        return type(self), (self.results, self.errors)
+
+
+def _executor():
+    """
+    The process-wide pool running fanned out operations, created on first use.
+    Django connections are per thread, so each pool thread holds its own connection to each database,
+    kept open from one operation to the next.
+    :return ThreadPoolExecutor:
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=settings.REPOSITORY_FANOUT_WORKERS,
+                thread_name_prefix='repository-fanout',
+            )
+    return _EXECUTOR
+
+
+def parallel(databases):
+    """
+    Tell whether an operation over the given databases should run in parallel.
+    Work inside an atomic block stays on the calling thread: a pool thread's connection
+    would run outside the caller's transaction.
+    :param databases: Database identifiers.
+    :return bool:
+    """
+    return (
+        settings.REPOSITORY_FANOUT == 'parallel'
+        and len(databases) > 1
+        and not any(connections[db].in_atomic_block for db in databases)
+    )
+
+
+def _run(operation, database):
+    """
+    Run an operation in a pool thread, then close the thread's connections an error left unusable.
+    Usable connections stay open whatever CONN_MAX_AGE says: it defaults to 0, which would open
+    a connection per database for every fanned out operation.
+    :param operation: Callable taking a database identifier.
+    :param database: Database identifier.
+    :return: Result of the operation.
+    """
+    try:
+        return operation(database)
+    finally:
+        for connection in connections.all(initialized_only=True):
+            connection.close_at = None
+            connection.close_if_unusable_or_obsolete()
+
+
+def shutdown():
+    """
+    Close the connections of the pool threads and stop them, e.g. before the databases are dropped.
+    The next fan-out starts a new pool.
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is None:
+        return
+    # Every thread waits for the others, so each one closes its own connections
+    barrier = threading.Barrier(executor._max_workers)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(executor._max_workers)]:
+        future.result()
+    executor.shutdown()
+
+
+def fan_out(databases, operation):
+    """
+    Run an operation once per database, concurrently when the parallel mode applies.
+    :param databases: Database identifiers.
+    :param operation: Callable taking a database identifier.
+    :return: Dictionary of results for each database, in the order of databases.
+    """
+    if not parallel(databases):
+        return {db: operation(db) for db in databases}
+
+    # Each operation runs in a copy of the caller's context, so per-request state such as timings follows it
+    futures = {db: _executor().submit(contextvars.copy_context().run, _run, operation, db) for db in databases}
+    results, errors = {}, {}
+    for db, future in futures.items():
+        try:
+            results[db] = future.result()
+        except Exception as e:
+            errors[db] = e
+    if errors:
+        raise FanOutError(results, errors) from next(iter(errors.values()))
+    return results
@@ -0,0 +1,62 @@
+"""
+Outbox Repository
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connections, transaction
+
+from infrastructure.repositories.base_repository import BaseRepository
+from library.models import OutboxEvent
+
+# Key of the transaction-level advisory lock held while draining, so two relays never reorder events
+OUTBOX_LOCK = 0x6f7574626f78
+
+
+class OutboxRepository(BaseRepository):
+    """
+    Repository for the events waiting in the outbox of each database.
+    """
+
+    def __init__(self, databases=None):
+        super().__init__(model_class=OutboxEvent, databases=databases)
+
+    def append(self, topic, event):
+        """
+        Write an event to the outbox, inside the caller's transaction so it commits or rolls back with the change.
+        :param topic: Event topic.
+        :param event: Event payload.
+        :return: List of results for each database operation.
+        """
+        return self.add({'topic': topic, 'payload': event})
+
+    def drain(self, database, batch_size, send):
+        """
+        Hand the oldest events of one database to send, grouped into runs of the same topic in publish order,
+        and delete them once every run was sent. If send raises, the events stay and are relayed again later.
+        :param database: Database identifier.
+        :param batch_size: Maximum number of events drained.
+        :param send: Callable taking a topic and a list of payloads.
+        :return: Number of events relayed, 0 when the outbox is empty or another relay is draining it.
+        """
+        with transaction.atomic(using=database):
+            with connections[database].cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [OUTBOX_LOCK])
+                if not cursor.fetchone()[0]:
+                    return 0
+            events = list(
+                self._get_queryset(database).order_by('id').values_list('id', 'topic', 'payload')[:batch_size]
+            )
+            for topic, group in groupby(events, key=itemgetter(1)):
+                send(topic, [payload for _, _, payload in group])
+            if events:
+                self._get_queryset(database).filter(id__in=[event_id for event_id, _, _ in events]).delete()
+        return len(events)
+
+    def pending(self, database):
+        """
+        Count the events waiting in the outbox of one database.
+        :param database: Database identifier.
+        :return int:
+        """
+        return self._get_queryset(database).count()
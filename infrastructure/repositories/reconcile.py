@@ -0,0 +1,153 @@
+"""
+Database reconciliation
+"""
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from infrastructure.repositories.fanout import fan_out
+
+# Longest primary key prefix a range can be split on: the first group of a UUID
+MAX_DEPTH = 8
+
+
+@dataclass
+class Report:
+    """
+    Outcome of a reconciliation.
+    """
+    ranges: int = 0
+    rows: int = 0
+    differing: int = 0
+    copied: dict = field(default_factory=dict)
+    deleted: dict = field(default_factory=dict)
+
+
+class Reconciler:
+    """
+    Find and repair the rows that differ between two databases of a repository.
+    Both sides hash their rows in primary key ranges; only ranges whose digests differ are split further,
+    so a mostly synchronised table is compared in a few grouped scans, and rows are only read and
+    compared in the small ranges that actually diverged.
+    Without a source database the most recently modified version of a row wins and missing rows are copied;
+    with one, the other database is made identical to it, extra rows included.
+    """
+
+    def __init__(self, repository, source=None, leaf_size=None):
+        """
+        Initialize the reconciler.
+        :param repository: Repository over exactly two databases.
+        :param source: Authoritative database, or None to keep the newest version of each row.
+        :param leaf_size: Ranges with at most this many rows are compared row by row,
+            defaults to settings.RECONCILE_LEAF_SIZE.
+        """
+        if len(repository.databases) != 2:
+            raise ValueError("Reconciliation compares exactly two databases")
+        if source is not None and source not in repository.databases:
+            raise ValueError(f"Unknown source database: {source}")
+        self.repository = repository
+        self.source = source
+        self.leaf_size = leaf_size or settings.RECONCILE_LEAF_SIZE
+
+    def diff(self, report=None):
+        """
+        Compare the two databases.
+        :param report: Report to count the compared ranges and rows in.
+        :return: Dictionary of differing primary key to {database: (row hash, modified) or None}.
+        """
+        report = report if report is not None else Report()
+        differences = {}
+        pending = ['']
+        while pending:
+            prefix = pending.pop()
+            depth = len(prefix) + 1
+            digests = fan_out(self.repository.databases, lambda db: self.repository.range_digests(db, prefix, depth))
+            left, right = (digests[db] for db in self.repository.databases)
+            report.ranges += 1
+            for bucket in left.keys() | right.keys():
+                if left.get(bucket, (0, None))[1] == right.get(bucket, (0, None))[1]:
+                    continue
+                size = max(left.get(bucket, (0,))[0], right.get(bucket, (0,))[0])
+                if size > self.leaf_size and depth < MAX_DEPTH:
+                    pending.append(bucket)
+                else:
+                    self._compare_rows(bucket, differences, report)
+        report.differing = len(differences)
+        return differences
+
+    def _compare_rows(self, prefix, differences, report):
+        """
+        Compare the rows of a range one by one and collect those that differ.
+        """
+        rows = fan_out(self.repository.databases, lambda db: self.repository.range_rows(db, prefix))
+        left, right = (rows[db] for db in self.repository.databases)
+        report.ranges += 1
+        report.rows += max(len(left), len(right))
+        for pk in left.keys() | right.keys():
+            if left.get(pk, (None,))[0] != right.get(pk, (None,))[0]:
+                differences[pk] = {db: rows[db].get(pk) for db in self.repository.databases}
+
+    def plan(self, differences):
+        """
+        Decide, for each differing row, which database it is copied from or deleted in.
+        :param differences: Result of diff().
+        :return: Tuple of {target database: primary keys to copy from the other database}
+            and {database: primary keys to delete}.
+        """
+        copies = {db: [] for db in self.repository.databases}
+        deletes = {db: [] for db in self.repository.databases}
+        for pk, versions in differences.items():
+            if self.source is not None:
+                target = self._other(self.source)
+                (copies if versions[self.source] is not None else deletes)[target].append(pk)
+                continue
+            present = [db for db, version in versions.items() if version is not None]
+            winner = max(present, key=lambda db: versions[db][1])
+            copies[self._other(winner)].append(pk)
+        return copies, deletes
+
+    def repair(self, differences, report=None):
+        """
+        Bring the differing rows in line, then drop their cached copies.
+        :param differences: Result of diff().
+        :param report: Report to count the copied and deleted rows in.
+        :return Report:
+        """
+        report = report if report is not None else Report()
+        copies, deletes = self.plan(differences)
+        batch_size = settings.REPOSITORY_BATCH_SIZE
+        for target, pks in copies.items():
+            report.copied[target] = 0
+            origin = self._other(target)
+            for start in range(0, len(pks), batch_size):
+                instances = self.repository._get_queryset(origin).filter(pk__in=pks[start:start + batch_size])
+                report.copied[target] += self.repository.upsert_many(
+                    target, instances, newer_only=self.source is None
+                )
+        for target, pks in deletes.items():
+            # A repository of the same kind over the target alone removes the rows from that side only
+            report.deleted[target] = type(self.repository)(databases=[target]).remove_many(pks)[target] if pks else 0
+
+        if differences:
+            self.repository.invalidate(*differences)
+            self.repository.invalidate_pages()
+        return report
+
+    def run(self, dry_run=False):
+        """
+        Compare the two databases and repair the differences unless dry_run.
+        :param dry_run: Only report the differences.
+        :return: Tuple of the Report and the differences.
+        """
+        report = Report()
+        differences = self.diff(report)
+        if not dry_run:
+            self.repair(differences, report)
+        return report, differences
+
+    def _other(self, database):
+        """
+        The database on the other side.
+        """
+        left, right = self.repository.databases
+        return right if database == left else left
@@ -0,0 +1,13 @@
+"""
+Repository registry
+"""
+from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.borrow_repository import BorrowRepository
+from infrastructure.repositories.user_repository import UserRepository
+
+# Repositories of the synchronised entities by name, referenced entities first
+REPOSITORIES = {
+    'books': BookRepository,
+    'users': UserRepository,
+    'borrows': BorrowRepository,
+}
@@ -0,0 +1,70 @@
+"""
+Incremental sync between databases
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from infrastructure.repositories.registry import REPOSITORIES
+from infrastructure.repositories.watermark_repository import WatermarkRepository
+
+
+def sync_entity(entity, source, target, batch_size=None, max_batches=None):
+    """
+    Copy the rows of an entity modified in the source database since the last run into the target database.
+    Rows are read in (modified, key) order in batches; each batch is written together with the new
+    watermark in one transaction of the target, so an interrupted run resumes where it stopped.
+    Rows modified during the last SYNC_SETTLE_SECONDS are left for the next run, giving transactions
+    that stamped them time to commit. A target row is only overwritten when its content differs and it
+    was not modified later. Deleted rows are not seen by the sync; the reconcile command catches them.
+    :param entity: Entity name, a key of REPOSITORIES.
+    :param source: Source database identifier.
+    :param target: Target database identifier.
+    :param batch_size: Rows per batch, defaults to settings.SYNC_BATCH_SIZE.
+    :param max_batches: Maximum number of batches, defaults to settings.SYNC_MAX_BATCHES.
+    :return: Tuple of the rows read and the rows written.
+    """
+    batch_size = batch_size or settings.SYNC_BATCH_SIZE
+    max_batches = max_batches or settings.SYNC_MAX_BATCHES
+    repository = REPOSITORIES[entity](databases=[target])
+    watermarks = WatermarkRepository(databases=[target])
+    until = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    position = watermarks.position(target, entity, source)
+
+    read = written = 0
+    for _ in range(max_batches):
+        rows = repository.changed_since(source, position, until, batch_size)
+        if not rows:
+            break
+        with transaction.atomic(using=target):
+            written += repository.upsert_many(target, rows, newer_only=True)
+            position = (rows[-1].modified, rows[-1].pk)
+            watermarks.advance(target, entity, source, *position)
+        read += len(rows)
+        repository.invalidate(*[row.pk for row in rows])
+        if len(rows) < batch_size:
+            break
+    if written:
+        repository.invalidate_pages()
+    return read, written
+
+
+def sync_databases(entities=None, databases=None, batch_size=None, max_batches=None):
+    """
+    Sync every entity in both directions between each pair of databases, referenced entities first.
+    :param entities: Entity names, defaults to all.
+    :param databases: Database identifiers, defaults to all databases.
+    :param batch_size: Rows per batch, defaults to settings.SYNC_BATCH_SIZE.
+    :param max_batches: Maximum number of batches per entity and direction, defaults to settings.SYNC_MAX_BATCHES.
+    :return: Dictionary of (entity, source, target) to the rows read and written.
+    """
+    databases = databases or list(settings.DATABASES)
+    results = {}
+    for entity in [name for name in REPOSITORIES if entities is None or name in entities]:
+        for source in databases:
+            for target in databases:
+                if source != target:
+                    results[(entity, source, target)] = sync_entity(entity, source, target, batch_size, max_batches)
+    return results
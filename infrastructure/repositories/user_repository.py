@@ -1,17 +1,25 @@
 """
 User Repository
 """
+from infrastructure.cache.entity_cache import EntityCache
 from infrastructure.repositories.base_repository import BaseRepository
 from library.models import User
+from library.validators import UserSerializer
 
 
 class UserRepository(BaseRepository):
     """
     Repository for handling User-related database operations.
     """
+    # Credentials and permission flags are never exported
+    export_fields = (
+        'user_uuid', 'username', 'email', 'firstname', 'lastname', 'is_active', 'date_joined', 'created', 'modified'
+    )
+    compare_fields = ('username', 'email', 'firstname', 'lastname', 'password', 'is_active', 'is_staff', 'is_superuser')
+    serializer_class = UserSerializer
 
     def __init__(self, databases=None):
-        super().__init__(model_class=User, databases=databases)
+        super().__init__(model_class=User, databases=databases, cache=EntityCache('user'))
 
     def enroll_user(self, user: User):
         """
@@ -21,17 +29,53 @@ class UserRepository(BaseRepository):
         """
         return self.add(user)
 
+    def enroll_users(self, users, batch_size=None, ignore_conflicts=False):
+        """
+        Enroll many users in all specified databases with batched INSERTs.
+        :param users: User payloads to enroll.
+        :param batch_size: Rows per INSERT.
+        :param ignore_conflicts: Skip users that already exist.
+        :return: Dictionary of inserted row counts for each database.
+        """
+        return self.add_many(users, batch_size, ignore_conflicts)
+
+    def update_users(self, users, fields, batch_size=None):
+        """
+        Update fields of many users in all specified databases with batched UPDATEs.
+        :param users: User payloads holding user_uuid and the new values.
+        :param fields: Names of the fields to update.
+        :param batch_size: Rows per UPDATE.
+        :return: Dictionary of updated row counts for each database.
+        """
+        return self.update_many(users, fields, batch_size)
+
+    def remove_users(self, user_uuids, batch_size=None):
+        """
+        Remove many users from all specified databases with batched DELETEs.
+        :param user_uuids: IDs of the users to remove.
+        :param batch_size: Keys per DELETE.
+        :return: Dictionary of removed user counts for each database.
+        """
+        return self.remove_many(user_uuids, batch_size)
+
     def get_user_by_id(self, user_uuid):
         """
-        Fetch a user by their ID from the first available database.
+        Fetch a user by their ID from the cache or the first available database.
         :param user_uuid: User ID.
-        :return: User instance or None if not found.
+        :return: Serialized user or None if not found.
         """
-        return self.get(user_uuid=user_uuid)
+        return self.get_cached(user_uuid)
 
     def list_users(self):
         """
         List all users from all specified databases.
         :return: List of all users from all databases.
         """
-        return self.list()
\ No newline at end of file
+        return self.list()
+
+    def iter_users(self):
+        """
+        Lazily iterate over all users from all specified databases.
+        :return: Generator of users from all databases.
+        """
+        return self.iterate()
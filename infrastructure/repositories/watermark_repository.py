@@ -0,0 +1,39 @@
+"""
+Sync Watermark Repository
+"""
+from infrastructure.repositories.base_repository import BaseRepository
+from library.models import SyncWatermark
+
+
+class WatermarkRepository(BaseRepository):
+    """
+    Repository for the incremental sync positions, kept in the database the rows are copied to.
+    """
+
+    def __init__(self, databases=None):
+        super().__init__(model_class=SyncWatermark, databases=databases)
+
+    def position(self, database, entity, source):
+        """
+        Read the resume position of the sync of an entity from a source database.
+        :param database: Target database identifier.
+        :param entity: Entity name.
+        :param source: Source database identifier.
+        :return: (modified, key) of the last row copied, or None if the entity was never synced.
+        """
+        watermark = self._get_queryset(database).filter(entity=entity, source=source).first()
+        return (watermark.modified, watermark.key) if watermark else None
+
+    def advance(self, database, entity, source, modified, key):
+        """
+        Move the resume position of the sync of an entity forward.
+        Call it in the transaction that copied the rows, so the position never gets ahead of the data.
+        :param database: Target database identifier.
+        :param entity: Entity name.
+        :param source: Source database identifier.
+        :param modified: Modification time of the last row copied.
+        :param key: Primary key of the last row copied.
+        """
+        self._get_queryset(database).update_or_create(
+            entity=entity, source=source, defaults={'modified': modified, 'key': key}
+        )
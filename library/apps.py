@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models import CharField
+
+        from library.lookups import Fuzzy
+        from shared.instrumentation import install_query_timer
+
+        CharField.register_lookup(Fuzzy)
+        connection_created.connect(install_query_timer, dispatch_uid='install_query_timer')
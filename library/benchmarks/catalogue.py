@@ -0,0 +1,136 @@
+"""
+Catalogue query benchmark
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.db import connections, transaction
+
+from infrastructure.repositories.book_repository import BookRepository
+from library.models import Book
+
+TITLE_WORDS = (
+    'river', 'shadow', 'garden', 'winter', 'empire', 'silent', 'golden', 'storm', 'island', 'machine',
+    'forest', 'letter', 'mirror', 'harbour', 'secret', 'engine', 'desert', 'candle', 'voyage', 'kingdom',
+)
+
+
+class _Rollback(Exception):
+    """
+    Raised to undo the seeded catalogue and dropped indexes once measuring is done.
+    """
+
+
+def seed_books(database, count, unavailable_ratio=0.1, batch_size=5000, seed=0):
+    """
+    Bulk insert a synthetic catalogue.
+    :param database: Database identifier.
+    :param count: Number of books to insert.
+    :param unavailable_ratio: Share of books that are lent out.
+    :param batch_size: Rows per INSERT statement.
+    :param seed: Seed for the random generator, so runs are comparable.
+    :return: Tuple of the publishers and categories used.
+    """
+    rng = random.Random(seed)
+    publishers = [f"Publisher {i}" for i in range(200)]
+    categories = [f"Category {i}" for i in range(50)]
+    for start in range(0, count, batch_size):
+        Book.objects.using(database).bulk_create([
+            Book(
+                book_uuid=uuid.UUID(int=rng.getrandbits(128), version=4),
+                title=f"The {rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {i}",
+                publisher=rng.choice(publishers),
+                category=rng.choice(categories),
+                availability_status=rng.random() >= unavailable_ratio,
+            )
+            for i in range(start, min(count, start + batch_size))
+        ])
+    return publishers, categories
+
+
+def catalogue_queries(database, publisher, category, page_size):
+    """
+    Build the first-page queries behind the catalogue endpoints, exactly as the repository runs them.
+    :param database: Database identifier.
+    :param publisher: Publisher to filter by.
+    :param category: Category to filter by.
+    :param page_size: Page size of the endpoints.
+    :return: Dictionary of query name to QuerySet.
+    """
+    repository = BookRepository(databases=[database])
+    variants = {
+        'list_available_books': {'availability_status': True},
+        'list_unavailable_books': {'availability_status': False},
+        'filter_books[publisher,category]': {
+            'availability_status': True, 'publisher': publisher, 'category': category
+        },
+        'filter_books[publisher]': {'availability_status': True, 'publisher': publisher},
+        'filter_books[category]': {'availability_status': True, 'category': category},
+    }
+    queries = {
+        name: repository._page_queryset(database, None, page_size, filters)
+        for name, filters in variants.items()
+    }
+    queries['search_books'] = repository._search_queryset(database, TITLE_WORDS[0], None, page_size)
+    return queries
+
+
+def measure(queryset, repeat):
+    """
+    Time a query and capture its plan.
+    :param queryset: QuerySet to run.
+    :param repeat: Number of timed executions.
+    :return dict:
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    plan = queryset.explain(analyze=True)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'seq_scan': f'Seq Scan on {Book._meta.db_table}' in plan,
+        'plan': plan,
+    }
+
+
+def run(database='default', books=200_000, repeat=20, page_size=50):
+    """
+    Seed a catalogue, then measure every catalogue query without and with the catalogue indexes.
+    Everything runs in one transaction that is rolled back, so the database is left untouched.
+    :param database: Database identifier.
+    :param books: Number of books to seed.
+    :param repeat: Number of timed executions per query.
+    :param page_size: Page size of the endpoints.
+    :return: Report dictionary.
+    """
+    report = {'database': database, 'books': books, 'repeat': repeat, 'page_size': page_size, 'queries': {}}
+    connection = connections[database]
+    try:
+        with transaction.atomic(using=database):
+            publishers, categories = seed_books(database, books)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Book._meta.db_table}')
+            queries = catalogue_queries(database, publishers[0], categories[0], page_size)
+
+            after = {name: measure(queryset, repeat) for name, queryset in queries.items()}
+            with connection.schema_editor() as schema_editor:
+                for index in Book._meta.indexes:
+                    schema_editor.remove_index(Book, index)
+            before = {name: measure(queryset, repeat) for name, queryset in queries.items()}
+            raise _Rollback
+    except _Rollback:
+        pass
+
+    for name in queries:
+        report['queries'][name] = {
+            'before': before[name],
+            'after': after[name],
+            'speedup': round(before[name]['median_ms'] / max(after[name]['median_ms'], 0.001), 2),
+        }
+    return report
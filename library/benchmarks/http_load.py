@@ -0,0 +1,116 @@
+"""
+HTTP load benchmark
+"""
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def rss_mb(pids):
+    """
+    Sum the resident memory of server processes, so stacks can be compared at equal memory.
+    :param pids: Process IDs, e.g. the gunicorn master and its workers.
+    :return: Resident memory in MiB, or None when it cannot be read (non-Linux hosts).
+    Processes that have exited are skipped.
+    """
+    total, read = 0, 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        read += 1
+        except (OSError, ValueError):
+            continue
+    return round(total / 1024, 1) if read else None
+
+
+def _worker(url, deadline, latencies, errors, lock):
+    """
+    Issue requests over one keep-alive connection until the deadline.
+    :param url: URL to request.
+    :param deadline: perf_counter value to stop at.
+    :param latencies: Shared list of latencies in milliseconds.
+    :param errors: Shared list holding the error count.
+    :param lock: Lock guarding the shared lists.
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=30)
+    local_latencies, local_errors = [], 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                continue
+            local_latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+
+def load(url, concurrency, duration):
+    """
+    Drive a URL with a fixed number of concurrent clients for a fixed time.
+    :param url: URL to request.
+    :param concurrency: Number of concurrent clients.
+    :param duration: Seconds to run.
+    :return dict: Throughput, latency percentiles and error count.
+    """
+    latencies, errors, lock = [], [0], threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(_worker, url, deadline, latencies, errors, lock)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(share):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * share))], 3) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3) if latencies else None,
+        'p99_ms': percentile(0.99),
+    }
+
+
+def run(targets, concurrency=50, duration=10.0, warmup=2.0, pids=None):
+    """
+    Benchmark each target in turn after a warmup, recording server memory alongside.
+    :param targets: Dictionary of name to URL, e.g. the sync and async variant of an endpoint.
+    :param concurrency: Number of concurrent clients.
+    :param duration: Seconds to measure each target.
+    :param warmup: Seconds to drive each target before measuring.
+    :param pids: Dictionary of target name to the server process IDs serving it.
+    :return: Report dictionary.
+    """
+    pids = pids or {}
+    report = {'concurrency': concurrency, 'duration': duration, 'targets': {}}
+    for name, url in targets.items():
+        if warmup:
+            load(url, concurrency, warmup)
+        result = load(url, concurrency, duration)
+        result['url'] = url
+        result['rss_mb'] = rss_mb(pids[name]) if name in pids else None
+        report['targets'][name] = result
+    return report
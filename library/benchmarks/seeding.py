@@ -0,0 +1,310 @@
+"""
+Synthetic data for benchmarks and load tests
+"""
+import hashlib
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from multiprocessing import get_context
+
+import django
+from django.db import connections
+from django.utils import timezone
+
+from infrastructure.persistence.copy import copy_from
+from library.benchmarks.catalogue import TITLE_WORDS
+from library.models import Book, BorrowRecord, User
+
+# Rows generated and loaded together; a chunk is always loaded by a single statement
+CHUNK_SIZE = 50_000
+PUBLISHERS = 500
+CATEGORIES = 60
+# Borrowers are skewed less than titles: heavy readers exist, but not to the extent of bestsellers
+USER_SKEW = 1.5
+# Records borrowed this recently are still out, the rest were returned
+OPEN_DAYS = 30
+METHODS = ('copy', 'bulk')
+# Rows per INSERT statement when loading with bulk INSERTs
+BULK_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Plan:
+    """
+    What to seed. Every row is a function of the plan and its index only,
+    so the data is the same whichever process generates it, and across databases.
+    """
+    books: int
+    users: int
+    borrows: int
+    seed: int = 0
+    # Exponent of the title popularity: 1 is uniform, 3 gives the top 1% of titles a fifth of the borrows
+    skew: float = 3.0
+    # Share of the borrows still out that are past their due date
+    overdue: float = 0.3
+    now: datetime = field(default_factory=timezone.now)
+
+
+def entity_uuid(kind, index):
+    """
+    Derive the primary key of the index-th seeded row of a kind, so rows can reference each other
+    without keeping every key in memory, and reruns produce the same keys.
+    :param kind: Entity kind, e.g. 'book'.
+    :param index: Position of the row.
+    :return uuid.UUID:
+    """
+    return uuid.UUID(bytes=hashlib.md5(f"{kind}:{index}".encode()).digest(), version=4)
+
+
+def _generators(kind, start, stop, seed):
+    """
+    Pair each index with a random generator seeded per chunk, so a chunk always holds the same rows.
+    :param kind: Entity kind.
+    :param start: First index, at the start of a chunk.
+    :param stop: Index after the last one.
+    :param seed: Seed of the random generators.
+    :return: Generator of (index, random.Random).
+    """
+    rng = None
+    for index in range(start, stop):
+        if rng is None or index % CHUNK_SIZE == 0:
+            rng = random.Random(f"{seed}:{kind}:{index // CHUNK_SIZE}")
+        yield index, rng
+
+
+def _skewed(rng, count, skew):
+    """
+    Draw an index below count, low indexes being the more likely the higher the skew.
+    """
+    return min(count - 1, int(count * rng.random() ** skew))
+
+
+def book_rows(plan, start, stop):
+    """
+    Generate seeded books, all available; seed() lends out those with an open borrow record.
+    :param plan: Plan of the seeding.
+    :param start: Index of the first book, at the start of a chunk.
+    :param stop: Index after the last book.
+    :return: Generator of column dictionaries.
+    """
+    for index, rng in _generators('book', start, stop, plan.seed):
+        yield {
+            'book_uuid': entity_uuid('book', index),
+            'title': f"The {rng.choice(TITLE_WORDS).title()} {rng.choice(TITLE_WORDS).title()} {index}",
+            'publisher': f"Publisher {_skewed(rng, PUBLISHERS, 2)}",
+            'category': f"Category {_skewed(rng, CATEGORIES, 1.5)}",
+            'availability_status': True,
+            'created': plan.now,
+            'modified': plan.now,
+        }
+
+
+def user_rows(plan, start, stop):
+    """
+    Generate seeded users who joined over the last three years.
+    :param plan: Plan of the seeding.
+    :param start: Index of the first user, at the start of a chunk.
+    :param stop: Index after the last user.
+    :return: Generator of column dictionaries.
+    """
+    for index, rng in _generators('user', start, stop, plan.seed):
+        firstname, lastname = rng.choice(TITLE_WORDS).title(), f"Reader{index}"
+        yield {
+            'user_uuid': entity_uuid('user', index),
+            'username': f"reader{index}",
+            'email': f"reader{index}@example.com",
+            'firstname': firstname,
+            'lastname': lastname,
+            'first_name': firstname,
+            'last_name': lastname,
+            # An unusable password, seeded users never log in
+            'password': '!',
+            'date_joined': plan.now - timedelta(days=rng.randrange(3 * 365)),
+            'created': plan.now,
+            'modified': plan.now,
+        }
+
+
+def borrow_rows(plan, start, stop):
+    """
+    Generate seeded borrow records over the last year.
+    Popular titles and heavy readers account for most records. Records of the last OPEN_DAYS are
+    still out, and plan.overdue of those are past their due date.
+    :param plan: Plan of the seeding.
+    :param start: Index of the first record, at the start of a chunk.
+    :param stop: Index after the last record.
+    :return: Generator of column dictionaries.
+    """
+    today = plan.now.date()
+    for index, rng in _generators('borrow', start, stop, plan.seed):
+        age = rng.randrange(365)
+        if 1 < age < OPEN_DAYS and rng.random() < plan.overdue:
+            # Still out and due before today
+            loan_days = rng.randint(max(1, age - 21), age - 1)
+        else:
+            loan_days = rng.randint(7, 28)
+            if age < OPEN_DAYS:
+                loan_days = max(loan_days, age + 1)
+        borrow_date = today - timedelta(days=age)
+        yield {
+            'record_uuid': entity_uuid('borrow', index),
+            'book': entity_uuid('book', _skewed(rng, plan.books, plan.skew)),
+            'user': entity_uuid('user', _skewed(rng, plan.users, USER_SKEW)),
+            'borrow_date': borrow_date,
+            'due_date': borrow_date + timedelta(days=loan_days),
+            'created': plan.now,
+            'modified': plan.now,
+        }
+
+
+ENTITIES = {
+    'books': (Book, 'book', book_rows),
+    'users': (User, 'user', user_rows),
+    'borrows': (BorrowRecord, 'borrow', borrow_rows),
+}
+
+
+def load(database, model, rows, method='copy', chunk_size=CHUNK_SIZE):
+    """
+    Load generated rows into the table of a model, one chunk at a time.
+    Columns missing from the rows get their field default. Values are loaded as they are,
+    so they must be plain UUIDs, strings, numbers, booleans, dates and aware datetimes.
+    :param database: Database identifier.
+    :param model: Model class.
+    :param rows: Iterable of column dictionaries keyed by field name.
+    :param method: 'copy' for COPY ... FROM STDIN, 'bulk' for batched INSERTs through the ORM.
+    :param chunk_size: Rows per COPY or INSERT.
+    :return: Number of rows loaded.
+    """
+    fields = [field for field in model._meta.concrete_fields if not field.generated]
+    defaults = {field.name: field.get_default() for field in fields}
+    connection = connections[database]
+    loaded = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while chunk := list(islice(rows, chunk_size)):
+            if method == 'bulk':
+                loaded += len(model._default_manager.using(database).bulk_create([
+                    model(**{field.attname: row.get(field.name, defaults[field.name]) for field in fields})
+                    for row in chunk
+                ], batch_size=BULK_BATCH_SIZE))
+                continue
+            # Generated values are already what Postgres parses from CSV, so they skip the per-field preparation
+            values = ([row.get(name, default) for name, default in defaults.items()] for row in chunk)
+            loaded += copy_from(cursor, model._meta.db_table, [field.column for field in fields], values)
+    return loaded
+
+
+def _missing(database, name, count):
+    """
+    Find the seeded rows of an entity not in a database yet.
+    Every chunk is loaded by a single statement, so only the last chunk of an earlier, smaller
+    seeding can be partial, and then holds a prefix of its indexes; a binary search finds its end.
+    :param database: Database identifier.
+    :param name: Entity name, a key of ENTITIES.
+    :param count: Number of rows wanted.
+    :return: List of (start, stop) index ranges to load, each within one chunk.
+    """
+    model, kind, _ = ENTITIES[name]
+    queryset = model._default_manager.using(database)
+    exists = lambda index: queryset.filter(pk=entity_uuid(kind, index)).exists()
+    ranges = []
+    for chunk in range(0, count, CHUNK_SIZE):
+        stop = min(count, chunk + CHUNK_SIZE)
+        if exists(stop - 1):
+            continue
+        low, high = chunk, stop - 1
+        while low < high:
+            middle = (low + high) // 2
+            if exists(middle):
+                low = middle + 1
+            else:
+                high = middle
+        ranges.append((low, stop))
+    return ranges
+
+
+def load_range(database, name, plan, start, stop, method='copy'):
+    """
+    Generate and load the rows of an entity in an index range of one chunk.
+    Runs in the worker processes of seed(), so it only takes picklable arguments.
+    :param database: Database identifier.
+    :param name: Entity name, a key of ENTITIES.
+    :param plan: Plan of the seeding.
+    :param start: Index of the first row.
+    :param stop: Index after the last row.
+    :param method: 'copy' or 'bulk'.
+    :return: Tuple of the entity name and the number of rows loaded.
+    """
+    model, _, rows = ENTITIES[name]
+    # Generate from the start of the chunk and drop the rows already there, so the rest come out identical
+    aligned = start - start % CHUNK_SIZE
+    return name, load(database, model, islice(rows(plan, aligned, stop), start - aligned, None), method)
+
+
+def seed(database, books, users, borrows, seed=0, processes=1, method='copy', skew=3.0, overdue=0.3):
+    """
+    Seed books, users and borrow records, lend out the books with open borrow records,
+    then refresh the planner statistics.
+    Rows seeded by an earlier run with the same seed are kept, so growing the volumes only loads the difference.
+    :param database: Database identifier, or a list of them to seed each with the same rows.
+    :param books: Number of books.
+    :param users: Number of users.
+    :param borrows: Number of borrow records, needing books and users.
+    :param seed: Seed of the random generators, so runs are comparable.
+    :param processes: Worker processes generating and loading chunks; 1 loads in this process.
+    :param method: 'copy' for COPY, 'bulk' for batched INSERTs.
+    :param skew: Popularity skew of the titles, 1 being uniform.
+    :param overdue: Share of the borrows still out that are overdue.
+    :return: Dictionary of rows loaded per entity, summed over the databases.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    if borrows and not (books and users):
+        raise ValueError("Borrow records need books and users")
+    databases = [database] if isinstance(database, str) else list(database)
+    plan = Plan(books=books, users=users, borrows=borrows, seed=seed, skew=skew, overdue=overdue)
+    loaded = dict.fromkeys(ENTITIES, 0)
+
+    executor = None
+    if processes > 1:
+        # Spawned workers set Django up before running any task, and open their own connections
+        executor = ProcessPoolExecutor(processes, mp_context=get_context('spawn'), initializer=django.setup)
+    try:
+        # Borrow records reference books and users, so those are loaded first
+        for names in (('books', 'users'), ('borrows',)):
+            tasks = [
+                (db, name, plan, start, stop, method)
+                for db in databases
+                for name in names
+                for start, stop in _missing(db, name, getattr(plan, name))
+            ]
+            if executor and tasks:
+                results = executor.map(load_range, *zip(*tasks))
+            else:
+                results = [load_range(*task) for task in tasks]
+            for name, count in results:
+                loaded[name] += count
+    finally:
+        if executor:
+            executor.shutdown()
+
+    for db in databases:
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            if loaded['borrows']:
+                cursor.execute(
+                    f"UPDATE {quote(Book._meta.db_table)} SET {quote('availability_status')} = false "
+                    f"WHERE {quote('availability_status')} AND {quote(Book._meta.pk.column)} IN ("
+                    f"SELECT {quote(BorrowRecord._meta.get_field('book').column)} "
+                    f"FROM {quote(BorrowRecord._meta.db_table)} WHERE {quote('borrow_date')} > %s)",
+                    [plan.now.date() - timedelta(days=OPEN_DAYS)]
+                )
+            if any(loaded.values()):
+                for model, _, _ in ENTITIES.values():
+                    cursor.execute(f"ANALYZE {quote(model._meta.db_table)}")
+    return loaded
@@ -0,0 +1,446 @@
+"""
+Benchmark suite for repositories, services and endpoints
+"""
+import itertools
+import re
+import statistics
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.domain.models import Book as BookRecord, User as UserRecord
+from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.borrow_repository import BorrowRepository
+from infrastructure.repositories.user_repository import UserRepository
+from library.book_service import BookService
+from library.models import Book, BorrowRecord, User
+from library.tasks import EventProcessor
+from library.user_service import UserService
+from shared.instrumentation import collect
+
+FRONTEND_URLS = 'library.endpoints.frontend_urls'
+ADMIN_URLS = 'library.endpoints.admin_urls'
+GROUPS = ('repository', 'service', 'endpoint', 'events')
+EVENT_BATCH = 100
+# Cache alias the suite runs against, so its invalidations never reach the caches the servers use
+BENCHMARK_CACHE = 'benchmark'
+# Rows deleted per statement when cleaning up after committed cases
+CLEANUP_BATCH = 1000
+
+
+class _Rollback(Exception):
+    """
+    Raised to undo the rows written by a write case once it is measured.
+    """
+
+
+@dataclass
+class Context:
+    """
+    Rows the cases operate on, picked from the benchmarked database.
+    """
+    database: str
+    book_uuid: uuid.UUID
+    available_book_uuid: uuid.UUID
+    user_uuid: uuid.UUID
+    publisher: str
+    category: str
+    word: str
+    sequence: itertools.count = field(default_factory=itertools.count)
+    # Primary keys written by committed cases, per model, for clean_up
+    created: dict = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, database):
+        """
+        Pick a borrowed book and its borrower, and an available book, so every case finds data.
+        :param database: Database identifier.
+        :return Context:
+        """
+        record = BorrowRecord.objects.using(database).select_related('book').order_by().first()
+        available = Book.objects.using(database).filter(availability_status=True).order_by().first()
+        book = record.book if record else available
+        user_uuid = record.user_id if record else User.objects.using(database).order_by().values_list(
+            'pk', flat=True
+        ).first()
+        if book is None or available is None or user_uuid is None:
+            raise ValueError(f"Database {database} needs books, available books and users to benchmark; seed it first")
+        return cls(
+            database=database,
+            book_uuid=book.pk,
+            available_book_uuid=available.pk,
+            user_uuid=user_uuid,
+            publisher=book.publisher,
+            category=book.category,
+            word=book.title.split()[-2] if len(book.title.split()) > 1 else book.title,
+        )
+
+    def unique(self):
+        """
+        A value no earlier write of the run used, for unique columns.
+        """
+        return f"{uuid.uuid4().hex[:8]}{next(self.sequence)}"
+
+    def clean_up(self):
+        """
+        Delete the rows committed cases wrote, from every database.
+        """
+        for model, keys in self.created.items():
+            for alias in settings.DATABASES:
+                for start in range(0, len(keys), CLEANUP_BATCH):
+                    model.objects.using(alias).filter(pk__in=keys[start:start + CLEANUP_BATCH]).delete()
+        self.created.clear()
+
+
+@dataclass
+class Case:
+    """
+    One measured operation.
+    build receives the Context and returns the callable that is timed.
+    Write cases run in a transaction rolled back on every database, with events written to the outbox
+    so no worker applies them. Committed write cases fan out to several databases, which only happens in
+    parallel outside a transaction: they commit, and record what they wrote in the Context for clean_up.
+    Heavy cases stream whole tables and are executed once.
+    """
+    name: str
+    group: str
+    build: Callable
+    writes: bool = False
+    committed: bool = False
+    heavy: bool = False
+    urlconf: str = None
+
+
+def _request(urlconf, method, name, kwargs=None, data=None):
+    """
+    Build a case operation issuing one request through the full middleware and view stack.
+    :param urlconf: URL configuration serving the endpoint.
+    :param method: HTTP method.
+    :param name: URL name.
+    :param kwargs: Callable of the Context returning the URL kwargs.
+    :param data: Callable of the Context returning the query parameters or the JSON body.
+    :return: Function of the Context returning the operation.
+    """
+    def build(ctx):
+        client = Client()
+        send = getattr(client, method)
+
+        def operation():
+            url = reverse(name, urlconf=urlconf, kwargs=kwargs(ctx) if kwargs else None)
+            payload = data(ctx) if data else None
+            if method == 'get':
+                response = send(url, payload)
+            else:
+                response = send(url, payload, content_type='application/json')
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method.upper()} {url} answered {response.status_code}")
+            if response.streaming:
+                _drain(response.streaming_content)
+            return response
+        return operation
+    return build
+
+
+def _drain(rows):
+    """
+    Consume an iterator without keeping its rows.
+    :param rows: Iterator, e.g. of streamed rows.
+    """
+    deque(rows, maxlen=0)
+
+
+def _events(topic, event, model, key):
+    """
+    Build a case operation processing a batch of events like the worker does, on every database.
+    :param topic: Event topic.
+    :param event: Callable of the Context returning one event payload.
+    :param model: Model the events write.
+    :param key: Callable of an event returning the primary key of the row it writes.
+    :return: Function of the Context returning the operation.
+    """
+    def build(ctx):
+        processor = EventProcessor()
+        created = ctx.created.setdefault(model, [])
+
+        def operation():
+            events = [event(ctx) for _ in range(EVENT_BATCH)]
+            created.extend(key(event) for event in events)
+            processor.process_events(topic, events)
+        return operation
+    return build
+
+
+def _book(ctx):
+    return {'book_uuid': uuid.uuid4(), 'title': f"Benchmark {ctx.unique()}", 'publisher': ctx.publisher,
+            'category': ctx.category}
+
+
+def _user(ctx):
+    unique = ctx.unique()
+    return {'user_uuid': uuid.uuid4(), 'username': f"bench{unique}", 'email': f"bench{unique}@example.com",
+            'firstname': 'Bench', 'lastname': f"Mark{unique}"}
+
+
+def _borrow(ctx):
+    today = timezone.now().date()
+    return {'record_uuid': uuid.uuid4(), 'book_uuid': ctx.available_book_uuid, 'user_uuid': ctx.user_uuid,
+            'borrow_date': today, 'due_date': today + timedelta(days=14)}
+
+
+def cases():
+    """
+    Every case of the suite.
+    :return: List of Case.
+    """
+    books = lambda ctx: BookRepository(databases=[ctx.database])
+    users = lambda ctx: UserRepository(databases=[ctx.database])
+    borrows = lambda ctx: BorrowRepository(databases=[ctx.database])
+    book_service = lambda ctx: BookService(ctx.database)
+    user_service = lambda ctx: UserService(ctx.database)
+    book_kwargs = lambda ctx: {'book_uuid': ctx.book_uuid}
+    user_kwargs = lambda ctx: {'user_uuid': ctx.user_uuid}
+    return [
+        # Repositories
+        Case('repository.get_book_by_id', 'repository',
+             lambda ctx: lambda: books(ctx).get_book_by_id(ctx.book_uuid)),
+        Case('repository.list_available_books', 'repository', lambda ctx: books(ctx).list_available_books),
+        Case('repository.list_unavailable_books', 'repository', lambda ctx: books(ctx).list_unavailable_books),
+        Case('repository.filter_books[publisher,category]', 'repository',
+             lambda ctx: lambda: books(ctx).filter_books(ctx.publisher, ctx.category)),
+        Case('repository.filter_books[fuzzy]', 'repository',
+             lambda ctx: lambda: books(ctx).filter_books(ctx.publisher[:-1], None, fuzzy=True)),
+        Case('repository.suggest_values', 'repository',
+             lambda ctx: lambda: books(ctx).suggest_values('publisher', ctx.publisher[:5], 10)),
+        Case('repository.search_books', 'repository', lambda ctx: lambda: books(ctx).search_books(ctx.word)),
+        Case('repository.get_user_by_id', 'repository',
+             lambda ctx: lambda: users(ctx).get_user_by_id(ctx.user_uuid)),
+        Case('repository.list_user_borrow_records', 'repository',
+             lambda ctx: lambda: list(borrows(ctx).list_user_borrow_records(ctx.user_uuid))),
+        Case('repository.get_borrow_record', 'repository',
+             lambda ctx: lambda: borrows(ctx).get_borrow_record(ctx.user_uuid, ctx.book_uuid)),
+        Case('repository.iter_users', 'repository', lambda ctx: lambda: _drain(users(ctx).iter_users()), heavy=True),
+        Case('repository.iter_borrow_records', 'repository',
+             lambda ctx: lambda: _drain(borrows(ctx).iter_borrow_records()), heavy=True),
+        Case('repository.add_book', 'repository', lambda ctx: lambda: books(ctx).add_book(_book(ctx)), writes=True),
+        Case('repository.add_books[100]', 'repository',
+             lambda ctx: lambda: books(ctx).add_books([_book(ctx) for _ in range(100)]), writes=True),
+        Case('repository.enroll_user', 'repository',
+             lambda ctx: lambda: users(ctx).enroll_user(_user(ctx)), writes=True),
+        Case('repository.create_borrow_record', 'repository',
+             lambda ctx: lambda: borrows(ctx).create_borrow_records([_borrow(ctx)]), writes=True),
+        # Services
+        Case('service.list_available_books', 'service', lambda ctx: book_service(ctx).list_available_books),
+        Case('service.list_unavailable_books', 'service', lambda ctx: book_service(ctx).list_unavailable_books),
+        Case('service.filter_books', 'service',
+             lambda ctx: lambda: book_service(ctx).filter_books(ctx.publisher, ctx.category)),
+        Case('service.autocomplete', 'service',
+             lambda ctx: lambda: book_service(ctx).autocomplete('category', ctx.category[:5])),
+        Case('service.search_books', 'service', lambda ctx: lambda: book_service(ctx).search_books(ctx.word)),
+        Case('service.get_book_by_id', 'service', lambda ctx: lambda: book_service(ctx).get_book_by_id(ctx.book_uuid)),
+        Case('service.get_book_availability', 'service',
+             lambda ctx: lambda: book_service(ctx).get_book_availability(ctx.book_uuid)),
+        Case('service.get_user_borrow_records', 'service',
+             lambda ctx: lambda: user_service(ctx).get_user_borrow_records(ctx.user_uuid)),
+        Case('service.stream_users', 'service', lambda ctx: lambda: _drain(user_service(ctx).stream_users()),
+             heavy=True),
+        Case('service.stream_borrowed_books', 'service',
+             lambda ctx: lambda: _drain(book_service(ctx).stream_borrowed_books()), heavy=True),
+        Case('service.add_new_book', 'service',
+             lambda ctx: lambda: book_service(ctx).add_new_book(BookRecord(**_book(ctx))), writes=True),
+        Case('service.enroll_user', 'service', lambda ctx: lambda: user_service(ctx).enroll_user(
+            UserRecord(**{key: value for key, value in _user(ctx).items() if key != 'username'})
+        ), writes=True),
+        Case('service.borrow_book', 'service',
+             lambda ctx: lambda: book_service(ctx).borrow_book(ctx.user_uuid, ctx.available_book_uuid, 14),
+             writes=True),
+        # Endpoints
+        Case('endpoint.book-list', 'endpoint', _request(FRONTEND_URLS, 'get', 'book-list'), urlconf=FRONTEND_URLS),
+        Case('endpoint.book-filter', 'endpoint', _request(
+            FRONTEND_URLS, 'get', 'book-filter', data=lambda ctx: {'publisher': ctx.publisher, 'category': ctx.category}
+        ), urlconf=FRONTEND_URLS),
+        Case('endpoint.book-search', 'endpoint', _request(
+            FRONTEND_URLS, 'get', 'book-search', data=lambda ctx: {'q': ctx.word}
+        ), urlconf=FRONTEND_URLS),
+        Case('endpoint.book-autocomplete', 'endpoint', _request(
+            FRONTEND_URLS, 'get', 'book-autocomplete', data=lambda ctx: {'field': 'publisher', 'q': ctx.publisher[:5]}
+        ), urlconf=FRONTEND_URLS),
+        Case('endpoint.book-detail', 'endpoint', _request(FRONTEND_URLS, 'get', 'book-detail', book_kwargs),
+             urlconf=FRONTEND_URLS),
+        Case('endpoint.book-availability', 'endpoint',
+             _request(FRONTEND_URLS, 'get', 'book-availability', book_kwargs), urlconf=FRONTEND_URLS),
+        Case('endpoint.user-borrow-records', 'endpoint',
+             _request(FRONTEND_URLS, 'get', 'user-borrow-records', user_kwargs), urlconf=FRONTEND_URLS),
+        Case('endpoint.async-book-list', 'endpoint', _request(FRONTEND_URLS, 'get', 'async-book-list'),
+             urlconf=FRONTEND_URLS),
+        Case('endpoint.borrowed-book-list[stream]', 'endpoint', _request(
+            FRONTEND_URLS, 'get', 'borrowed-book-list', data=lambda ctx: {'stream': 1}
+        ), urlconf=FRONTEND_URLS, heavy=True),
+        Case('endpoint.borrow-book', 'endpoint', _request(FRONTEND_URLS, 'post', 'borrow-book', data=lambda ctx: {
+            'user_uuid': str(ctx.user_uuid), 'book_uuid': str(ctx.available_book_uuid), 'days': 14
+        }), urlconf=FRONTEND_URLS, writes=True),
+        Case('endpoint.enroll-user', 'endpoint', _request(FRONTEND_URLS, 'post', 'enroll-user', data=lambda ctx: {
+            key: value for key, value in _user(ctx).items() if key in ('email', 'firstname', 'lastname')
+        }), urlconf=FRONTEND_URLS, writes=True),
+        Case('endpoint.unavailable-books', 'endpoint', _request(ADMIN_URLS, 'get', 'unavailable-books'),
+             urlconf=ADMIN_URLS),
+        Case('endpoint.user-borrowed-books', 'endpoint',
+             _request(ADMIN_URLS, 'get', 'user-borrowed-books', user_kwargs), urlconf=ADMIN_URLS),
+        Case('endpoint.user-list[stream]', 'endpoint', _request(
+            ADMIN_URLS, 'get', 'user-list', data=lambda ctx: {'stream': 1}
+        ), urlconf=ADMIN_URLS, heavy=True),
+        Case('endpoint.add-book', 'endpoint', _request(ADMIN_URLS, 'post', 'add-book', data=lambda ctx: {
+            key: value for key, value in _book(ctx).items() if key != 'book_uuid'
+        }), urlconf=ADMIN_URLS, writes=True),
+        # Worker
+        Case(f'events.book_events.add[{EVENT_BATCH}]', 'events', _events(
+            'book_events', lambda ctx: {'action': 'add', 'book': _book(ctx)},
+            Book, lambda event: event['book']['book_uuid'],
+        ), writes=True, committed=True),
+        Case(f'events.enroll_events.add[{EVENT_BATCH}]', 'events', _events(
+            'enroll_events', lambda ctx: {'action': 'add', 'user': _user(ctx)},
+            User, lambda event: event['user']['user_uuid'],
+        ), writes=True, committed=True),
+    ]
+
+
+def measure(operation, repeat, warmup):
+    """
+    Time an operation, then count the queries one more execution issues on every database,
+    fanned out ones run by pool threads included.
+    :param operation: Callable to measure.
+    :param repeat: Number of timed executions.
+    :param warmup: Number of untimed executions first, filling caches and connections.
+    :return dict:
+    """
+    for _ in range(warmup):
+        operation()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    with collect() as collected:
+        operation()
+    queries = {alias: collected.queries.get(alias, (0, 0.0))[0] for alias in settings.DATABASES}
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+        'runs': repeat,
+        'queries': sum(queries.values()),
+        'queries_by_database': queries,
+    }
+
+
+def _rolled_back(function):
+    """
+    Call a function in a transaction on every database, then roll them all back.
+    :param function: Callable to run.
+    :return: Result of the function.
+    """
+    result = None
+    try:
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(transaction.atomic(using=alias))
+            result = function()
+            raise _Rollback
+    except _Rollback:
+        pass
+    return result
+
+
+def run_case(case, ctx, repeat, warmup):
+    """
+    Measure one case.
+    :param case: Case to measure.
+    :param ctx: Context of the run.
+    :param repeat: Number of timed executions, one for heavy cases.
+    :param warmup: Number of untimed executions, none for heavy cases.
+    :return dict:
+    """
+    repeat, warmup = (1, 0) if case.heavy else (repeat, warmup)
+    with ExitStack() as stack:
+        if case.urlconf:
+            stack.enter_context(override_settings(ROOT_URLCONF=case.urlconf, ALLOWED_HOSTS=['*']))
+        if case.committed:
+            stack.callback(ctx.clean_up)
+            result = measure(case.build(ctx), repeat, warmup)
+        elif case.writes:
+            stack.enter_context(override_settings(EVENT_PUBLISH_MODE='outbox'))
+            result = _rolled_back(lambda: measure(case.build(ctx), repeat, warmup))
+        else:
+            result = measure(case.build(ctx), repeat, warmup)
+    return {'group': case.group, **result}
+
+
+def run(database='default', repeat=20, warmup=3, only=None, cache=True, progress=None):
+    """
+    Measure every case of the suite against the data already in a database.
+    :param database: Database identifier the repository and service cases read from.
+    :param repeat: Number of timed executions per case.
+    :param warmup: Number of untimed executions per case.
+    :param only: Regular expression selecting the cases to run by name.
+    :param cache: Measure with the BENCHMARK_CACHE cache, or the default one under a separate key prefix when it is
+        not configured; when False caching is disabled, measuring the database path.
+    :param progress: Callable receiving the name and result of each measured case.
+    :return: Dictionary of case name to result.
+    """
+    pattern = re.compile(only) if only else None
+    results = {}
+    with ExitStack() as stack:
+        if cache:
+            benchmark_cache = settings.CACHES.get(
+                BENCHMARK_CACHE, {**settings.CACHES['default'], 'KEY_PREFIX': BENCHMARK_CACHE}
+            )
+            stack.enter_context(override_settings(CACHES={**settings.CACHES, 'default': benchmark_cache}))
+        else:
+            stack.enter_context(override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            ))
+        ctx = Context.load(database)
+        for case in cases():
+            if pattern and not pattern.search(case.name):
+                continue
+            results[case.name] = run_case(case, ctx, repeat, warmup)
+            if progress:
+                progress(case.name, results[case.name])
+    return results
+
+
+def compare(current, baseline, threshold=0.2, min_delta_ms=1.0):
+    """
+    Find the cases that got slower or issue more queries than in a baseline run.
+    :param current: Results of this run.
+    :param baseline: Results of the baseline run.
+    :param threshold: Relative median slowdown tolerated, 0.2 being 20%.
+    :param min_delta_ms: Absolute median slowdown tolerated, so noise on sub-millisecond cases is ignored.
+    :return: List of regression dictionaries with the case name and the reason.
+    """
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slowdown = result['median_ms'] - before['median_ms']
+        if result['median_ms'] > before['median_ms'] * (1 + threshold) and slowdown >= min_delta_ms:
+            regressions.append({
+                'name': name, 'metric': 'median_ms', 'baseline': before['median_ms'], 'current': result['median_ms']
+            })
+        if result['queries'] > before['queries']:
+            regressions.append({
+                'name': name, 'metric': 'queries', 'baseline': before['queries'], 'current': result['queries']
+            })
+    return regressions
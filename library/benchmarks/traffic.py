@@ -0,0 +1,341 @@
+"""
+Replayable HTTP traffic for load tests
+"""
+import http.client
+import itertools
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, replace
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connections
+from django.urls import reverse
+
+from library.models import Book, User
+
+FRONTEND_URLS = 'library.endpoints.frontend_urls'
+ADMIN_URLS = 'library.endpoints.admin_urls'
+
+# Endpoint name to (API, relative weight in the default mix)
+ENDPOINTS = {
+    'book-list': ('frontend', 30),
+    'book-filter': ('frontend', 15),
+    'book-detail': ('frontend', 20),
+    'book-availability': ('frontend', 15),
+    'borrow-book': ('frontend', 5),
+    'enroll-user': ('frontend', 5),
+    'unavailable-books': ('admin', 5),
+    'user-borrowed-books': ('admin', 5),
+}
+URLCONFS = {'frontend': FRONTEND_URLS, 'admin': ADMIN_URLS}
+# Methods a request can be sent again with, if a server received it already, without changing the outcome
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+@dataclass
+class Sample:
+    """
+    Keys and values the generated requests pick from.
+    """
+    books: list
+    available_books: list
+    users: list
+    publishers: list
+    categories: list
+
+    @classmethod
+    def load(cls, database, size=1000):
+        """
+        Sample rows of a database with TABLESAMPLE, so large tables are not scanned.
+        :param database: Database identifier.
+        :param size: Maximum number of rows sampled per table.
+        :return Sample:
+        """
+        connection = connections[database]
+        quote = connection.ops.quote_name
+
+        def sample(model, *columns):
+            table = quote(model._meta.db_table)
+            with connection.cursor() as cursor:
+                # The planner estimate is enough to size the sample, and costs nothing on large tables
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+                estimate = cursor.fetchone()[0]
+                percent = 100.0 if estimate <= 0 else min(100.0, 100.0 * size * 4 / estimate)
+                cursor.execute(
+                    f"SELECT {', '.join(quote(column) for column in columns)} "
+                    f"FROM {table} TABLESAMPLE SYSTEM (%s) LIMIT %s",
+                    [percent, size]
+                )
+                return cursor.fetchall()
+
+        books = sample(Book, Book._meta.pk.column, 'publisher', 'category', 'availability_status')
+        users = sample(User, User._meta.pk.column)
+        if not books or not users:
+            raise ValueError(f"Database {database} needs books and users to generate traffic; seed it first")
+        return cls(
+            books=[str(pk) for pk, *_ in books],
+            available_books=[str(pk) for pk, _, _, available in books if available] or [str(books[0][0])],
+            users=[str(pk) for pk, in users],
+            publishers=sorted({publisher for _, publisher, _, _ in books}),
+            categories=sorted({category for _, _, category, _ in books}),
+        )
+
+
+@dataclass
+class Request:
+    """
+    One request of a load test, at an offset in seconds from its start.
+    Paths are relative to the base URL of their API, so a log can be replayed against other servers.
+    """
+    offset: float
+    name: str
+    api: str
+    method: str
+    path: str
+    body: dict = None
+
+
+@dataclass
+class Result:
+    """
+    Outcome of a request. Latency runs from the time the request was due, not the time it was sent,
+    so a server that falls behind shows its queueing delay instead of hiding it.
+    """
+    request: Request
+    status: int = None
+    latency_ms: float = None
+    service_ms: float = None
+    error: str = None
+
+
+def _enrollment(unique):
+    """
+    Body of an enroll request.
+    :param unique: Value unique in the run, for the email.
+    :return dict:
+    """
+    return {'email': f"load-{unique}@example.com", 'firstname': 'Load', 'lastname': f"Test{unique}"}
+
+
+def _build(name, sample, rng, unique):
+    """
+    Build a request to an endpoint with random but valid parameters.
+    :param name: Endpoint name, a key of ENDPOINTS.
+    :param sample: Sample to pick keys and values from.
+    :param rng: Random generator.
+    :param unique: Value unique in the run, for enrolled emails.
+    :return: Tuple of the method, the path and the body.
+    """
+    api = ENDPOINTS[name][0]
+    urlconf = URLCONFS[api]
+    if name == 'book-list':
+        return 'GET', reverse(name, urlconf=urlconf), None
+    if name == 'book-filter':
+        query = {'publisher': rng.choice(sample.publishers)}
+        if rng.random() < 0.5:
+            query['category'] = rng.choice(sample.categories)
+        return 'GET', f"{reverse(name, urlconf=urlconf)}?{urlencode(query)}", None
+    if name in ('book-detail', 'book-availability'):
+        return 'GET', reverse(name, urlconf=urlconf, kwargs={'book_uuid': rng.choice(sample.books)}), None
+    if name == 'user-borrowed-books':
+        return 'GET', reverse(name, urlconf=urlconf, kwargs={'user_uuid': rng.choice(sample.users)}), None
+    if name == 'unavailable-books':
+        return 'GET', reverse(name, urlconf=urlconf), None
+    if name == 'borrow-book':
+        body = {'user_uuid': rng.choice(sample.users), 'book_uuid': rng.choice(sample.available_books),
+                'days': rng.randint(7, 28)}
+        return 'POST', reverse(name, urlconf=urlconf), body
+    if name == 'enroll-user':
+        return 'POST', reverse(name, urlconf=urlconf), _enrollment(unique)
+    raise ValueError(f"Unknown endpoint: {name}")
+
+
+def generate(mix, sample, rate, duration, seed=0):
+    """
+    Generate the requests of a load test: endpoints drawn by weight, evenly spaced at the target rate.
+    :param mix: Dictionary of endpoint name to relative weight.
+    :param sample: Sample to pick keys and values from.
+    :param rate: Target requests per second.
+    :param duration: Seconds of traffic.
+    :param seed: Seed of the random generator, so a mix can be regenerated identically.
+    :return: List of Request.
+    """
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    rng = random.Random(seed)
+    run = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    names, weights = zip(*[(name, weight) for name, weight in mix.items() if weight > 0])
+    requests = []
+    for index in range(int(rate * duration)):
+        name = rng.choices(names, weights)[0]
+        method, path, body = _build(name, sample, rng, f"{run}-{index}")
+        requests.append(Request(round(index / rate, 6), name, ENDPOINTS[name][0], method, path, body))
+    return requests
+
+
+def _send(clients, bases, request):
+    """
+    Send a request over the keep-alive connection of its API.
+    When a reused connection the server has closed in the meantime fails, the request is sent once more on a new
+    one, unless the request went out and its method is not idempotent: the server may have applied it already.
+    :param clients: Dictionary of API name to the open connection of the calling client.
+    :param bases: Dictionary of API name to the split base URL.
+    :param request: Request to send.
+    :return: HTTP status.
+    """
+    base = bases[request.api]
+    body = json.dumps(request.body) if request.body is not None else None
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    while True:
+        reused = request.api in clients
+        if not reused:
+            connection_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+            clients[request.api] = connection_class(base.netloc, timeout=30)
+        connection = clients[request.api]
+        sent = False
+        try:
+            connection.request(request.method, base.path.rstrip('/') + request.path, body=body, headers=headers)
+            sent = True
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            del clients[request.api]
+            if not reused or (sent and request.method not in IDEMPOTENT_METHODS):
+                raise
+
+
+def drive(requests, bases, concurrency=32, speed=1.0):
+    """
+    Send requests at their offsets from a pool of clients, each holding keep-alive connections.
+    The schedule is open: a slow server does not slow the arrivals, requests just queue for a free client.
+    :param requests: Requests, by offset.
+    :param bases: Dictionary of API name to base URL, e.g. {'frontend': 'http://localhost:3030/library/'}.
+    :param concurrency: Number of clients, bounding the requests in flight.
+    :param speed: Replay speed, 2 sending the requests twice as fast as their offsets say.
+    :return: Tuple of the Results, in request order, and the elapsed seconds.
+    """
+    bases = {api: urlsplit(url) for api, url in bases.items()}
+    results = [Result(request) for request in requests]
+    counter = itertools.count()
+    start = time.perf_counter()
+
+    def client():
+        clients = {}
+        try:
+            while (index := next(counter)) < len(results):
+                result = results[index]
+                due = start + result.request.offset / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                sent = time.perf_counter()
+                try:
+                    result.status = _send(clients, bases, result.request)
+                except (OSError, http.client.HTTPException) as error:
+                    result.error = type(error).__name__
+                done = time.perf_counter()
+                result.latency_ms = round((done - due) * 1000, 3)
+                result.service_ms = round((done - sent) * 1000, 3)
+        finally:
+            for connection in clients.values():
+                connection.close()
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def _percentile(values, share):
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    return values[min(len(values) - 1, int(len(values) * share))] if values else None
+
+
+def summarize(results, elapsed):
+    """
+    Aggregate results per endpoint and overall.
+    :param results: Results of drive().
+    :param elapsed: Elapsed seconds of drive().
+    :return: Dictionary of endpoint name, and 'total', to throughput, latency percentiles and status counts.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(result.request.name, []).append(result)
+    groups['total'] = results
+
+    summary = {}
+    for name, group in groups.items():
+        latencies = sorted(result.latency_ms for result in group if result.status is not None)
+        statuses = {}
+        for result in group:
+            key = str(result.status) if result.status is not None else result.error
+            statuses[key] = statuses.get(key, 0) + 1
+        summary[name] = {
+            'requests': len(group),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'errors': sum(1 for result in group if result.status is None or result.status >= 500),
+            'rejected': sum(1 for result in group if result.status is not None and 400 <= result.status < 500),
+            'p50_ms': round(statistics.median(latencies), 3) if latencies else None,
+            'p90_ms': _percentile(latencies, 0.90),
+            'p99_ms': _percentile(latencies, 0.99),
+            'max_ms': latencies[-1] if latencies else None,
+            'statuses': statuses,
+        }
+    return summary
+
+
+def write_log(path, results):
+    """
+    Record requests, with their outcome, as JSON lines.
+    :param path: File to write.
+    :param results: Results of drive(), or Requests not sent yet.
+    """
+    with open(path, 'w') as file:
+        for result in results:
+            if isinstance(result, Request):
+                line = asdict(result)
+            else:
+                line = {**asdict(result.request), 'status': result.status, 'latency_ms': result.latency_ms,
+                        'error': result.error}
+            file.write(json.dumps(line) + '\n')
+
+
+def read_log(path):
+    """
+    Read the requests of a recorded log, ignoring their recorded outcome.
+    :param path: File written by write_log().
+    :return: List of Request, by offset.
+    """
+    fields = Request.__dataclass_fields__
+    with open(path) as file:
+        requests = [
+            Request(**{key: value for key, value in json.loads(line).items() if key in fields})
+            for line in file if line.strip()
+        ]
+    return sorted(requests, key=lambda request: request.offset)
+
+
+def renew(requests, run=None):
+    """
+    Give the enroll requests of a replayed log new emails: the recorded ones are enrolled already,
+    by the recorded run or an earlier replay, and enrolling them again is rejected.
+    :param requests: Requests read from a log.
+    :param run: Value making the emails unique, random by default.
+    :return: List of Request.
+    """
+    run = run or uuid.uuid4().hex[:8]
+    return [
+        replace(request, body=_enrollment(f"{run}-{index}")) if request.name == 'enroll-user' else request
+        for index, request in enumerate(requests)
+    ]
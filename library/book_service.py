@@ -3,12 +3,15 @@ Application services
 """
 import uuid
 
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 
 from core.domain.models import Book, BorrowRecord
 from core.domain.services import LibraryService
-from library.serializers import BookSerializer, BorrowRecordSerializer
-from library.validators import BorrowSerializer
+from shared.instrumentation import timed
+from shared.pagination import encode_cursor
+from library.serializers import BorrowRecordSerializer, to_domain_book
+from library.validators import AutocompleteSerializer, BorrowSerializer, FilterSerializer, PageSerializer, \
+    SearchSerializer
 from infrastructure.persistence.base_postgres_handler import PostgresHandlerFrontend, PostgresHandlerAdmin
 
 class BookService:
@@ -24,14 +27,27 @@ class BookService:
         self.default_db = self.active_db[default_db]()
         self.library_service = LibraryService()
 
-    def list_available_books(self):
+    def list_available_books(self, cursor=None, page_size=None):
         """
-        List all available books from the frontend database.
-        :return: Serialized data of available books.
+        List a page of available books from the frontend database.
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Serialized page of available books.
         """
-        books = self.default_db.list_available_books()
-        serializer = BookSerializer(books, many=True)
-        return serializer.data
+        after, page_size = self._validate_page(cursor, page_size)
+        page = self.default_db.list_available_books(after, page_size)
+        return self._serialize_page(page)
+
+    async def alist_available_books(self, cursor=None, page_size=None):
+        """
+        Async version of list_available_books.
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Serialized page of available books.
+        """
+        after, page_size = self._validate_page(cursor, page_size)
+        page = await self.default_db.alist_available_books(after, page_size)
+        return self._serialize_page(page)
 
     def borrow_book(self, user_uuid: uuid, book_uuid: uuid, days: int):
         """
@@ -76,8 +92,18 @@ class BookService:
         :return: Serialized data of borrowed books.
         """
         borrowed_books = self.default_db.list_borrow_records()
-        serializer = BorrowRecordSerializer(borrowed_books, many=True)
-        return serializer.data
+        with timed('serialize'):
+            serializer = BorrowRecordSerializer(borrowed_books, many=True)
+            return serializer.data
+
+    def stream_borrowed_books(self):
+        """
+        Lazily serialize every borrowed book record, one row at a time.
+        :return: Generator of serialized borrow records.
+        """
+        serializer = BorrowRecordSerializer()
+        for record in self.default_db.iter_borrow_records():
+            yield serializer.to_representation(record)
 
     def get_book_availability(self, book_uuid: uuid) -> bool:
         """
@@ -85,19 +111,86 @@ class BookService:
         :param book_uuid:
         :return bool:
         """
-        book = self.default_db.get_book_by_id(book_uuid)
-        return self.library_service.is_book_available(book)
+        book = self._found(self.default_db.get_book_by_id(book_uuid))
+        return self.library_service.is_book_available(to_domain_book(book))
 
-    def filter_books(self, publisher: str, category: str) -> bool:
+    async def aget_book_availability(self, book_uuid: uuid) -> bool:
         """
-        Check if a book is available for borrowing based on publisher and category.
+        Async version of get_book_availability.
+        :param book_uuid:
+        :return bool:
+        """
+        book = self._found(await self.default_db.aget_book_by_id(book_uuid))
+        return self.library_service.is_book_available(to_domain_book(book))
+
+    def filter_books(self, publisher: str, category: str, cursor=None, page_size=None, match=None):
+        """
+        List a page of available books based on publisher and category.
         :param publisher:
         :param category:
-        :return bool:
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :param match: 'exact' (default) or 'fuzzy' to tolerate typos and partial values.
+        :return: Serialized page of filtered books.
+        """
+        after, page_size, fuzzy = self._validate_filter(cursor, page_size, match)
+        page = self.default_db.filter_books(publisher, category, after, page_size, fuzzy)
+        return self._serialize_page(page)
+
+    async def afilter_books(self, publisher: str, category: str, cursor=None, page_size=None, match=None):
+        """
+        Async version of filter_books.
+        :param publisher:
+        :param category:
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :param match: 'exact' (default) or 'fuzzy' to tolerate typos and partial values.
+        :return: Serialized page of filtered books.
         """
-        book_list = self.default_db.filter_books(publisher, category)
-        serializer = BookSerializer(book_list, many=True)
-        return serializer.data
+        after, page_size, fuzzy = self._validate_filter(cursor, page_size, match)
+        page = await self.default_db.afilter_books(publisher, category, after, page_size, fuzzy)
+        return self._serialize_page(page)
+
+    def autocomplete(self, field: str, query: str, limit=None):
+        """
+        Suggest publisher or category values for a partial input.
+        :param field: 'publisher' or 'category'.
+        :param query: Partial, possibly misspelt, input.
+        :param limit: Maximum number of suggestions.
+        :return: List of suggested values with their number of books.
+        """
+        data = {key: value for key, value in (('field', field), ('q', query), ('limit', limit)) if value is not None}
+        serializer = AutocompleteSerializer(data=data)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        return self.default_db.suggest_values(
+            serializer.validated_data['field'],
+            serializer.validated_data['q'],
+            serializer.validated_data['limit'],
+        )
+
+    def search_books(self, query: str, cursor=None, page_size=None):
+        """
+        Search book titles, best matches first.
+        :param query: Search terms, in web search syntax.
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Serialized page of matching books.
+        """
+        data = {'q': query if query is not None else ''}
+        if cursor is not None:
+            data['cursor'] = cursor
+        if page_size is not None:
+            data['page_size'] = page_size
+        serializer = SearchSerializer(data=data)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        page = self.default_db.search_books(
+            serializer.validated_data['q'],
+            serializer.validated_data.get('cursor'),
+            serializer.validated_data.get('page_size'),
+        )
+        return self._serialize_page(page)
 
     def get_book_by_id(self, book_uuid: uuid):
         """
@@ -105,15 +198,84 @@ class BookService:
         :param book_uuid:
         :return: Serialized book data.
         """
-        book = self.default_db.get_book_by_id(book_uuid)
-        serializer = BookSerializer(book)
-        return serializer.data
+        # Books come serialized from the repository, and from the cache on a hit
+        return self._found(self.default_db.get_book_by_id(book_uuid))
+
+    async def aget_book_by_id(self, book_uuid: uuid):
+        """
+        Async version of get_book_by_id.
+        :param book_uuid:
+        :return: Serialized book data.
+        """
+        # Books come serialized from the repository, and from the cache on a hit
+        return self._found(await self.default_db.aget_book_by_id(book_uuid))
+
+    def list_unavailable_books(self, cursor=None, page_size=None):
+        """
+        List a page of books that are not available for borrowing.
+        :param cursor: Opaque cursor returned as `next` by the previous page.
+        :param page_size: Maximum number of books to return.
+        :return: Serialized page of unavailable books.
+        """
+        after, page_size = self._validate_page(cursor, page_size)
+        page = self.default_db.list_unavailable_books(after, page_size)
+        return self._serialize_page(page)
+
+    @staticmethod
+    def _found(book):
+        """
+        Check a book was found.
+        :param book: Serialized book or None.
+        :return: The serialized book.
+        :raises NotFound: If the book does not exist.
+        """
+        if book is None:
+            raise NotFound("Book not found.")
+        return book
+
+    @staticmethod
+    def _validate_page(cursor, page_size):
+        """
+        Validate pagination input.
+        :param cursor:
+        :param page_size:
+        :return: Tuple of the key to continue after and the page size.
+        """
+        data = {}
+        if cursor is not None:
+            data['cursor'] = cursor
+        if page_size is not None:
+            data['page_size'] = page_size
+        serializer = PageSerializer(data=data)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        return serializer.validated_data.get('cursor'), serializer.validated_data.get('page_size')
+
+    @staticmethod
+    def _validate_filter(cursor, page_size, match):
+        """
+        Validate catalogue filter input.
+        :param cursor:
+        :param page_size:
+        :param match:
+        :return: Tuple of the key to continue after, the page size and whether to match fuzzily.
+        """
+        data = {key: value for key, value in
+                (('cursor', cursor), ('page_size', page_size), ('match', match)) if value is not None}
+        serializer = FilterSerializer(data=data)
+        if not serializer.is_valid():
+            raise ValidationError(serializer.errors)
+        return (
+            serializer.validated_data.get('cursor'),
+            serializer.validated_data.get('page_size'),
+            serializer.validated_data['match'] == 'fuzzy',
+        )
 
-    def list_unavailable_books(self):
+    @staticmethod
+    def _serialize_page(page):
         """
-        List all books that are not available for borrowing.
-        :return: Serialized data of unavailable books.
+        Render a page of books, serialized by the repository, together with the cursor for the next page.
+        :param page:
+        :return: Serialized page.
         """
-        unavailable_books = self.default_db.list_unavailable_books()
-        serializer = BookSerializer(unavailable_books, many=True)
-        return serializer.data
+        return {"results": page.items, "next": encode_cursor(page.next_key)}
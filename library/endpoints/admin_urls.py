@@ -4,6 +4,7 @@ Admin API URLs module
 from django.urls import path
 
 from library.views.book_vews import AddBookView, UnavailableBooksView, RemoveBookView, BorrowedBookListView
+from library.views.metrics_views import CacheMetricsView, EventMetricsView
 from library.views.user_views import UserListView, UserBorrowedBooksView
 
 urlpatterns = [
@@ -19,4 +20,8 @@ urlpatterns = [
     path('users/<uuid:user_uuid>/borrowed/', UserBorrowedBooksView.as_view(), name='user-borrowed-books'),
     # List users and the books they have borrowed
     path('users/borrowed/', BorrowedBookListView.as_view(), name='borrowed-books'),
+    # Event pipeline metrics in the Prometheus text format, to alert on replication lag
+    path('metrics/events/', EventMetricsView.as_view(), name='event-metrics'),
+    # Cache hit, miss, invalidation and error counts in the Prometheus text format
+    path('metrics/caches/', CacheMetricsView.as_view(), name='cache-metrics'),
 ]
@@ -4,7 +4,10 @@ Frontend API URLs module
 from django.urls import path
 
 from library.views.book_vews import BookListView, BorrowBookView, BorrowedBookListView, \
-    BookAvailabilityView, BookDetailView, BookFilterView
+    BookAvailabilityView, BookDetailView, BookFilterView, BookSearchView, \
+    BookAutocompleteView
+from library.views.async_book_views import AsyncBookListView, AsyncBookDetailView, AsyncBookAvailabilityView, \
+    AsyncBookFilterView
 from library.views.user_views import EnrollUserView, UserBorrowRecordsView
 
 urlpatterns = [
@@ -16,6 +19,10 @@ urlpatterns = [
     path('books/<uuid:book_uuid>/', BookDetailView.as_view(), name='book-detail'),
     # Filter books by publishers and categories
     path('books/filter/', BookFilterView.as_view(), name='book-filter'),
+    # Suggest publishers or categories for a partial, possibly misspelt, input
+    path('books/autocomplete/', BookAutocompleteView.as_view(), name='book-autocomplete'),
+    # Search book titles
+    path('books/search/', BookSearchView.as_view(), name='book-search'),
     # List all borrowed books
     path('books/borrowed/', BorrowedBookListView.as_view(), name='borrowed-book-list'),
     # Check book availability
@@ -24,4 +31,10 @@ urlpatterns = [
     path('users/enroll/', EnrollUserView.as_view(), name='enroll-user'),
     # Get user's borrowed books
     path('users/<uuid:user_uuid>/borrowed/', UserBorrowRecordsView.as_view(), name='user-borrow-records'),
+    # Async variants of the catalogue read endpoints, served natively under ASGI
+    path('async/books/', AsyncBookListView.as_view(), name='async-book-list'),
+    path('async/books/<uuid:book_uuid>/', AsyncBookDetailView.as_view(), name='async-book-detail'),
+    path('async/books/filter/', AsyncBookFilterView.as_view(), name='async-book-filter'),
+    path('async/books/<uuid:book_uuid>/availability/', AsyncBookAvailabilityView.as_view(),
+         name='async-book-availability'),
 ]
@@ -0,0 +1,161 @@
+"""
+Book catalogue import parsing
+"""
+import csv
+import gzip
+import io
+import json
+import sys
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from core.domain.models import Book
+
+FORMATS = ('csv', 'jsonl')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+def detect_format(path):
+    """
+    Guess the input format from the file name.
+    :param path: Path of the input file.
+    :return: 'csv', 'jsonl' or None if unknown.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def open_input(path):
+    """
+    Open an input file as text, transparently decompressing .gz files; '-' reads standard input.
+    :param path: Path of the input file.
+    :return: Text file object.
+    """
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(file, file_format):
+    """
+    Stream the records of an input file with their line numbers.
+    CSV rows become dictionaries keyed by the header; JSONL lines are passed on unparsed,
+    so decoding happens in the parsing workers.
+    :param file: Text file object.
+    :param file_format: 'csv' or 'jsonl'.
+    :return: Generator of (line, record) tuples.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(file, start=1):
+        if text.strip():
+            yield line, text
+
+
+def chunked(records, size):
+    """
+    Group records into lists of at most size items.
+    :param records: Iterable of records.
+    :param size: Maximum chunk size.
+    :return: Generator of lists.
+    """
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _parse_bool(value):
+    """
+    Parse an availability flag, defaulting to available.
+    :param value: Raw value.
+    :return bool:
+    """
+    if value is None or value == '':
+        return True
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid availability_status: {value!r}")
+
+
+def _text(record, name):
+    """
+    Read a stripped text value from a record.
+    :param record: Record dictionary.
+    :param name: Field name.
+    :return: Stripped text, or None when missing.
+    """
+    value = record.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+
+def parse_chunk(chunk, max_lengths):
+    """
+    Validate a chunk of records against the domain Book and turn them into import rows.
+    Runs in worker processes, so it must only depend on the domain layer, not on Django.
+    :param chunk: List of (line, record) tuples.
+    :param max_lengths: Dictionary of text field name to maximum length.
+    :return: Tuple of the import rows and the (line, message) errors.
+    """
+    rows, errors = [], []
+    for line, record in chunk:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError("Record must be an object")
+            book_uuid = record.get('book_uuid')
+            book = Book(
+                title=_text(record, 'title'),
+                publisher=_text(record, 'publisher'),
+                category=_text(record, 'category'),
+                availability_status=_parse_bool(record.get('availability_status')),
+                book_uuid=uuid.UUID(str(book_uuid)) if book_uuid else uuid.uuid4(),
+            )
+            for name, max_length in max_lengths.items():
+                if len(getattr(book, name)) > max_length:
+                    raise ValueError(f"{name} is longer than {max_length} characters")
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append((line, str(e)))
+            continue
+        rows.append((line, book.book_uuid, book.title, book.publisher, book.category, book.availability_status))
+    return rows, errors
+
+
+def parse_chunks(chunks, max_lengths, workers=1):
+    """
+    Parse chunks in order, in a pool of worker processes when workers > 1.
+    At most two chunks per worker are in flight, so memory stays bounded however large the input.
+    :param chunks: Iterable of record chunks.
+    :param max_lengths: Dictionary of text field name to maximum length.
+    :param workers: Number of worker processes.
+    :return: Generator of (rows, errors) per chunk.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk, max_lengths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_chunk, chunk, max_lengths))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,19 @@
+"""
+Custom lookups
+"""
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+
+
+class Fuzzy(PostgresOperatorLookup):
+    """
+    Typo-tolerant match backed by pg_trgm: the value is similar to the whole column,
+    or to a word or prefix within it. Both operators can use a gin_trgm_ops index.
+    """
+    lookup_name = 'fuzzy'
+    postgres_operator = '%%'
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        params = (*lhs_params, *rhs_params, *lhs_params, *rhs_params)
+        return f'({lhs} %% {rhs} OR {lhs} %%> {rhs})', params
@@ -0,0 +1,102 @@
+"""
+Benchmark repositories, services and endpoints against seeded volumes
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from library.benchmarks import seeding, suite
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic books, users and borrow records, then time every repository method, service method, '
+        'endpoint and worker batch and count the queries each issues. Results can be written as JSON and '
+        'compared against a stored baseline, failing on regressions. Seeded rows are kept so later runs '
+        'reuse them, and write cases are rolled back; only use it against a benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database to seed and benchmark')
+        parser.add_argument('--books', type=int, default=0, help='Number of books to seed, e.g. 1000000')
+        parser.add_argument('--users', type=int, default=0, help='Number of users to seed, e.g. 200000')
+        parser.add_argument('--borrows', type=int, default=0, help='Number of borrow records to seed, e.g. 5000000')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated data')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed executions per case')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed executions per case')
+        parser.add_argument('--only', help='Regular expression selecting the cases to run, e.g. "^endpoint\\."')
+        parser.add_argument(
+            '--no-cache', action='store_true', help='Disable the cache, measuring what every request costs the database'
+        )
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2, help='Relative slowdown of a median flagged as a regression'
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0, help='Slowdowns of a median below this are never flagged'
+        )
+
+    def handle(self, *args, **kwargs):
+        database = kwargs['database']
+        if database not in connections:
+            raise CommandError(f"Unknown database: {database}")
+        baseline = None
+        if kwargs['baseline']:
+            with open(kwargs['baseline']) as file:
+                baseline = json.load(file)['results']
+
+        if kwargs['books'] or kwargs['users'] or kwargs['borrows']:
+            start = time.perf_counter()
+            loaded = seeding.seed(database, kwargs['books'], kwargs['users'], kwargs['borrows'], seed=kwargs['seed'])
+            self.stdout.write(
+                f"Seeded {', '.join(f'{count:,} {name}' for name, count in loaded.items())} "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+
+        self.stdout.write(f"{'case':<48}{'median ms':>12}{'p95 ms':>12}{'queries':>9}")
+        try:
+            results = suite.run(
+                database=database,
+                repeat=kwargs['repeat'],
+                warmup=kwargs['warmup'],
+                only=kwargs['only'],
+                cache=not kwargs['no_cache'],
+                progress=lambda name, result: self.stdout.write(
+                    f"{name:<48}{result['median_ms']:>12}{result['p95_ms']:>12}{result['queries']:>9}"
+                ),
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        if kwargs['output']:
+            report = {
+                'meta': {
+                    'database': database,
+                    'volumes': {
+                        name: model._default_manager.using(database).count()
+                        for name, model in (('books', suite.Book), ('users', suite.User), ('borrows', suite.BorrowRecord))
+                    },
+                    'repeat': kwargs['repeat'],
+                    'warmup': kwargs['warmup'],
+                    'cache': not kwargs['no_cache'],
+                    'timestamp': timezone.now().isoformat(),
+                },
+                'results': results,
+            }
+            with open(kwargs['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {kwargs['output']}"))
+
+        if baseline is not None:
+            regressions = suite.compare(results, baseline, kwargs['threshold'], kwargs['min_delta_ms'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f"{regression['name']}: {regression['metric']} {regression['baseline']} -> {regression['current']}"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {kwargs['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {kwargs['baseline']}"))
@@ -0,0 +1,51 @@
+"""
+Benchmark the catalogue queries with and without their indexes
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.benchmarks import catalogue
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalogue and record EXPLAIN plans and latencies of the catalogue queries '
+        'before and after the catalogue indexes. Runs in a rolled back transaction that locks library_book, '
+        'so only use it against a benchmark database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database to benchmark')
+        parser.add_argument('--books', type=int, default=200_000, help='Number of books to seed')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed executions per query')
+        parser.add_argument('--page-size', type=int, default=50, help='Page size of the endpoints')
+        parser.add_argument('--output', help='Write the JSON report, including plans, to this file')
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='Exit with an error if any indexed query still plans a sequential scan'
+        )
+
+    def handle(self, *args, **kwargs):
+        report = catalogue.run(
+            database=kwargs['database'],
+            books=kwargs['books'],
+            repeat=kwargs['repeat'],
+            page_size=kwargs['page_size'],
+        )
+
+        self.stdout.write(f"{'query':<36}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name, result in report['queries'].items():
+            self.stdout.write(
+                f"{name:<36}{result['before']['median_ms']:>12}{result['after']['median_ms']:>12}"
+                f"{result['speedup']:>9}x"
+            )
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {kwargs['output']}"))
+
+        scans = [name for name, result in report['queries'].items() if result['after']['seq_scan']]
+        if kwargs['fail_on_seq_scan'] and scans:
+            raise CommandError(f"Sequential scan on indexed queries: {', '.join(scans)}")
@@ -0,0 +1,65 @@
+"""
+Benchmark endpoints of running API servers over HTTP
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.benchmarks import http_load
+
+
+def _pair(value):
+    """
+    Split a name=value command line argument.
+    :param value:
+    :return tuple:
+    """
+    name, separator, rest = value.partition('=')
+    if not separator or not name or not rest:
+        raise CommandError(f"Expected name=value, got {value!r}")
+    return name, rest
+
+
+class Command(BaseCommand):
+    help = (
+        'Load running servers and report requests/sec and p50/p99 latency per target, e.g. the sync and '
+        'async variant of an endpoint. Start both stacks with the same number of workers and pass their '
+        'process IDs with --pids to compare them at equal memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='name=url to benchmark, e.g. sync=http://localhost:3030/library/books/ (repeatable)'
+        )
+        parser.add_argument(
+            '--pids', action='append', default=[],
+            help='name=pid,pid of the server processes behind a target, to report their memory (repeatable)'
+        )
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to measure each target')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Seconds of warmup per target')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **kwargs):
+        targets = dict(_pair(target) for target in kwargs['target'])
+        pids = {name: [int(pid) for pid in value.split(',')] for name, value in map(_pair, kwargs['pids'])}
+        report = http_load.run(
+            targets,
+            concurrency=kwargs['concurrency'],
+            duration=kwargs['duration'],
+            warmup=kwargs['warmup'],
+            pids=pids,
+        )
+
+        self.stdout.write(f"{'target':<20}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'rss MiB':>10}")
+        for name, result in report['targets'].items():
+            self.stdout.write(
+                f"{name:<20}{result['rps']:>10}{str(result['p50_ms']):>10}{str(result['p99_ms']):>10}"
+                f"{result['errors']:>8}{str(result['rss_mb']):>10}"
+            )
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {kwargs['output']}"))
@@ -0,0 +1,101 @@
+"""
+Bulk import a book catalogue from CSV or JSONL
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from infrastructure.repositories.book_repository import BookRepository
+from library.importers import books as importer
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a CSV (with a header row) or JSONL catalogue of books with title, publisher, category and '
+        'optionally book_uuid and availability_status, validate every row, and upsert the valid ones into '
+        'the databases through COPY and a staging table. Each chunk is committed on its own; rows carrying '
+        'a book_uuid can be re-imported safely.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, optionally gzipped; '-' reads standard input")
+        parser.add_argument('--format', choices=importer.FORMATS, help='Input format, guessed from the file name')
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database to import into (repeatable), defaults to all databases'
+        )
+        parser.add_argument('--chunk-size', type=int, default=10_000, help='Rows per COPY and upsert')
+        parser.add_argument('--workers', type=int, default=1, help='Processes parsing and validating rows')
+        parser.add_argument(
+            '--max-errors', type=int, default=100,
+            help='Abort once more than this many rows are invalid'
+        )
+
+    def handle(self, *args, **kwargs):
+        file_format = kwargs['format'] or importer.detect_format(kwargs['path'])
+        if file_format is None:
+            raise CommandError("Cannot tell the input format from the file name, pass --format")
+        databases = kwargs['databases'] or list(settings.DATABASES)
+        repository = BookRepository(databases=databases)
+        max_lengths = {name: Book._meta.get_field(name).max_length for name in ('title', 'publisher', 'category')}
+
+        totals = {'read': 0, 'invalid': 0, 'inserted': 0, 'updated': 0}
+        start = time.perf_counter()
+        try:
+            with importer.open_input(kwargs['path']) as file:
+                chunks = importer.chunked(importer.read_records(file, file_format), kwargs['chunk_size'])
+                for rows, errors in importer.parse_chunks(chunks, max_lengths, kwargs['workers']):
+                    totals['read'] += len(rows) + len(errors)
+                    totals['invalid'] += len(errors)
+                    for line, message in errors:
+                        self.stderr.write(f"line {line}: {message}")
+                    if totals['invalid'] > kwargs['max_errors']:
+                        raise CommandError(f"More than {kwargs['max_errors']} invalid rows, aborting")
+                    if rows:
+                        self._load(repository, rows, totals, databases)
+                    self._progress(totals, start)
+        except OSError as e:
+            raise CommandError(f"Cannot read {kwargs['path']}: {e}")
+        finally:
+            if totals['inserted'] or totals['updated']:
+                repository.invalidate_pages()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['read'] - totals['invalid']:,} of {totals['read']:,} rows into "
+            f"{', '.join(databases)} ({totals['inserted']:,} new, {totals['updated']:,} updated, "
+            f"{totals['invalid']:,} invalid) in {elapsed:.1f}s, {self._rate(totals, elapsed):,.0f} rows/s"
+        ))
+
+    @staticmethod
+    def _load(repository, rows, totals, databases):
+        """
+        Upsert a chunk into every database and drop the cached copies of the books that changed.
+        The counts of the first database are reported; the others receive the same rows.
+        """
+        results = repository.import_books(rows)
+        inserted, updated = results[databases[0]]
+        totals['inserted'] += inserted
+        totals['updated'] += len(updated)
+        changed = {book_uuid for _, db_updated in results.values() for book_uuid in db_updated}
+        if changed:
+            repository.invalidate(*changed)
+
+    def _progress(self, totals, start):
+        """
+        Report the rows processed so far and the throughput.
+        """
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{totals['read']:,} rows read, {totals['invalid']:,} invalid, "
+            f"{self._rate(totals, elapsed):,.0f} rows/s"
+        )
+
+    @staticmethod
+    def _rate(totals, elapsed):
+        """
+        Rows read per second.
+        """
+        return totals['read'] / elapsed if elapsed else 0.0
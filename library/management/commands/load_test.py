@@ -0,0 +1,114 @@
+"""
+Drive the HTTP API with a weighted mix of requests at a target rate
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library.benchmarks import traffic
+
+
+def _weight(value):
+    """
+    Parse a name=weight command line argument.
+    :param value:
+    :return tuple:
+    """
+    name, separator, weight = value.partition('=')
+    try:
+        if not separator or name not in traffic.ENDPOINTS or float(weight) < 0:
+            raise ValueError
+    except ValueError:
+        raise CommandError(f"Expected endpoint=weight with an endpoint among {', '.join(traffic.ENDPOINTS)}, "
+                           f"got {value!r}")
+    return name, float(weight)
+
+
+class Command(BaseCommand):
+    help = (
+        'Send a weighted mix of frontend and admin requests (list, filter, detail, availability, borrow, '
+        'enroll...) to running servers at a target rate, and report throughput and latency percentiles per '
+        'endpoint. Latency counts from the time a request was due, so queueing behind a slow server shows. '
+        'The requests can be recorded with --record and replayed later, or elsewhere, with --replay; replayed '
+        'enroll requests get new emails, the recorded ones being enrolled already.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frontend-url', default='http://localhost:3030/library/', help='Base URL of the frontend API'
+        )
+        parser.add_argument('--admin-url', default='http://localhost:8500/library/', help='Base URL of the admin API')
+        parser.add_argument('--rate', type=float, default=50.0, help='Target requests per second')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds of traffic')
+        parser.add_argument('--concurrency', type=int, default=32, help='Clients, bounding the requests in flight')
+        parser.add_argument(
+            '--mix', action='append', default=[],
+            help='endpoint=weight overriding the default mix, 0 leaving an endpoint out (repeatable), '
+                 f"default {', '.join(f'{name}={weight}' for name, (_, weight) in traffic.ENDPOINTS.items())}"
+        )
+        parser.add_argument(
+            '--database', default='default', choices=list(settings.DATABASES),
+            help='Database to sample the books and users requested from'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated requests')
+        parser.add_argument('--record', help='Write the requests sent, with their outcome, to this JSON lines file')
+        parser.add_argument('--replay', help='Send the requests of a recorded log instead of generating them')
+        parser.add_argument('--speed', type=float, default=1.0, help='Replay speed, 2 sending twice as fast')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['rate'] <= 0 or kwargs['duration'] <= 0 or kwargs['speed'] <= 0 or kwargs['concurrency'] < 1:
+            raise CommandError("--rate, --duration, --speed and --concurrency must be positive")
+
+        if kwargs['replay']:
+            requests = traffic.renew(traffic.read_log(kwargs['replay']))
+        else:
+            mix = {name: weight for name, (_, weight) in traffic.ENDPOINTS.items()}
+            mix.update(map(_weight, kwargs['mix']))
+            if not any(mix.values()):
+                raise CommandError("The mix needs at least one endpoint with a positive weight")
+            try:
+                sample = traffic.Sample.load(kwargs['database'])
+            except ValueError as error:
+                raise CommandError(error)
+            requests = traffic.generate(mix, sample, kwargs['rate'], kwargs['duration'], seed=kwargs['seed'])
+        if not requests:
+            raise CommandError("No requests to send")
+
+        results, elapsed = traffic.drive(
+            requests,
+            {'frontend': kwargs['frontend_url'], 'admin': kwargs['admin_url']},
+            concurrency=kwargs['concurrency'],
+            speed=kwargs['speed'],
+        )
+        summary = traffic.summarize(results, elapsed)
+
+        self.stdout.write(
+            f"{'endpoint':<22}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+            f"{'4xx':>7}{'errors':>8}"
+        )
+        for name, result in summary.items():
+            self.stdout.write(
+                f"{name:<22}{result['requests']:>10}{str(result['rps']):>9}{str(result['p50_ms']):>10}"
+                f"{str(result['p90_ms']):>10}{str(result['p99_ms']):>10}{result['rejected']:>7}{result['errors']:>8}"
+            )
+        span = (requests[-1].offset - requests[0].offset) / kwargs['speed']
+        target = f", target {(len(requests) - 1) / span:.1f} req/s" if span else ''
+        self.stdout.write(f"Sent {len(requests)} requests in {elapsed:.1f}s{target}")
+
+        if kwargs['record']:
+            traffic.write_log(kwargs['record'], results)
+            self.stdout.write(self.style.SUCCESS(f"Requests recorded to {kwargs['record']}"))
+        if kwargs['output']:
+            report = {
+                'rate': kwargs['rate'],
+                'duration': kwargs['duration'],
+                'concurrency': kwargs['concurrency'],
+                'replay': kwargs['replay'],
+                'elapsed': round(elapsed, 3),
+                'endpoints': summary,
+            }
+            with open(kwargs['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {kwargs['output']}"))
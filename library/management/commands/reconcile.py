@@ -0,0 +1,71 @@
+"""
+Detect and repair rows that differ between the two databases
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from infrastructure.repositories.reconcile import Reconciler
+from infrastructure.repositories.registry import REPOSITORIES
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare books, users and borrow records between the two databases by hashing them in primary key '
+        'ranges, narrowing down to the ranges that differ, and repair only the rows found there. '
+        'By default the most recently modified version of each row wins and missing rows are copied; '
+        'with --source the other database is made identical to the given one, deleting extra rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'entities', nargs='*', metavar='entity',
+            help=f"What to reconcile, among {', '.join(REPOSITORIES)}; all by default"
+        )
+        parser.add_argument('--source', choices=list(settings.DATABASES), help='Authoritative database')
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences without repairing them')
+        parser.add_argument(
+            '--leaf-size', type=int, default=settings.RECONCILE_LEAF_SIZE,
+            help='Ranges with at most this many rows are compared row by row'
+        )
+
+    def handle(self, *args, **kwargs):
+        databases = list(settings.DATABASES)
+        if len(databases) != 2:
+            raise CommandError("Reconciliation compares exactly two databases")
+        unknown = set(kwargs['entities']) - set(REPOSITORIES)
+        if unknown:
+            raise CommandError(f"Unknown entities: {', '.join(sorted(unknown))}")
+        # Referenced rows are repaired before the rows referencing them
+        entities = [name for name in REPOSITORIES if name in kwargs['entities']] or list(REPOSITORIES)
+
+        for name in entities:
+            start = time.perf_counter()
+            reconciler = Reconciler(
+                REPOSITORIES[name](databases=databases), source=kwargs['source'], leaf_size=kwargs['leaf_size']
+            )
+            report, differences = reconciler.run(dry_run=kwargs['dry_run'])
+            elapsed = time.perf_counter() - start
+
+            if kwargs['verbosity'] > 1:
+                for pk, versions in differences.items():
+                    sides = ', '.join(
+                        f"{db}: {'missing' if version is None else version[1].isoformat()}"
+                        for db, version in versions.items()
+                    )
+                    self.stdout.write(f"  {name} {pk} ({sides})")
+            summary = (
+                f"{name}: {report.differing:,} differing rows found in {report.ranges:,} ranges "
+                f"({report.rows:,} rows compared) in {elapsed:.2f}s"
+            )
+            if not kwargs['dry_run']:
+                summary += f"; copied {self._counts(report.copied)}, deleted {self._counts(report.deleted)}"
+            self.stdout.write(self.style.SUCCESS(summary) if not report.differing else self.style.WARNING(summary))
+
+    @staticmethod
+    def _counts(counts):
+        """
+        Format per-database counts.
+        """
+        return ', '.join(f"{count:,} in {db}" for db, count in counts.items())
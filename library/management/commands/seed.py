@@ -0,0 +1,68 @@
+"""
+Seed synthetic books, users and borrow records
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library.benchmarks import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate realistic books, users and borrow records and load them with COPY or bulk INSERTs, '
+        'in parallel processes. The data only depends on the volumes and --seed, so every database and '
+        'every run gets the same rows, and rows seeded before are kept. Borrows favour popular titles, '
+        'and the recent ones are still out, some of them overdue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100_000, help='Number of books')
+        parser.add_argument('--users', type=int, default=20_000, help='Number of users')
+        parser.add_argument('--borrows', type=int, default=500_000, help='Number of borrow records')
+        parser.add_argument(
+            '--database', choices=[*settings.DATABASES, 'both'], default='both', help='Database to seed'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated data')
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1, help='Worker processes generating and loading rows'
+        )
+        parser.add_argument(
+            '--method', choices=seeding.METHODS, default='copy', help='Load with COPY or with bulk INSERTs'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=3.0,
+            help='Popularity skew of the titles borrowed, 1 being uniform; higher concentrates borrows on fewer titles'
+        )
+        parser.add_argument(
+            '--overdue', type=float, default=0.3, help='Share of the books still out that are past their due date'
+        )
+
+    def handle(self, *args, **kwargs):
+        if min(kwargs['books'], kwargs['users'], kwargs['borrows']) < 0 or kwargs['processes'] < 1:
+            raise CommandError("Volumes must be positive and --processes at least 1")
+        if kwargs['skew'] <= 0 or not 0 <= kwargs['overdue'] <= 1:
+            raise CommandError("--skew must be positive and --overdue between 0 and 1")
+        databases = list(settings.DATABASES) if kwargs['database'] == 'both' else [kwargs['database']]
+
+        start = time.perf_counter()
+        try:
+            loaded = seeding.seed(
+                databases, kwargs['books'], kwargs['users'], kwargs['borrows'],
+                seed=kwargs['seed'],
+                processes=kwargs['processes'],
+                method=kwargs['method'],
+                skew=kwargs['skew'],
+                overdue=kwargs['overdue'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - start
+
+        rows = sum(loaded.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {', '.join(f'{count:,} {name}' for name, count in loaded.items())} into "
+            f"{', '.join(databases)} in {elapsed:.1f}s ({rows / max(elapsed, 0.001):,.0f} rows/s)"
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:50
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so a large catalogue stays writable during the migration
+    atomic = False
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('availability_status', True)), fields=['publisher', 'category', 'book_uuid'], name='book_avail_pub_cat_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('availability_status', True)), fields=['publisher', 'book_uuid'], name='book_avail_pub_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('availability_status', True)), fields=['category', 'book_uuid'], name='book_avail_cat_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('availability_status', False)), fields=['book_uuid'], name='book_unavailable_idx'),
+        ),
+    ]
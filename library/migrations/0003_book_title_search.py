@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 08:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The title search index is built on the search expression rather than on a stored tsvector column:
+    # adding a stored generated column rewrites library_book under an ACCESS EXCLUSIVE lock, blocking every
+    # catalogue read and write for the length of the rewrite. Built concurrently, the index only takes
+    # a SHARE UPDATE EXCLUSIVE lock, so reads and writes carry on while it is built.
+
+    atomic = False
+
+    dependencies = [
+        ('library', '0002_book_catalogue_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', config='english'), name='book_search_vector_idx'),
+        ),
+    ]
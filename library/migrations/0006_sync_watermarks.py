@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 15:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('library', '0005_outbox_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=50)),
+                ('modified', models.DateTimeField()),
+                ('key', models.UUIDField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entity', 'source'), name='sync_watermark_unique')],
+            },
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['modified', 'book_uuid'], name='book_modified_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowrecord',
+            index=models.Index(fields=['modified', 'record_uuid'], name='borrow_modified_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['modified', 'user_uuid'], name='user_modified_idx'),
+        ),
+    ]
@@ -5,10 +5,17 @@ Library Models
 from datetime import date
 
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.exceptions import ValidationError
 from django_extensions.db.models import TimeStampedModel
 
+# Title search vector. The GIN index is built on this expression and searches filter on the same one,
+# so Postgres matches them without a stored column that adding would rewrite the whole table for
+TITLE_SEARCH_VECTOR = SearchVector('title', config='english')
+
 
 class User(TimeStampedModel, AbstractUser):
     """
@@ -19,6 +26,10 @@ class User(TimeStampedModel, AbstractUser):
     firstname = models.CharField(max_length=255)
     lastname = models.CharField(max_length=255)
 
+    class Meta(TimeStampedModel.Meta):
+        # Incremental sync and exports read the rows changed since a watermark, in (modified, key) order
+        indexes = [models.Index(fields=['modified', 'user_uuid'], name='user_modified_idx')]
+
     def clean(self):
         """
         Ensure all fields are valid.
@@ -40,6 +51,37 @@ class Book(TimeStampedModel):
     category = models.CharField(max_length=255)
     availability_status = models.BooleanField(default=True)
 
+    class Meta(TimeStampedModel.Meta):
+        # Catalogue pages are keyset scans on book_uuid, so each filter combination gets an
+        # index ending in book_uuid. Only available books are filtered by publisher/category.
+        indexes = [
+            models.Index(
+                fields=['publisher', 'category', 'book_uuid'],
+                condition=models.Q(availability_status=True),
+                name='book_avail_pub_cat_idx',
+            ),
+            models.Index(
+                fields=['publisher', 'book_uuid'],
+                condition=models.Q(availability_status=True),
+                name='book_avail_pub_idx',
+            ),
+            models.Index(
+                fields=['category', 'book_uuid'],
+                condition=models.Q(availability_status=True),
+                name='book_avail_cat_idx',
+            ),
+            models.Index(
+                fields=['book_uuid'],
+                condition=models.Q(availability_status=False),
+                name='book_unavailable_idx',
+            ),
+            GinIndex(TITLE_SEARCH_VECTOR, name='book_search_vector_idx'),
+            # Trigram indexes serve fuzzy filtering and autocomplete over the whole catalogue
+            GinIndex(fields=['publisher'], opclasses=['gin_trgm_ops'], name='book_publisher_trgm_idx'),
+            GinIndex(fields=['category'], opclasses=['gin_trgm_ops'], name='book_category_trgm_idx'),
+            models.Index(fields=['modified', 'book_uuid'], name='book_modified_idx'),
+        ]
+
     def lend_out(self):
         """
         Mark the book as lent out.
@@ -71,24 +113,27 @@ class BorrowRecord(TimeStampedModel):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     borrow_date = models.DateField()
     due_date = models.DateField()
-    book_uuid = None
-    user_uuid = None
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [models.Index(fields=['modified', 'record_uuid'], name='borrow_modified_idx')]
 
     def __init__(self, *args, **kwargs):
-        self.user_uuid = kwargs.pop('user_uuid', None)
-        self.book_uuid = kwargs.pop('book_uuid', None)
+        # The domain record carries book_uuid/user_uuid; set the foreign keys by id without reading the rows
+        user_uuid = kwargs.pop('user_uuid', None)
+        book_uuid = kwargs.pop('book_uuid', None)
+        if user_uuid is not None:
+            kwargs['user_id'] = user_uuid
+        if book_uuid is not None:
+            kwargs['book_id'] = book_uuid
         super().__init__(*args, **kwargs)
 
-    def save(self, *args, **kwargs):
-
-        if self.user_uuid:
-            self.user = User.objects.get(user_uuid=self.user_uuid)
+    @property
+    def user_uuid(self):
+        return self.user_id
 
-        if self.book_uuid:
-            self.book = Book.objects.get(book_uuid=self.book_uuid)
-
-        # Call the original save method
-        super().save(*args, **kwargs)
+    @property
+    def book_uuid(self):
+        return self.book_id
 
     def is_overdue(self) -> bool:
         """
@@ -98,3 +143,34 @@ class BorrowRecord(TimeStampedModel):
 
     def __str__(self):
         return f"BorrowRecord: {self.user} borrowed {self.book} on {self.borrow_date}, due {self.due_date}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Event waiting to be relayed to the worker, written in the transaction of the change it describes.
+    """
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+
+class SyncWatermark(models.Model):
+    """
+    Point up to which the rows of an entity were copied from a source database, kept in the target database.
+    Rows are copied in (modified, key) order, so the pair is the resume position of the next run.
+    """
+    entity = models.CharField(max_length=50)
+    source = models.CharField(max_length=50)
+    modified = models.DateTimeField()
+    key = models.UUIDField()
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['entity', 'source'], name='sync_watermark_unique')]
+
+    def __str__(self):
+        return f"{self.entity} from {self.source} up to {self.modified.isoformat()}"
@@ -0,0 +1,101 @@
+"""
+Renderers and streaming responses for large list endpoints
+"""
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renderer for newline delimited JSON, one object per line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render a list as one line per item, anything else as a single line.
+        :param data:
+        :param accepted_media_type:
+        :param renderer_context:
+        :return bytes:
+        """
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(_dump(row) + b'\n' for row in rows)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Renderer for metrics already formatted in the Prometheus text exposition format.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Encode the formatted metrics.
+        :param data:
+        :param accepted_media_type:
+        :param renderer_context:
+        :return bytes:
+        """
+        return data.encode(self.charset)
+
+
+def _dump(row) -> bytes:
+    """
+    Encode a single row as compact JSON.
+    :param row:
+    :return bytes:
+    """
+    return json.dumps(row, cls=JSONEncoder, separators=(',', ':')).encode()
+
+
+def stream_requested(request) -> bool:
+    """
+    Check whether the client opted into a streamed response.
+    :param request: DRF request.
+    :return bool:
+    """
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, NDJSONRenderer)
+
+
+def streaming_response(request, rows):
+    """
+    Build a streamed response from an iterator of serialized rows.
+    NDJSON is emitted when negotiated, otherwise a chunked JSON array.
+    :param request: DRF request.
+    :param rows: Iterator of serialized rows.
+    :return StreamingHttpResponse:
+    """
+    if isinstance(getattr(request, 'accepted_renderer', None), NDJSONRenderer):
+        content = (_dump(row) + b'\n' for row in rows)
+        content_type = NDJSONRenderer.media_type
+    else:
+        content = _json_array(rows)
+        content_type = 'application/json'
+    return StreamingHttpResponse(content, content_type=content_type)
+
+
+def _json_array(rows):
+    """
+    Emit rows as the chunks of a single JSON array.
+    :param rows:
+    :return: Generator of bytes.
+    """
+    yield b'['
+    separator = b''
+    for row in rows:
+        yield separator + _dump(row)
+        separator = b','
+    yield b']'
@@ -1,8 +1,11 @@
 """
 Application Serializer
 """
+from dataclasses import fields
 
 from rest_framework import serializers
+
+from core.domain import models as domain
 from library.models import BorrowRecord, Book
 
 
@@ -12,6 +15,19 @@ class BookSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+def to_domain_book(data):
+    """
+    Build the domain Book of a serialized book, such as the ones repositories and their cache return.
+    :param data: BookSerializer output.
+    :return: Domain Book.
+    """
+    serializer_fields = BookSerializer().fields
+    return domain.Book(**{
+        field.name: serializer_fields[field.name].to_internal_value(data[field.name])
+        for field in fields(domain.Book)
+    })
+
+
 class BorrowRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = BorrowRecord
@@ -2,26 +2,69 @@
 Application tasks
 """
 import logging
+import time
+from contextlib import contextmanager
+from itertools import groupby
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
 
 from core.domain.models import BorrowRecord
+from infrastructure.cache.event_log import EventLog
+from infrastructure.cache.event_metrics import EventMetrics
 from infrastructure.repositories.book_repository import BookRepository
 from infrastructure.repositories.borrow_repository import BorrowRepository
+from infrastructure.repositories.fanout import FanOutError
+from infrastructure.repositories import sync
 from infrastructure.repositories.user_repository import UserRepository
 from library_managemet.celery import app
+from shared.brokers import outbox_relay
+from shared.instrumentation import collect
 
 LOG = logging.getLogger(__name__)
 
+# Keys of an event that describe the event rather than the entity
+EVENT_META = ("action", "event_id", "published_at")
+
+# Failures worth retrying: the writes are idempotent, so a partly applied event is safe to apply again
+RETRY_ON = (OperationalError, InterfaceError)
+
+
+@contextmanager
+def _retryable():
+    """
+    Re-raise a parallel fan-out failure as its underlying error when every database failed with a
+    RETRY_ON error, so it is retried like the same failure in serial mode; any other fails at once.
+    """
+    try:
+        yield
+    except FanOutError as error:
+        errors = list(error.errors.values())
+        if all(isinstance(e, RETRY_ON) for e in errors):
+            raise errors[0] from error
+        raise
+
+
 class EventProcessor:
     """
     Class to handle different types of events and delegate them to appropriate repositories.
     """
 
     def __init__(self):
+        self.book_repository = BookRepository()
+        self.user_repository = UserRepository()
+        self.event_log = EventLog()
+        self.metrics = EventMetrics()
         self.repositories = {
-            "book_events": (self.book_actions, BookRepository()),
-            "enroll_events": (self.user_actions, UserRepository()),
+            "book_events": (self.book_actions, self.book_repository),
+            "enroll_events": (self.user_actions, self.user_repository),
             "borrow_events": (self.borrow_actions, BorrowRepository())
         }
+        self.bulk_actions = {
+            "book_events": self.book_bulk_actions,
+            "enroll_events": self.user_bulk_actions,
+            "borrow_events": self.borrow_bulk_actions
+        }
 
     def process_event(self, topic, event):
         """
@@ -31,7 +74,22 @@ class EventProcessor:
         """
         if topic not in self.repositories:
             raise ValueError(f"Unknown topic: {topic}")
+        event_id = event.get("event_id")
+        if event_id and self.event_log.applied([event_id]):
+            LOG.info(f"Skipping already applied event {event_id}, topic {topic}")
+            return
 
+        with self._measured(topic, event.get("action"), [event]):
+            self._apply_event(topic, event)
+        if event_id:
+            self.event_log.record([event_id])
+
+    def _apply_event(self, topic, event):
+        """
+        Apply a single event of a known topic.
+        :param topic: The event topic.
+        :param event: The event data.
+        """
         callable_action, repository = self.repositories[topic]
         action = event.get("action")
 
@@ -43,6 +101,82 @@ class EventProcessor:
         # Execute the corresponding action
         called_action[action](event, repository)
 
+    def process_events(self, topic, events):
+        """
+        Process a batch of events of one topic.
+        Consecutive events with the same action are applied together with set-based statements,
+        so the order of adds and removes within the batch is preserved. Events already applied,
+        or repeated within the batch, are skipped.
+        :param topic: The event topic (e.g., 'book_events', 'user_events', 'borrow_events').
+        :param events: The event payloads, in publish order.
+        """
+        if topic not in self.repositories:
+            raise ValueError(f"Unknown topic: {topic}")
+        events = self._unapplied(events)
+        if not events:
+            return
+
+        _, repository = self.repositories[topic]
+        bulk_actions = self.bulk_actions[topic]()
+        for action, group in groupby(events, key=lambda event: event.get("action")):
+            group = list(group)
+            LOG.info(f"Processing {len(group)} events, action {action}, topic {topic}")
+            with self._measured(topic, action, group):
+                if action in bulk_actions:
+                    bulk_actions[action](group, repository)
+                else:
+                    for event in group:
+                        self._apply_event(topic, event)
+            # Recorded group by group, so a retry after a later group failed skips the groups already applied
+            self.event_log.record([event["event_id"] for event in group if event.get("event_id")])
+
+    @contextmanager
+    def _measured(self, topic, action, events):
+        """
+        Record the outcome, processing time, SQL time per database and publish to apply delay
+        of a run of events with the same action.
+        :param topic: The event topic.
+        :param action: The action of the events.
+        :param events: The event payloads.
+        """
+        start = time.perf_counter()
+        with collect() as timings:
+            try:
+                yield
+            except Exception:
+                self.metrics.observe(topic, action, events, time.perf_counter() - start,
+                                     self._sql_time(timings), failed=True)
+                raise
+        self.metrics.observe(topic, action, events, time.perf_counter() - start, self._sql_time(timings))
+
+    @staticmethod
+    def _sql_time(timings):
+        """
+        SQL time per database alias of collected timings.
+        :param timings: RequestTimings.
+        :return dict:
+        """
+        return {alias: seconds for alias, (_, seconds) in timings.queries.items()}
+
+    def _unapplied(self, events):
+        """
+        Drop the events of a batch that were already applied or appear twice, keeping the publish order.
+        :param events: The event payloads.
+        :return: List of the events left to apply.
+        """
+        applied = self.event_log.applied({event["event_id"] for event in events if event.get("event_id")})
+        if applied:
+            LOG.info(f"Skipping {len(applied)} already applied events")
+        unapplied = []
+        for event in events:
+            event_id = event.get("event_id")
+            if event_id:
+                if event_id in applied:
+                    continue
+                applied.add(event_id)
+            unapplied.append(event)
+        return unapplied
+
     def book_actions(self):
         return {
             "add": self.add_book,
@@ -61,28 +195,81 @@ class EventProcessor:
             "remove": self.remove_borrow_record
         }
 
+    def book_bulk_actions(self):
+        return {
+            "add": self.add_books,
+            "remove": self.remove_books
+        }
+
+    def user_bulk_actions(self):
+        return {
+            "add": self.enroll_users
+        }
+
+    def borrow_bulk_actions(self):
+        return {
+            "add": self.create_borrow_records
+        }
+
     def add_book(self, event, repository):
         repository.add_book(event["book"])
+        repository.invalidate(event["book"]["book_uuid"])
+        repository.invalidate_pages()
 
     def remove_book(self, event, repository):
         repository.remove_book(event["book_uuid"])
+        repository.invalidate(event["book_uuid"])
+        repository.invalidate_pages()
 
     def enroll_user(self, event, repository):
         repository.enroll_user(event["user"])
+        repository.invalidate(event["user"]["user_uuid"])
 
     def remove_user(self, event, repository):
         # TODO: implement method for removing user
         repository.remove_user(event["user_uuid"])
+        repository.invalidate(event["user_uuid"])
 
     def create_borrow_record(self, event, repository):
-        borrow_record = {key: value for key, value in event.items() if key != "action"}
-        repository.create_borrow_record(BorrowRecord(**borrow_record))
+        borrow_record = {key: value for key, value in event.items() if key not in EVENT_META}
+        repository.create_borrow_record(BorrowRecord(**borrow_record), ignore_conflicts=True)
+        # The book was flipped to unavailable, cached availability must not outlive the borrow
+        self.book_repository.invalidate(borrow_record["book_uuid"])
+        self.book_repository.invalidate_pages()
 
     def remove_borrow_record(self, event, repository):
         repository.remove_borrow_record(event["borrow_uuid"])
 
+    def add_books(self, events, repository):
+        books = [event["book"] for event in events]
+        repository.add_books(books, ignore_conflicts=True)
+        repository.invalidate(*[book["book_uuid"] for book in books])
+        repository.invalidate_pages()
+
+    def remove_books(self, events, repository):
+        book_uuids = [event["book_uuid"] for event in events]
+        repository.remove_books(book_uuids)
+        repository.invalidate(*book_uuids)
+        repository.invalidate_pages()
+
+    def enroll_users(self, events, repository):
+        users = [event["user"] for event in events]
+        repository.enroll_users(users, ignore_conflicts=True)
+        repository.invalidate(*[user["user_uuid"] for user in users])
+
+    def create_borrow_records(self, events, repository):
+        borrow_records = [
+            {key: value for key, value in event.items() if key not in EVENT_META} for event in events
+        ]
+        repository.create_borrow_records(borrow_records, ignore_conflicts=True)
+        self.book_repository.invalidate(*[record["book_uuid"] for record in borrow_records])
+        self.book_repository.invalidate_pages()
+
 
-@app.task
+@app.task(
+    autoretry_for=RETRY_ON, max_retries=settings.EVENT_MAX_RETRIES,
+    retry_backoff=True, retry_backoff_max=60, retry_jitter=True,
+)
 def process_event(topic, event):
     """
     Celery task to process events by delegating to the EventProcessor.
@@ -90,4 +277,41 @@ def process_event(topic, event):
     :param event: The event data.
     """
     processor = EventProcessor()
-    processor.process_event(topic, event)
+    with _retryable():
+        processor.process_event(topic, event)
+
+
+@app.task(
+    autoretry_for=RETRY_ON, max_retries=settings.EVENT_MAX_RETRIES,
+    retry_backoff=True, retry_backoff_max=60, retry_jitter=True,
+)
+def process_events(topic, events):
+    """
+    Celery task to apply a batch of events of one topic with bulk statements.
+    :param topic: The event topic (e.g., 'book_events', 'user_events', 'borrow_events').
+    :param events: The event payloads.
+    """
+    processor = EventProcessor()
+    with _retryable():
+        processor.process_events(topic, events)
+
+
+@app.task(ignore_result=True)
+def relay_outbox():
+    """
+    Celery beat task sending the events waiting in the outbox of every database to the worker in batches.
+    """
+    relayed = outbox_relay.relay_outbox()
+    if any(relayed.values()):
+        LOG.info(f"Relayed outbox events: {relayed}")
+
+
+@app.task(ignore_result=True)
+def sync_databases():
+    """
+    Celery beat task copying the rows changed since the last run between the databases,
+    catching up on events lost or delayed while the worker was down.
+    """
+    for (entity, source, target), (read, written) in sync.sync_databases().items():
+        if written:
+            LOG.info(f"Synced {written} of {read} changed {entity} from {source} to {target}")
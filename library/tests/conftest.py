@@ -0,0 +1,31 @@
+"""
+Shared test fixtures
+"""
+import pytest
+from django.core.cache import caches
+
+from infrastructure.repositories import fanout
+
+
+@pytest.fixture(scope='session', autouse=True)
+def fanout_connections(django_db_setup):
+    """
+    Close the connections the fan-out pool threads keep open, before the test databases are dropped.
+    """
+    yield
+    fanout.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(settings):
+    """
+    Run every test against an empty in-memory cache, so cached rows and pages never leak between tests.
+    """
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library-tests',
+        }
+    }
+    yield
+    caches['default'].clear()
@@ -14,6 +14,7 @@ class UserFactory(factory.django.DjangoModelFactory):
         model = User
 
     user_uuid = factory.Faker('uuid4')
+    username = factory.Sequence(lambda n: f'user{n}')
     firstname = factory.Faker('first_name')
     lastname = factory.Faker('last_name')
     email = factory.Faker('email')
@@ -1,6 +1,8 @@
 """
 Admin endpoints tests
 """
+import json
+
 import pytest
 from django.conf import settings
 from django.urls import reverse
@@ -35,6 +37,17 @@ class TestAdminLibraryEndpoints:
         response = client.post(url, book_data)
         assert response.status_code == status.HTTP_201_CREATED
 
+    def test_add_book_without_category(self, client):
+        url = reverse('add-book')
+        book_data = {
+            'title': 'Bad Box Man',
+            'publisher': 'Joshua',
+            'category': '',
+        }
+        response = client.post(url, book_data, content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {"errors": ["Book must have a valid title, publisher, and category"]}
+
     def test_remove_book(self, client, book):
         url = reverse('remove-book', args=[book.book_uuid])
         response = client.delete(url)
@@ -46,12 +59,22 @@ class TestAdminLibraryEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data) > 0
 
+    def test_user_list_ndjson_stream(self, client):
+        UserFactory.create_batch(3)
+        url = reverse('user-list')
+        response = client.get(url, HTTP_ACCEPT='application/x-ndjson')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).splitlines()
+        assert len(lines) == 3
+        assert all('email' in json.loads(line) for line in lines)
+
     def test_unavailable_books(self, client):
         BookFactory(availability_status=False)
         url = reverse('unavailable-books')
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) > 0
+        assert len(response.data['results']) > 0
 
     def test_user_borrowed_books(self, client, borrow_book):
         url = reverse('user-borrowed-books', args=[borrow_book.user.user_uuid])
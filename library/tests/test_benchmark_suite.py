@@ -0,0 +1,152 @@
+"""
+Benchmark suite tests
+"""
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from infrastructure.cache.generation_cache import GenerationCache
+from infrastructure.repositories import fanout
+from library.benchmarks import seeding, suite
+from library.models import Book, BorrowRecord, User
+
+DATABASES = ['default', 'admin']
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestSeeding:
+
+    def test_seeds_deterministic_rows(self):
+        loaded = seeding.seed('default', books=30, users=10, borrows=50)
+
+        assert loaded == {'books': 30, 'users': 10, 'borrows': 50}
+        assert Book.objects.filter(pk=seeding.entity_uuid('book', 29)).exists()
+        assert BorrowRecord.objects.filter(user_id__in=User.objects.values('pk')).count() == 50
+
+    def test_reseeding_only_loads_the_difference(self):
+        seeding.seed('default', books=20, users=5, borrows=0)
+        titles = dict(Book.objects.values_list('pk', 'title'))
+
+        loaded = seeding.seed('default', books=25, users=5, borrows=0)
+
+        assert loaded == {'books': 5, 'users': 0, 'borrows': 0}
+        assert Book.objects.count() == 25
+        assert {pk: title for pk, title in Book.objects.values_list('pk', 'title') if pk in titles} == titles
+
+    def test_copy_and_bulk_seed_the_same_rows(self):
+        seeding.seed('default', books=20, users=5, borrows=40, seed=7)
+        seeding.seed('admin', books=20, users=5, borrows=40, seed=7, method='bulk')
+
+        fields = ('pk', 'book_id', 'user_id', 'borrow_date', 'due_date')
+        assert set(BorrowRecord.objects.values_list(*fields)) == set(
+            BorrowRecord.objects.using('admin').values_list(*fields)
+        )
+
+    def test_open_borrows_lend_out_their_books(self):
+        seeding.seed('default', books=50, users=10, borrows=2000, overdue=0.5)
+
+        today = timezone.now().date()
+        records = BorrowRecord.objects.all()
+        open_records = records.filter(borrow_date__gt=today - timedelta(days=seeding.OPEN_DAYS))
+        assert set(Book.objects.filter(availability_status=False).values_list('pk', flat=True)) == set(
+            open_records.values_list('book_id', flat=True)
+        )
+        assert open_records.filter(due_date__lt=today).exists()
+        assert not records.filter(due_date__lte=F('borrow_date')).exists()
+        # The most popular title is borrowed far more than an average one
+        assert records.filter(book_id=seeding.entity_uuid('book', 0)).count() > 2000 / 50 * 5
+
+    def test_command_seeds_both_databases(self):
+        stdout = StringIO()
+        call_command('seed', books=10, users=3, borrows=20, processes=1, stdout=stdout)
+
+        assert 'Loaded 20 books, 6 users, 40 borrows into default, admin' in stdout.getvalue()
+        assert BorrowRecord.objects.using('admin').count() == 20
+
+
+@pytest.mark.django_db(databases=DATABASES, transaction=True)
+class TestBenchmarkSuite:
+
+    @pytest.fixture(autouse=True)
+    def seeded(self):
+        seeding.seed('default', books=20, users=5, borrows=10)
+
+    def test_measures_reads_and_rolls_back_writes(self):
+        results = suite.run(
+            repeat=2, warmup=1, only=r'^(repository\.get_borrow_record|repository\.add_book|endpoint\.book-detail)$'
+        )
+
+        assert set(results) == {'repository.get_borrow_record', 'repository.add_book', 'endpoint.book-detail'}
+        assert results['repository.get_borrow_record']['queries'] == 1
+        assert results['repository.add_book']['group'] == 'repository'
+        assert results['endpoint.book-detail']['runs'] == 2
+        assert Book.objects.count() == 20
+
+    def test_event_cases_fan_out_in_parallel_and_clean_up(self, settings):
+        settings.REPOSITORY_FANOUT = 'parallel'
+        # Room for every key written, so culling cannot drop the generation checked below
+        settings.CACHES = {'default': {**settings.CACHES['default'], 'OPTIONS': {'MAX_ENTRIES': 100_000}}}
+        generation = GenerationCache('catalogue').generation()
+
+        with mock.patch.object(fanout, '_run', wraps=fanout._run) as run:
+            results = suite.run(repeat=2, warmup=0, only=r'^events\.book_events')
+
+        assert run.called
+        result = results[f'events.book_events.add[{suite.EVENT_BATCH}]']
+        assert all(result['queries_by_database'][db] > 0 for db in DATABASES)
+        assert Book.objects.count() == 20
+        assert not Book.objects.using('admin').exists()
+        # Invalidations went to the benchmark cache, not the one the servers use
+        assert GenerationCache('catalogue').generation() == generation
+
+    def test_heavy_listings_are_streamed(self):
+        results = suite.run(only=r'\[stream\]$')
+
+        assert set(results) == {'endpoint.borrowed-book-list[stream]', 'endpoint.user-list[stream]'}
+        assert all(result['runs'] == 1 for result in results.values())
+
+    def test_command_writes_results_and_flags_regressions(self, tmp_path):
+        output = tmp_path / 'results.json'
+        call_command('benchmark', only='^service\\.get_book', repeat=2, warmup=0, output=str(output), stdout=StringIO())
+
+        report = json.loads(output.read_text())
+        assert report['meta']['volumes'] == {'books': 20, 'users': 5, 'borrows': 10}
+        assert set(report['results']) == {'service.get_book_by_id', 'service.get_book_availability'}
+
+        assert all(result['queries'] == 0 for result in report['results'].values())
+        for result in report['results'].values():
+            result['median_ms'] = 1000.0
+        output.write_text(json.dumps(report))
+        # Without the cache every lookup reaches the database
+        with pytest.raises(CommandError, match='2 regressions'):
+            call_command('benchmark', only='^service\\.get_book', repeat=2, warmup=0, no_cache=True,
+                         baseline=str(output), stdout=StringIO())
+
+
+class TestCompare:
+
+    def test_flags_slower_medians_and_extra_queries(self):
+        baseline = {
+            'slower': {'median_ms': 10.0, 'queries': 1},
+            'noise': {'median_ms': 0.2, 'queries': 1},
+            'chattier': {'median_ms': 5.0, 'queries': 1},
+        }
+        current = {
+            'slower': {'median_ms': 13.0, 'queries': 1},
+            'noise': {'median_ms': 0.4, 'queries': 1},
+            'chattier': {'median_ms': 5.0, 'queries': 2},
+            'new': {'median_ms': 50.0, 'queries': 9},
+        }
+
+        regressions = suite.compare(current, baseline, threshold=0.2, min_delta_ms=1.0)
+
+        assert [(regression['name'], regression['metric']) for regression in regressions] == [
+            ('slower', 'median_ms'), ('chattier', 'queries')
+        ]
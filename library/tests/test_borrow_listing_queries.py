@@ -0,0 +1,54 @@
+"""
+Borrowed-book listing query count tests
+"""
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.utils.timezone import now
+
+from library.book_service import BookService
+from library.models import BorrowRecord
+from library.tests.factories import BookFactory, UserFactory
+from library.user_service import UserService
+
+
+@pytest.mark.django_db(databases=['default'])
+class TestBorrowListingQueries:
+
+    @pytest.fixture
+    def users(self):
+        return UserFactory.create_batch(10)
+
+    def seed_records(self, users, count):
+        books = BookFactory.create_batch(10, availability_status=False)
+        BorrowRecord.objects.bulk_create([
+            BorrowRecord(
+                record_uuid=uuid.uuid4(),
+                user_id=users[i % len(users)].user_uuid,
+                book_id=books[i % len(books)].book_uuid,
+                borrow_date=now(),
+                due_date=now() + timedelta(days=14),
+            )
+            for i in range(count)
+        ], batch_size=2000)
+
+    @pytest.mark.parametrize('count', [10, 10_000])
+    def test_list_borrowed_books_is_one_query(self, users, count, django_assert_num_queries):
+        self.seed_records(users, count)
+
+        with django_assert_num_queries(1, using='default'):
+            records = BookService().list_borrowed_books()
+
+        assert len(records) == count
+        assert all(record['book_title'] for record in records)
+
+    @pytest.mark.parametrize('count', [10, 10_000])
+    def test_user_borrow_records_is_one_query(self, users, count, django_assert_num_queries):
+        self.seed_records(users, count)
+
+        with django_assert_num_queries(1, using='default'):
+            records = UserService().get_user_borrow_records(users[0].user_uuid)
+
+        assert len(records) == count // len(users)
+        assert {record['user'] for record in records} == {uuid.UUID(str(users[0].user_uuid))}
@@ -0,0 +1,124 @@
+"""
+Entity cache tests
+"""
+import uuid
+from datetime import date, timedelta
+
+from unittest import mock
+
+import pytest
+
+from core.domain import models as domain
+from core.domain.services import LibraryService
+from infrastructure.cache.cache_counters import COUNTERS, CacheCounters
+from infrastructure.cache.entity_cache import EntityCache
+from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.user_repository import UserRepository
+from library.book_service import BookService
+from library.serializers import BookSerializer
+from library.tasks import EventProcessor
+
+
+@pytest.mark.django_db(databases=['default', 'admin'])
+class TestEntityCache:
+
+    @pytest.fixture
+    def book(self):
+        book = {
+            'book_uuid': uuid.uuid4(),
+            'title': 'Cached Book',
+            'publisher': 'Joshua',
+            'category': 'Fiction',
+        }
+        BookRepository().add_book(book)
+        return book
+
+    @pytest.fixture
+    def user(self):
+        user_uuid = uuid.uuid4()
+        user = {
+            'user_uuid': user_uuid,
+            'username': str(user_uuid),
+            'email': f'{user_uuid}@example.com',
+            'firstname': 'John',
+            'lastname': 'Doe',
+        }
+        UserRepository().enroll_user(user)
+        return user
+
+    def test_second_lookup_is_served_from_cache(self, book, django_assert_num_queries):
+        repository = BookRepository(databases=['default'])
+        hits = EntityCache.stats().get('book.hits', 0)
+
+        assert repository.get_book_by_id(book['book_uuid'])['title'] == 'Cached Book'
+        with django_assert_num_queries(0):
+            with mock.patch.object(BookSerializer, 'to_representation') as to_representation:
+                cached = repository.get_book_by_id(book['book_uuid'])
+
+        assert not to_representation.called
+        assert cached['title'] == 'Cached Book'
+        assert cached['book_uuid'] == str(book['book_uuid'])
+        assert cached['availability_status'] is True
+        assert EntityCache.stats()['book.hits'] == hits + 1
+
+    def test_cached_users_leave_credentials_out(self, user):
+        repository = UserRepository(databases=['default'])
+        repository.get_user_by_id(user['user_uuid'])
+
+        cached = repository.get_user_by_id(user['user_uuid'])
+
+        assert cached == {
+            'user_uuid': str(user['user_uuid']), 'email': user['email'], 'firstname': 'John', 'lastname': 'Doe',
+        }
+
+    def test_counters_are_shared_through_the_cache(self, book):
+        repository = BookRepository(databases=['default'])
+        repository.get_book_by_id(book['book_uuid'])
+        repository.get_book_by_id(book['book_uuid'])
+
+        COUNTERS.flush()
+        counters = CacheCounters()
+
+        assert counters.snapshot()['book.hits'] >= 1
+        assert 'library_cache_operations_total{cache="book",result="misses"}' in counters.render()
+
+    def test_borrow_event_invalidates_cached_availability(self, book, user):
+        repository = BookRepository(databases=['default'])
+        assert repository.get_book_by_id(book['book_uuid'])['availability_status'] is True
+
+        EventProcessor().process_event("borrow_events", {
+            "action": "add",
+            "record_uuid": uuid.uuid4(),
+            "book_uuid": book['book_uuid'],
+            "user_uuid": user['user_uuid'],
+            "borrow_date": date.today(),
+            "due_date": date.today() + timedelta(days=7),
+        })
+
+        assert repository.get_book_by_id(book['book_uuid'])['availability_status'] is False
+
+    def test_availability_is_decided_by_the_domain_service(self, book):
+        BookService().get_book_availability(book['book_uuid'])
+
+        with mock.patch.object(LibraryService, 'is_book_available', return_value=False) as is_book_available:
+            assert BookService().get_book_availability(book['book_uuid']) is False
+
+        (domain_book,), _ = is_book_available.call_args
+        assert isinstance(domain_book, domain.Book)
+        assert domain_book.book_uuid == book['book_uuid']
+
+    def test_catalogue_pages_are_cached_until_a_book_event(self, book, django_assert_num_queries):
+        repository = BookRepository(databases=['default'])
+        assert [b['book_uuid'] for b in repository.filter_books(publisher='Joshua').items] == [str(book['book_uuid'])]
+
+        with django_assert_num_queries(0):
+            with mock.patch.object(BookSerializer, 'to_representation') as to_representation:
+                cached = repository.filter_books(publisher='Joshua')
+        assert not to_representation.called
+        assert [b['title'] for b in cached.items] == ['Cached Book']
+
+        new_book = dict(book, book_uuid=uuid.uuid4(), title='Second Book')
+        EventProcessor().process_event("book_events", {"action": "add", "book": new_book})
+
+        refreshed = repository.filter_books(publisher='Joshua')
+        assert {b['book_uuid'] for b in refreshed.items} == {str(book['book_uuid']), str(new_book['book_uuid'])}
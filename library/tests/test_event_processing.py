@@ -0,0 +1,269 @@
+"""
+Event processing tests
+"""
+import time
+import uuid
+from datetime import date, timedelta
+from unittest import mock
+
+import pytest
+from django.db import IntegrityError, InterfaceError, OperationalError, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from infrastructure.cache.event_metrics import EventMetrics
+
+from infrastructure.persistence.base_postgres_handler import PostgresHandlerFrontend
+from infrastructure.repositories.fanout import FanOutError
+from library import tasks
+from library.models import Book, BorrowRecord, User
+from library.tasks import EventProcessor
+
+DATABASES = ['default', 'admin']
+
+
+def book_event(**overrides):
+    book = {'book_uuid': uuid.uuid4(), 'title': 'Batch Book', 'publisher': 'Joshua', 'category': 'Fiction'}
+    book.update(overrides)
+    return {"action": "add", "book": book}
+
+
+def user_event():
+    user_uuid = uuid.uuid4()
+    return {"action": "add", "user": {
+        'user_uuid': user_uuid,
+        'username': str(user_uuid),
+        'email': f'{user_uuid}@example.com',
+        'firstname': 'John',
+        'lastname': 'Doe',
+    }}
+
+
+def count_queries(function):
+    """
+    Run a function and return the number of queries it issued on each database.
+    """
+    contexts = [CaptureQueriesContext(connections[db]) for db in DATABASES]
+    for context in contexts:
+        context.__enter__()
+    try:
+        function()
+    finally:
+        for context in contexts:
+            context.__exit__(None, None, None)
+    return {db: len(context) for db, context in zip(DATABASES, contexts)}
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestBulkEventProcessing:
+
+    @pytest.mark.parametrize('size', [2, 40])
+    def test_book_adds_use_constant_queries(self, size):
+        events = [book_event() for _ in range(size)]
+
+        queries = count_queries(lambda: EventProcessor().process_events("book_events", events))
+
+        for db in DATABASES:
+            assert Book.objects.using(db).count() == size
+            assert queries[db] <= 3
+
+    def test_adds_and_removes_keep_their_order(self):
+        first, second = book_event(), book_event()
+        events = [first, second, {"action": "remove", "book_uuid": first["book"]["book_uuid"]}, book_event()]
+
+        EventProcessor().process_events("book_events", events)
+
+        for db in DATABASES:
+            assert Book.objects.using(db).count() == 2
+            assert not Book.objects.using(db).filter(book_uuid=first["book"]["book_uuid"]).exists()
+
+    def test_borrows_are_created_and_books_flipped_in_bulk(self):
+        processor = EventProcessor()
+        users = [user_event() for _ in range(3)]
+        books = [book_event() for _ in range(3)]
+        processor.process_events("enroll_events", users)
+        processor.process_events("book_events", books)
+        borrows = [
+            {
+                "action": "add",
+                "record_uuid": uuid.uuid4(),
+                "book_uuid": book["book"]["book_uuid"],
+                "user_uuid": user["user"]["user_uuid"],
+                "borrow_date": date.today(),
+                "due_date": date.today() + timedelta(days=7),
+            }
+            for book, user in zip(books, users)
+        ]
+
+        queries = count_queries(lambda: processor.process_events("borrow_events", borrows))
+
+        for db in DATABASES:
+            assert User.objects.using(db).count() == 3
+            assert BorrowRecord.objects.using(db).count() == 3
+            assert not Book.objects.using(db).filter(availability_status=True).exists()
+            assert queries[db] <= 4
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestEventDeduplication:
+
+    def with_id(self, event):
+        return {**event, "event_id": str(uuid.uuid4())}
+
+    def test_redelivered_batch_is_skipped(self):
+        events = [self.with_id(book_event()) for _ in range(2)]
+        EventProcessor().process_events("book_events", events)
+        Book.objects.using('default').filter(book_uuid=events[0]["book"]["book_uuid"]).delete()
+
+        EventProcessor().process_events("book_events", events)
+        EventProcessor().process_event("book_events", events[0])
+
+        assert Book.objects.using('default').count() == 1
+
+    def test_repeated_event_within_a_batch_is_applied_once(self):
+        add = self.with_id(book_event())
+        remove = self.with_id({"action": "remove", "book_uuid": add["book"]["book_uuid"]})
+
+        EventProcessor().process_events("book_events", [add, remove, add])
+
+        for db in DATABASES:
+            assert not Book.objects.using(db).exists()
+
+    def test_retry_after_a_failed_group_skips_the_groups_applied(self):
+        processor = EventProcessor()
+        adds = [self.with_id(book_event()) for _ in range(2)]
+        removes = [self.with_id({"action": "remove", "book_uuid": add["book"]["book_uuid"]}) for add in adds]
+
+        with mock.patch.object(processor.book_repository, 'remove_books', side_effect=OperationalError):
+            with pytest.raises(OperationalError):
+                processor.process_events("book_events", adds + removes)
+
+        assert processor.event_log.applied([event["event_id"] for event in adds + removes]) == {
+            event["event_id"] for event in adds
+        }
+        with mock.patch.object(processor.book_repository, 'add_books') as add_books:
+            processor.process_events("book_events", adds + removes)
+        assert not add_books.called
+        for db in DATABASES:
+            assert not Book.objects.using(db).exists()
+
+    @pytest.mark.parametrize('errors, retried, raised', [
+        ({'default': OperationalError(), 'admin': InterfaceError()}, True, OperationalError),
+        ({'admin': IntegrityError()}, False, FanOutError),
+        ({'default': OperationalError(), 'admin': IntegrityError()}, False, FanOutError),
+    ])
+    def test_fan_out_failures_are_retried_only_when_transient(self, errors, retried, raised):
+        with mock.patch.object(EventProcessor, 'process_events', side_effect=FanOutError({}, errors)) as process:
+            result = tasks.process_events.apply(args=["book_events", [book_event()]])
+
+        assert process.call_count == (tasks.process_events.max_retries + 1 if retried else 1)
+        assert type(result.result) is raised
+
+    def test_replay_without_the_log_is_harmless(self):
+        processor = EventProcessor()
+        user, book = self.with_id(user_event()), self.with_id(book_event())
+        borrow = self.with_id({
+            "action": "add",
+            "record_uuid": uuid.uuid4(),
+            "book_uuid": book["book"]["book_uuid"],
+            "user_uuid": user["user"]["user_uuid"],
+            "borrow_date": date.today(),
+            "due_date": date.today() + timedelta(days=7),
+        })
+        for _ in range(2):
+            processor.process_events("enroll_events", [user])
+            processor.process_events("book_events", [book])
+            processor.process_events("borrow_events", [borrow])
+            processor.process_event("borrow_events", borrow)
+            processor.event_log.cache.delete_many(
+                [processor.event_log.key(event["event_id"]) for event in (user, book, borrow)]
+            )
+
+        for db in DATABASES:
+            assert BorrowRecord.objects.using(db).count() == 1
+            assert not Book.objects.using(db).get().availability_status
+
+    def test_handler_events_carry_unique_ids(self):
+        handler = PostgresHandlerFrontend()
+        with mock.patch.object(handler.database_broker, 'publish') as publish:
+            handler.remove_book(uuid.uuid4())
+            handler.remove_book(uuid.uuid4())
+
+        event_ids = {call.args[1]["event_id"] for call in publish.call_args_list}
+        assert len(event_ids) == 2
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestEventMetrics:
+
+    def published(self, event, seconds_ago):
+        return {**event, "event_id": str(uuid.uuid4()), "published_at": time.time() - seconds_ago}
+
+    def metric(self, name, **labels):
+        """
+        Value of a series in the rendered metrics.
+        """
+        series = name + '{' + ','.join(f'{label}="{value}"' for label, value in labels.items()) + '}'
+        for line in EventMetrics().render().splitlines():
+            if line.startswith(series + ' '):
+                return float(line.split()[-1])
+        raise AssertionError(f"{series} not rendered")
+
+    def test_applied_batch_records_delay_and_sql_time_per_database(self):
+        events = [self.published(book_event(), seconds_ago=2) for _ in range(3)]
+
+        EventProcessor().process_events("book_events", events)
+
+        labels = {'topic': 'book_events', 'action': 'add'}
+        assert self.metric('library_events_total', **labels, outcome='success') == 3
+        assert self.metric('library_event_delay_seconds_bucket', **labels, le='1') == 0
+        assert self.metric('library_event_delay_seconds_bucket', **labels, le='2.5') == 3
+        assert self.metric('library_event_delay_seconds_bucket', **labels, le='+Inf') == 3
+        assert self.metric('library_event_delay_seconds_sum', **labels) == pytest.approx(6, abs=1)
+        for db in DATABASES:
+            assert self.metric('library_event_apply_seconds_count', **labels, database=db) == 3
+            assert self.metric('library_event_apply_seconds_sum', **labels, database=db) > 0
+        assert self.metric('library_event_processing_seconds_count', **labels) == 3
+
+    def test_redelivered_events_are_counted_once(self):
+        event = self.published({"action": "remove", "book_uuid": uuid.uuid4()}, seconds_ago=0)
+
+        for _ in range(2):
+            EventProcessor().process_event("book_events", event)
+
+        assert self.metric('library_events_total', topic='book_events', action='remove', outcome='success') == 1
+        assert self.metric('library_event_delay_seconds_count', topic='book_events', action='remove') == 1
+
+    def test_failed_batch_is_counted_without_delay(self):
+        processor = EventProcessor()
+        events = [self.published(user_event(), seconds_ago=0) for _ in range(2)]
+
+        with mock.patch.object(processor.user_repository, 'enroll_users', side_effect=OperationalError):
+            with pytest.raises(OperationalError):
+                processor.process_events("enroll_events", events)
+
+        labels = {'topic': 'enroll_events', 'action': 'add'}
+        assert self.metric('library_events_total', **labels, outcome='failure') == 2
+        assert self.metric('library_events_total', **labels, outcome='success') == 0
+        assert self.metric('library_event_delay_seconds_count', **labels) == 0
+
+    def test_events_published_by_the_broker_are_stamped(self, settings):
+        settings.EVENT_PUBLISH_MODE = 'direct'
+        handler = PostgresHandlerFrontend()
+        with mock.patch('shared.brokers.database_broker.app.send_task') as send_task:
+            handler.remove_book(uuid.uuid4())
+
+        _, event = send_task.call_args.kwargs['args']
+        assert time.time() - 5 < event["published_at"] <= time.time()
+
+    def test_metrics_endpoint(self, client, settings):
+        settings.ROOT_URLCONF = 'library.endpoints.admin_urls'
+        EventProcessor().process_events("book_events", [self.published(book_event(), seconds_ago=0)])
+
+        response = client.get(reverse('event-metrics'), HTTP_ACCEPT='text/plain;version=0.0.4;q=0.5,*/*;q=0.1')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        body = response.content.decode()
+        assert '# TYPE library_event_delay_seconds histogram' in body
+        assert 'library_events_total{topic="book_events",action="add",outcome="success"} 1' in body
@@ -0,0 +1,213 @@
+"""
+Event publishing tests
+"""
+import logging
+import time
+from unittest import mock
+
+import pytest
+from celery.signals import task_postrun
+from django.core.signals import request_finished
+from django.db import transaction
+
+from library.models import OutboxEvent
+from shared.brokers.database_broker import DataBaseBroker
+from shared.brokers.outbox_relay import relay_outbox
+
+
+def unstamped(event):
+    """
+    Check an event was stamped with its publish time and return it without the stamp.
+    """
+    event = dict(event)
+    assert isinstance(event.pop("published_at"), float)
+    return event
+
+
+def sent(send_task):
+    """
+    The batches sent to the worker, with their events unstamped.
+    """
+    calls = []
+    for call in send_task.call_args_list:
+        topic, events = call.kwargs['args']
+        calls.append(mock.call(*call.args, args=[topic, [unstamped(event) for event in events]]))
+    return calls
+
+
+@pytest.mark.django_db
+class TestBatchPublishing:
+
+    @pytest.fixture(autouse=True)
+    def batch_mode(self, settings):
+        settings.EVENT_PUBLISH_MODE = 'batch'
+        settings.EVENT_BATCH_SIZE = 2
+
+    @pytest.fixture
+    def send_task(self):
+        with mock.patch('shared.brokers.event_buffer.app.send_task') as send_task:
+            yield send_task
+
+    def test_committed_events_are_sent_in_batches_per_topic(self, send_task, django_capture_on_commit_callbacks):
+        broker = DataBaseBroker(source='default')
+        with django_capture_on_commit_callbacks(execute=True):
+            broker.publish("book_events", {"action": "remove", "book_uuid": "1"})
+            broker.publish("enroll_events", {"action": "add", "user": {}})
+            assert not send_task.called
+
+        request_finished.send(sender=self.__class__)
+
+        assert sent(send_task) == [
+            mock.call('library.tasks.process_events', args=["book_events", [{"action": "remove", "book_uuid": "1"}]]),
+            mock.call('library.tasks.process_events', args=["enroll_events", [{"action": "add", "user": {}}]]),
+        ]
+
+    def test_batch_is_sent_once_the_size_threshold_is_reached(self, send_task, django_capture_on_commit_callbacks):
+        broker = DataBaseBroker(source='default')
+        with django_capture_on_commit_callbacks(execute=True):
+            for book_uuid in range(3):
+                broker.publish("book_events", {"action": "remove", "book_uuid": book_uuid})
+
+        assert send_task.call_count == 1
+        broker.flush()
+        assert send_task.call_count == 2
+
+    def test_batches_keep_the_commit_order_across_topics(self, send_task, django_capture_on_commit_callbacks):
+        broker = DataBaseBroker(source='default')
+        with django_capture_on_commit_callbacks(execute=True):
+            broker.publish("enroll_events", {"action": "add", "user": {}})
+            broker.publish("borrow_events", {"action": "add"})
+            broker.publish("enroll_events", {"action": "add", "user": {}})
+
+        broker.flush()
+
+        assert [call.kwargs['args'][0] for call in send_task.call_args_list] == [
+            "enroll_events", "borrow_events", "enroll_events",
+        ]
+
+    def test_events_are_sent_after_the_max_delay_outside_requests(self, send_task, settings,
+                                                                   django_capture_on_commit_callbacks):
+        settings.EVENT_BATCH_MAX_DELAY = 0.05
+        with django_capture_on_commit_callbacks(execute=True):
+            DataBaseBroker(source='default').publish("book_events", {"action": "remove", "book_uuid": "1"})
+
+        for _ in range(100):
+            if send_task.called:
+                break
+            time.sleep(0.01)
+        assert sent(send_task) == [
+            mock.call('library.tasks.process_events', args=["book_events", [{"action": "remove", "book_uuid": "1"}]]),
+        ]
+
+    def test_events_published_by_a_task_are_sent_when_it_ends(self, send_task, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            DataBaseBroker(source='default').publish("book_events", {"action": "remove", "book_uuid": "1"})
+        assert not send_task.called
+
+        task_postrun.send(sender=None, task_id='1', task=None, args=(), kwargs={}, retval=None, state='SUCCESS')
+
+        assert send_task.call_count == 1
+
+    def test_unsent_events_are_kept_when_sending_fails(self, send_task, settings, caplog,
+                                                         django_capture_on_commit_callbacks):
+        settings.EVENT_BATCH_SIZE = 10
+        broker = DataBaseBroker(source='default')
+        with django_capture_on_commit_callbacks(execute=True):
+            broker.publish("book_events", {"action": "remove", "book_uuid": "1"})
+            broker.publish("enroll_events", {"action": "add", "user": {}})
+            broker.publish("book_events", {"action": "remove", "book_uuid": "2"})
+        send_task.side_effect = [None, ConnectionError]
+
+        broker.flush()
+        send_task.side_effect = None
+        send_task.reset_mock()
+        broker.flush()
+
+        assert '2 events kept buffered' in caplog.text
+        assert sent(send_task) == [
+            mock.call('library.tasks.process_events', args=["enroll_events", [{"action": "add", "user": {}}]]),
+            mock.call('library.tasks.process_events', args=["book_events", [{"action": "remove", "book_uuid": "2"}]]),
+        ]
+
+    @pytest.mark.parametrize('mode', ['direct', 'batch', 'outbox'])
+    def test_every_mode_logs_the_published_event(self, mode, send_task, settings, caplog):
+        settings.EVENT_PUBLISH_MODE = mode
+
+        with caplog.at_level(logging.INFO, logger='shared.brokers.database_broker'):
+            DataBaseBroker(source='default').publish("book_events", {"action": "remove", "book_uuid": "1"})
+
+        assert "book_events, {'action': 'remove', 'book_uuid': '1'" in caplog.text
+        assert f"mode {mode}" in caplog.text
+
+    def test_rolled_back_events_are_never_sent(self, send_task, django_capture_on_commit_callbacks):
+        broker = DataBaseBroker(source='default')
+        with django_capture_on_commit_callbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    broker.publish("book_events", {"action": "remove", "book_uuid": "1"})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        broker.flush()
+        assert not send_task.called
+
+
+@pytest.mark.django_db(databases=['default', 'admin'])
+class TestOutboxPublishing:
+
+    @pytest.fixture(autouse=True)
+    def outbox_mode(self, settings):
+        settings.EVENT_PUBLISH_MODE = 'outbox'
+        settings.EVENT_BATCH_SIZE = 2
+
+    @pytest.fixture
+    def send_task(self):
+        with mock.patch('shared.brokers.outbox_relay.app.send_task') as send_task:
+            yield send_task
+
+    def test_events_are_written_to_the_source_outbox(self, send_task):
+        DataBaseBroker(source='admin').publish("book_events", {"action": "remove", "book_uuid": "1"})
+
+        assert [
+            (topic, unstamped(payload))
+            for topic, payload in OutboxEvent.objects.using('admin').values_list('topic', 'payload')
+        ] == [("book_events", {"action": "remove", "book_uuid": "1"})]
+        assert not OutboxEvent.objects.using('default').exists()
+        assert not send_task.called
+
+    def test_rolled_back_events_never_reach_the_outbox(self):
+        try:
+            with transaction.atomic():
+                DataBaseBroker(source='default').publish("book_events", {"action": "remove", "book_uuid": "1"})
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        assert not OutboxEvent.objects.exists()
+
+    def test_relay_sends_ordered_batches_and_empties_the_outbox(self, send_task):
+        broker = DataBaseBroker(source='default')
+        for book_uuid in range(3):
+            broker.publish("book_events", {"action": "remove", "book_uuid": book_uuid})
+        broker.publish("enroll_events", {"action": "add", "user": {}})
+
+        assert relay_outbox() == {'default': 4, 'admin': 0}
+
+        assert sent(send_task) == [
+            mock.call('library.tasks.process_events', args=["book_events", [
+                {"action": "remove", "book_uuid": 0}, {"action": "remove", "book_uuid": 1},
+            ]]),
+            mock.call('library.tasks.process_events', args=["book_events", [{"action": "remove", "book_uuid": 2}]]),
+            mock.call('library.tasks.process_events', args=["enroll_events", [{"action": "add", "user": {}}]]),
+        ]
+        assert not OutboxEvent.objects.exists()
+
+    def test_events_stay_in_the_outbox_when_sending_fails(self, send_task):
+        DataBaseBroker(source='default').publish("book_events", {"action": "remove", "book_uuid": "1"})
+        send_task.side_effect = ConnectionError
+
+        with pytest.raises(ConnectionError):
+            relay_outbox(databases=['default'])
+
+        assert OutboxEvent.objects.count() == 1
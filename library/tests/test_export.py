@@ -0,0 +1,89 @@
+"""
+Export command tests
+"""
+import csv
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from library.models import Book
+from library.tests.factories import BookFactory, BorrowRecordFactory
+
+DATABASES = ['default', 'admin']
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestExport:
+
+    @pytest.fixture
+    def books(self):
+        return BookFactory.create_batch(3)
+
+    def run(self, *args, **options):
+        stderr = StringIO()
+        call_command('export', *args, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_csv_export_through_copy(self, tmp_path, books):
+        path = tmp_path / 'books.csv'
+
+        stderr = self.run('books', output=str(path))
+
+        with path.open(newline='') as file:
+            rows = list(csv.DictReader(file))
+        assert [row['book_uuid'] for row in rows] == sorted(str(book.book_uuid) for book in books)
+        assert list(rows[0]) == [
+            'book_uuid', 'title', 'publisher', 'category', 'availability_status', 'created', 'modified',
+        ]
+        assert 'Exported 3 books' in stderr
+
+    def test_gzipped_jsonl_export(self, tmp_path):
+        record = BorrowRecordFactory()
+        record.refresh_from_db()
+        path = tmp_path / 'borrows.jsonl.gz'
+
+        self.run('borrows', output=str(path))
+
+        with gzip.open(path, 'rt') as file:
+            rows = [json.loads(line) for line in file]
+        assert rows == [{
+            'record_uuid': str(record.record_uuid),
+            'borrow_date': record.borrow_date.isoformat(),
+            'due_date': record.due_date.isoformat(),
+            'created': rows[0]['created'],
+            'modified': rows[0]['modified'],
+            'book_uuid': str(record.book_id),
+            'user_uuid': str(record.user_id),
+        }]
+
+    def test_users_export_leaves_out_credentials(self, tmp_path):
+        BorrowRecordFactory()
+        path = tmp_path / 'users.jsonl'
+
+        self.run('users', output=str(path))
+
+        row = json.loads(path.read_text())
+        assert 'password' not in row and 'is_superuser' not in row
+
+    def test_since_only_exports_later_changes(self, tmp_path, books):
+        old = timezone.now() - timedelta(days=1)
+        Book.objects.exclude(pk=books[0].pk).update(modified=old)
+        path = tmp_path / 'books.csv'
+
+        stderr = self.run('books', output=str(path), since=(old + timedelta(hours=1)).isoformat())
+
+        with path.open(newline='') as file:
+            assert [row['book_uuid'] for row in csv.DictReader(file)] == [str(books[0].book_uuid)]
+        assert 'Exported 1 books' in stderr
+
+    def test_rejects_unknown_format_and_since(self, tmp_path):
+        with pytest.raises(CommandError):
+            self.run('books', output=str(tmp_path / 'books.txt'))
+        with pytest.raises(CommandError):
+            self.run('books', output=str(tmp_path / 'books.csv'), since='yesterday')
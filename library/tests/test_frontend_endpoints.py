@@ -1,6 +1,9 @@
 """
 Frontend endpoints tests
 """
+import json
+import uuid
+
 import pytest
 from django.conf import settings
 from django.urls import reverse
@@ -28,7 +31,27 @@ class TestFrontendLibraryEndpoints:
         url = reverse('book-list')
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) > 0
+        assert len(response.data['results']) > 0
+
+    def test_list_books_paginates_with_cursor(self, client):
+        books = BookFactory.create_batch(5)
+        url = reverse('book-list')
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            response = client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 2
+            seen.extend(book['book_uuid'] for book in response.data['results'])
+            if response.data['next'] is None:
+                break
+            params['cursor'] = response.data['next']
+        assert sorted(seen) == sorted(str(book.book_uuid) for book in books)
+
+    def test_list_books_rejects_invalid_cursor(self, client):
+        url = reverse('book-list')
+        response = client.get(url, {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
 
     def test_borrow_book(self, client, book, user):
         url = reverse('borrow-book')
@@ -56,6 +79,71 @@ class TestFrontendLibraryEndpoints:
         assert response.status_code == status.HTTP_200_OK
         # assert len(response.data) > 0
 
+    def test_filter_books_fuzzy_tolerates_typos(self, client):
+        BookFactory(publisher='Penguin Random House', category='Fiction')
+        BookFactory(publisher='HarperCollins', category='Fiction')
+        url = reverse('book-filter')
+        response = client.get(url, {'publisher': 'Penguin Randm House', 'match': 'fuzzy'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [book['publisher'] for book in response.data['results']] == ['Penguin Random House']
+
+        exact = client.get(url, {'publisher': 'Penguin Randm House'})
+        assert exact.data['results'] == []
+
+    def test_filter_books_rejects_unknown_match(self, client):
+        response = client.get(reverse('book-filter'), {'publisher': 'Joshua', 'match': 'regex'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_autocomplete_ranks_prefixes_then_popularity(self, client):
+        BookFactory.create_batch(2, publisher='Joshua Press')
+        BookFactory(publisher='Josef Books')
+        BookFactory(publisher='Orbit')
+        url = reverse('book-autocomplete')
+        response = client.get(url, {'field': 'publisher', 'q': 'jos'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['results'] == [
+            {'value': 'Joshua Press', 'books': 2},
+            {'value': 'Josef Books', 'books': 1},
+        ]
+
+        typo = client.get(url, {'field': 'publisher', 'q': 'Jushua Pres', 'limit': 1})
+        assert [row['value'] for row in typo.data['results']] == ['Joshua Press']
+
+    def test_autocomplete_rejects_unknown_field(self, client):
+        response = client.get(reverse('book-autocomplete'), {'field': 'title', 'q': 'dune'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_search_books_ranks_and_paginates(self, client):
+        BookFactory(title='Dune')
+        BookFactory(title='Dune Messiah')
+        BookFactory(title='Children of Dune')
+        BookFactory(title='Neuromancer')
+        url = reverse('book-search')
+        seen = []
+        params = {'q': 'dune', 'page_size': 2}
+        while True:
+            response = client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(book['title'] for book in response.data['results'])
+            if response.data['next'] is None:
+                break
+            params['cursor'] = response.data['next']
+        assert seen[0] == 'Dune'
+        assert sorted(seen) == ['Children of Dune', 'Dune', 'Dune Messiah']
+        assert set(response.data['results'][0]) == {
+            'book_uuid', 'title', 'publisher', 'category', 'availability_status', 'created', 'modified',
+        }
+
+    def test_search_books_matches_word_stems(self, client):
+        BookFactory(title='Running Wild')
+        response = client.get(reverse('book-search'), {'q': 'runs'})
+        assert response.status_code == status.HTTP_200_OK
+        assert [book['title'] for book in response.data['results']] == ['Running Wild']
+
+    def test_search_books_requires_terms(self, client):
+        response = client.get(reverse('book-search'), {'q': '  '})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     def test_list_borrowed_books(self, client):
         BorrowRecordFactory()
         url = reverse('borrowed-book-list')
@@ -63,6 +151,21 @@ class TestFrontendLibraryEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data) > 0
 
+    def test_stream_borrowed_books(self, client):
+        BorrowRecordFactory.create_batch(3)
+        url = reverse('borrowed-book-list')
+        response = client.get(url, {'stream': 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        records = json.loads(b''.join(response.streaming_content))
+        assert len(records) == 3
+        assert all('book_title' in record for record in records)
+
+    def test_missing_book_is_not_found(self, client):
+        missing = uuid.uuid4()
+        assert client.get(reverse('book-detail', args=[missing])).status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(reverse('book-availability', args=[missing])).status_code == status.HTTP_404_NOT_FOUND
+
     def test_check_book_availability(self, client, book):
         url = reverse('book-availability', args=[book.book_uuid])
         response = client.get(url)
@@ -83,4 +186,45 @@ class TestFrontendLibraryEndpoints:
         url = reverse('user-borrow-records', args=[borrow_book.user.user_uuid])
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        # assert len(response.data) > 0
+        assert len(response.data) > 0
+
+
+@pytest.mark.skipif(settings.API_NAME != "frontend-api", reason="Not the frontend API")
+@pytest.mark.django_db
+class TestAsyncCatalogueEndpoints:
+
+    @pytest.fixture
+    def book(self):
+        return BookFactory(publisher='Joshua', category='Fiction')
+
+    @pytest.mark.parametrize('name, params', [
+        ('book-list', {'page_size': 2}),
+        ('book-filter', {'publisher': 'Joshua', 'category': 'Fiction'}),
+        ('book-filter', {'publisher': 'Joshau', 'match': 'fuzzy'}),
+    ])
+    def test_pages_match_the_sync_endpoints(self, client, book, name, params):
+        BookFactory.create_batch(2, publisher='Joshua', category='Fiction')
+        sync = client.get(reverse(name), params)
+        response = client.get(reverse(f'async-{name}'), params)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == json.loads(json.dumps(sync.data))
+        assert response.json()['results']
+
+    def test_detail_and_availability(self, client, book):
+        response = client.get(reverse('async-book-detail', args=[book.book_uuid]))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['title'] == book.title
+
+        response = client.get(reverse('async-book-availability', args=[book.book_uuid]))
+        assert response.json() == {'available': True}
+
+    def test_missing_book_is_not_found(self, client):
+        missing = uuid.uuid4()
+        for name in ('async-book-detail', 'async-book-availability'):
+            response = client.get(reverse(name, args=[missing]))
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+            assert response.json() == {'errors': 'Book not found.'}
+
+    def test_invalid_cursor_is_rejected(self, client):
+        response = client.get(reverse('async-book-list'), {'cursor': 'not-a-cursor'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,84 @@
+"""
+Book import command tests
+"""
+import json
+import uuid
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+from library.models import Book
+
+DATABASES = ['default', 'admin']
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestImportBooks:
+
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        path = tmp_path / 'books.csv'
+        path.write_text(
+            'book_uuid,title,publisher,category,availability_status\n'
+            f'{uuid.UUID(int=1)},Dune,Chilton,Science Fiction,true\n'
+            f'{uuid.UUID(int=2)},"Comma, Quoted",Joshua,Fiction,\n'
+            ',,Joshua,Fiction,\n'
+            f'{uuid.UUID(int=3)},Lent Out,Joshua,Fiction,no\n'
+        )
+        return path
+
+    def run(self, *args, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_books', *args, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_is_loaded_into_every_database(self, csv_file):
+        stdout, stderr = self.run(str(csv_file))
+
+        for db in DATABASES:
+            books = {book.book_uuid: book for book in Book.objects.using(db).all()}
+            assert set(books) == {uuid.UUID(int=1), uuid.UUID(int=2), uuid.UUID(int=3)}
+            assert books[uuid.UUID(int=2)].title == 'Comma, Quoted'
+            assert books[uuid.UUID(int=3)].availability_status is False
+        assert 'line 4:' in stderr
+        assert '3 new, 0 updated, 1 invalid' in stdout
+
+    def test_reimport_updates_catalogue_fields_only(self, tmp_path, csv_file):
+        self.run(str(csv_file))
+        Book.objects.using('default').filter(book_uuid=uuid.UUID(int=1)).update(availability_status=False)
+        path = tmp_path / 'books.jsonl'
+        path.write_text('\n'.join(json.dumps(record) for record in [
+            {'book_uuid': str(uuid.UUID(int=1)), 'title': 'Dune (Revised)', 'publisher': 'Chilton',
+             'category': 'Science Fiction'},
+            {'book_uuid': str(uuid.UUID(int=2)), 'title': 'Comma, Quoted', 'publisher': 'Joshua',
+             'category': 'Fiction'},
+        ]))
+
+        stdout, _ = self.run(str(path), workers=2, chunk_size=1)
+
+        book = Book.objects.using('default').get(book_uuid=uuid.UUID(int=1))
+        assert book.title == 'Dune (Revised)'
+        assert book.availability_status is False
+        assert '0 new, 1 updated' in stdout
+
+    def test_a_regular_table_named_like_the_staging_table_is_left_alone(self, csv_file):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE TABLE book_import_staging (kept integer)")
+            cursor.execute("INSERT INTO book_import_staging VALUES (1)")
+
+        stdout, _ = self.run(str(csv_file))
+
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT kept FROM public.book_import_staging")
+            assert cursor.fetchall() == [(1,)]
+        assert '3 new' in stdout
+
+    def test_aborts_past_max_errors(self, tmp_path):
+        path = tmp_path / 'books.jsonl'
+        path.write_text('{"title": ""}\nnot json\n')
+
+        with pytest.raises(CommandError):
+            self.run(str(path), max_errors=1)
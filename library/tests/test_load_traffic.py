@@ -0,0 +1,193 @@
+"""
+Load test traffic tests
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.urls import resolve
+
+from library.benchmarks import traffic
+from library.tests.factories import BookFactory, UserFactory
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Answers GETs with 200 and POSTs with 201, or 400 when their JSON body asks for it, recording what it received.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.received.append(('GET', self.path, None))
+        self._answer(200)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.received.append(('POST', self.path, body))
+        self._answer(400 if body.get('reject') else 201)
+
+    def _answer(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class _DroppingHandler(_Handler):
+    """
+    Answers the first request of a connection, then drops the connection on the next one after reading it,
+    without answering, like a server restarting mid-request.
+    """
+    answered = False
+
+    def _answer(self, status):
+        if self.answered:
+            self.close_connection = True
+            return
+        self.answered = True
+        super()._answer(status)
+
+
+def _serve(handler):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    httpd.received = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    yield from _serve(_Handler)
+
+
+@pytest.fixture
+def dropping_server():
+    yield from _serve(_DroppingHandler)
+
+
+@pytest.fixture
+def sample():
+    return traffic.Sample(
+        books=['0b3e4d1e-4f9a-4c58-9c41-8ad6b5b7a6c1'],
+        available_books=['0b3e4d1e-4f9a-4c58-9c41-8ad6b5b7a6c1'],
+        users=['5f0d0d63-3c8a-4a4e-8f3a-2b0a4b0fb0d2'],
+        publishers=['Penguin'],
+        categories=['Fiction'],
+    )
+
+
+class TestGenerate:
+
+    def test_mix_is_weighted_deterministic_and_paced(self, sample):
+        mix = {'book-list': 3, 'borrow-book': 1, 'enroll-user': 0}
+
+        requests = traffic.generate(mix, sample, rate=100, duration=20, seed=1)
+
+        assert len(requests) == 2000
+        assert requests[1].offset == pytest.approx(0.01)
+        counts = {name: sum(1 for request in requests if request.name == name) for name in mix}
+        assert counts['enroll-user'] == 0
+        assert 2.5 < counts['book-list'] / counts['borrow-book'] < 3.5
+        assert requests == traffic.generate(mix, sample, rate=100, duration=20, seed=1)
+
+    def test_paths_resolve_to_their_endpoints(self, sample):
+        mix = dict.fromkeys(traffic.ENDPOINTS, 1)
+
+        requests = traffic.generate(mix, sample, rate=50, duration=2)
+
+        for request in requests:
+            urlconf = traffic.URLCONFS[request.api]
+            assert resolve(request.path.split('?')[0], urlconf=urlconf).url_name == request.name
+        emails = [request.body['email'] for request in requests if request.name == 'enroll-user']
+        assert len(set(emails)) == len(emails)
+
+    def test_unknown_endpoint(self, sample):
+        with pytest.raises(ValueError, match='Unknown endpoints: nope'):
+            traffic.generate({'nope': 1}, sample, rate=1, duration=1)
+
+    @pytest.mark.django_db
+    def test_sample_reads_the_database(self):
+        books = BookFactory.create_batch(3)
+        user = UserFactory()
+
+        sample = traffic.Sample.load('default')
+
+        assert sorted(sample.books) == sorted(str(book.book_uuid) for book in books)
+        assert sample.users == [str(user.user_uuid)]
+        assert sample.publishers == sorted({book.publisher for book in books})
+
+
+class TestDrive:
+
+    def test_sends_requests_and_summarizes_per_endpoint(self, server):
+        base = f"http://127.0.0.1:{server.server_port}/library/"
+        requests = [
+            traffic.Request(0.0, 'book-list', 'frontend', 'GET', '/books/'),
+            traffic.Request(0.01, 'borrow-book', 'frontend', 'POST', '/books/borrow/', {'days': 7}),
+            traffic.Request(0.02, 'borrow-book', 'frontend', 'POST', '/books/borrow/', {'reject': True}),
+            traffic.Request(0.03, 'unavailable-books', 'admin', 'GET', '/books/unavailable/'),
+        ]
+
+        results, elapsed = traffic.drive(requests, {'frontend': base, 'admin': base}, concurrency=2)
+        summary = traffic.summarize(results, elapsed)
+
+        assert [result.status for result in results] == [200, 201, 400, 200]
+        assert ('POST', '/library/books/borrow/', {'days': 7}) in server.received
+        assert summary['borrow-book']['requests'] == 2
+        assert summary['borrow-book']['rejected'] == 1
+        assert summary['borrow-book']['statuses'] == {'201': 1, '400': 1}
+        assert summary['total']['errors'] == 0
+        assert summary['total']['p99_ms'] >= summary['total']['p50_ms']
+
+    def test_unreachable_server_counts_as_error(self):
+        requests = [traffic.Request(0.0, 'book-list', 'frontend', 'GET', '/books/')]
+
+        results, elapsed = traffic.drive(requests, {'frontend': 'http://127.0.0.1:9/'}, concurrency=1)
+
+        assert results[0].status is None
+        assert traffic.summarize(results, elapsed)['book-list']['errors'] == 1
+
+    def test_only_idempotent_requests_are_sent_again_on_a_dropped_connection(self, dropping_server):
+        base = f"http://127.0.0.1:{dropping_server.server_port}/library/"
+        requests = [
+            traffic.Request(0.0, 'book-list', 'frontend', 'GET', '/books/'),
+            traffic.Request(0.01, 'book-list', 'frontend', 'GET', '/books/'),
+            traffic.Request(0.02, 'borrow-book', 'frontend', 'POST', '/books/borrow/', {'days': 7}),
+        ]
+
+        results, _ = traffic.drive(requests, {'frontend': base}, concurrency=1)
+
+        assert [result.status for result in results] == [200, 200, None]
+        assert results[2].error is not None
+        # The dropped GET was sent again, the POST the server received was not
+        assert [method for method, _, _ in dropping_server.received] == ['GET', 'GET', 'GET', 'POST']
+
+    def test_recorded_log_replays_the_same_requests(self, server, tmp_path, sample):
+        base = f"http://127.0.0.1:{server.server_port}/library/"
+        requests = traffic.generate({'book-detail': 1, 'enroll-user': 1}, sample, rate=200, duration=0.1)
+        results, _ = traffic.drive(requests, {'frontend': base}, concurrency=4)
+        log = tmp_path / 'requests.jsonl'
+
+        traffic.write_log(log, results)
+
+        assert traffic.read_log(log) == requests
+        assert json.loads(log.read_text().splitlines()[0])['status'] in (200, 201)
+
+    def test_replayed_enrollments_get_new_emails(self, sample):
+        requests = traffic.generate({'book-detail': 1, 'enroll-user': 1}, sample, rate=200, duration=0.1)
+
+        renewed = traffic.renew(requests)
+
+        assert [request.path for request in renewed] == [request.path for request in requests]
+        emails = {request.body['email'] for request in requests if request.name == 'enroll-user'}
+        renewed_emails = {request.body['email'] for request in renewed if request.name == 'enroll-user'}
+        assert len(renewed_emails) == len(emails) > 0
+        assert not renewed_emails & emails
+        assert traffic.renew(requests, run='x') == traffic.renew(requests, run='x')
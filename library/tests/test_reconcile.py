@@ -0,0 +1,78 @@
+"""
+Reconciliation tests
+"""
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.reconcile import Reconciler
+from library.models import Book
+
+DATABASES = ['default', 'admin']
+
+
+def snapshot(db):
+    return set(Book.objects.using(db).values_list('book_uuid', 'title', 'availability_status'))
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestReconcile:
+
+    @pytest.fixture
+    def books(self):
+        books = [
+            {'book_uuid': uuid.uuid4(), 'title': f'Book {i}', 'publisher': 'Joshua', 'category': 'Fiction'}
+            for i in range(40)
+        ]
+        BookRepository().add_books(books)
+        return [book['book_uuid'] for book in books]
+
+    @pytest.fixture
+    def drift(self, books):
+        later = timezone.now() + timedelta(minutes=1)
+        Book.objects.using('admin').filter(pk=books[0]).update(title='Renamed', modified=later)
+        Book.objects.using('default').filter(pk=books[1]).update(availability_status=False, modified=later)
+        Book.objects.using('default').filter(pk=books[2]).delete()
+        extra = {'book_uuid': uuid.uuid4(), 'title': 'Only Admin', 'publisher': 'Joshua', 'category': 'Fiction'}
+        BookRepository(databases=['admin']).add_book(extra)
+        return extra['book_uuid']
+
+    def test_in_sync_databases_are_compared_in_one_pass(self, books):
+        report, differences = Reconciler(BookRepository(), leaf_size=4).run()
+
+        assert differences == {}
+        assert report.ranges == 1 and report.rows == 0
+
+    def test_newest_version_wins_and_missing_rows_are_copied(self, books, drift):
+        report, differences = Reconciler(BookRepository(), leaf_size=4).run()
+
+        assert set(differences) == {books[0], books[1], books[2], drift}
+        assert report.rows < len(books)
+        assert report.copied == {'default': 3, 'admin': 1}
+        assert snapshot('default') == snapshot('admin')
+        book = Book.objects.using('default').get(pk=books[0])
+        assert book.title == 'Renamed'
+        assert not Book.objects.using('admin').get(pk=books[1]).availability_status
+
+    def test_source_database_is_authoritative(self, books, drift):
+        before = snapshot('default')
+
+        report, _ = Reconciler(BookRepository(), source='default').run()
+
+        assert snapshot('admin') == snapshot('default') == before
+        assert report.deleted == {'default': 0, 'admin': 2}
+
+    def test_dry_run_only_reports(self, books, drift):
+        before = snapshot('admin')
+        stdout = StringIO()
+
+        call_command('reconcile', 'books', dry_run=True, verbosity=2, stdout=stdout)
+
+        assert snapshot('admin') == before
+        assert '4 differing rows' in stdout.getvalue()
+        assert f'{drift} (default: missing' in stdout.getvalue()
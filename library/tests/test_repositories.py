@@ -0,0 +1,134 @@
+"""
+Repository tests
+"""
+import threading
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from django.db import IntegrityError, connections, transaction
+
+from core.domain.models import BorrowRecord as BorrowRecordRecord
+from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.borrow_repository import BorrowRepository
+from infrastructure.repositories.fanout import FanOutError, fan_out
+from library.models import Book, BorrowRecord
+from library.tests.factories import BookFactory, UserFactory
+
+DATABASES = ['default', 'admin']
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestBulkRepositoryMethods:
+
+    @pytest.fixture
+    def books(self):
+        books = [
+            {'book_uuid': uuid.uuid4(), 'title': f'Book {i}', 'publisher': 'Joshua', 'category': 'Fiction'}
+            for i in range(5)
+        ]
+        assert BookRepository().add_books(books, batch_size=2) == {'default': 5, 'admin': 5}
+        return books
+
+    def test_update_many_sets_per_row_values(self, books, django_assert_max_num_queries):
+        updates = [{'book_uuid': book['book_uuid'], 'title': f"Renamed {book['title']}"} for book in books]
+
+        with django_assert_max_num_queries(5, using='admin'):
+            result = BookRepository().update_books(updates, ['title'], batch_size=2)
+
+        assert result == {'default': 5, 'admin': 5}
+        for db in DATABASES:
+            titles = set(Book.objects.using(db).values_list('title', flat=True))
+            assert titles == {f'Renamed Book {i}' for i in range(5)}
+
+    def test_remove_many_deletes_in_batches(self, books):
+        result = BookRepository().remove_books([book['book_uuid'] for book in books[:3]], batch_size=2)
+
+        assert result == {'default': 3, 'admin': 3}
+        for db in DATABASES:
+            assert Book.objects.using(db).count() == 2
+
+
+@pytest.mark.django_db(databases=DATABASES)
+class TestBorrowWritePath:
+
+    def test_borrow_is_one_statement_on_the_target_database_only(
+            self, django_assert_num_queries, django_assert_max_num_queries):
+        book = BookFactory()
+        user = UserFactory()
+        record = BorrowRecordRecord(
+            borrow_date=date.today(),
+            due_date=date.today() + timedelta(days=7),
+            book_uuid=book.book_uuid,
+            user_uuid=user.user_uuid,
+        )
+
+        with django_assert_max_num_queries(0, using='admin'):
+            with django_assert_num_queries(1, using='default'):
+                BorrowRepository(databases=['default']).create_borrow_record(record)
+
+        saved = BorrowRecord.objects.get(record_uuid=record.record_uuid)
+        assert str(saved.book_id) == str(book.book_uuid)
+        assert str(saved.user_id) == str(user.user_uuid)
+        book.refresh_from_db()
+        assert book.availability_status is False
+
+
+@pytest.mark.django_db(databases=DATABASES, transaction=True)
+class TestParallelFanOut:
+
+    @pytest.fixture(autouse=True)
+    def parallel_mode(self, settings):
+        settings.REPOSITORY_FANOUT = 'parallel'
+
+    def test_databases_are_reached_concurrently(self):
+        barrier = threading.Barrier(len(DATABASES), timeout=5)
+
+        def operation(db):
+            barrier.wait()
+            return threading.current_thread().name
+
+        results = fan_out(DATABASES, operation)
+
+        assert list(results) == DATABASES
+        assert all(name.startswith('repository-fanout') for name in results.values())
+
+    def test_pool_threads_reuse_their_connections(self, settings):
+        def operation(db):
+            with connections[db].cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                return threading.get_ident(), cursor.fetchone()[0]
+
+        # More fan-outs than threads, so some thread serves a database more than once
+        backends = {}
+        for _ in range(settings.REPOSITORY_FANOUT_WORKERS + 1):
+            for db, (thread, pid) in fan_out(DATABASES, operation).items():
+                backends.setdefault((thread, db), []).append(pid)
+
+        assert any(len(pids) > 1 for pids in backends.values())
+        assert all(len(set(pids)) == 1 for pids in backends.values())
+
+    def test_repository_writes_and_reads_fan_out(self):
+        books = [{'book_uuid': uuid.uuid4(), 'title': f'Book {i}', 'publisher': 'Joshua', 'category': 'Fiction'}
+                 for i in range(3)]
+
+        assert BookRepository().add_books(books) == {'default': 3, 'admin': 3}
+        assert len(BookRepository().list(publisher='Joshua')) == 6
+        assert BookRepository().remove_book(books[0]['book_uuid']) == {'default': True, 'admin': True}
+
+    def test_errors_are_collected_per_database(self):
+        book = {'book_uuid': uuid.uuid4(), 'title': 'Book', 'publisher': 'Joshua', 'category': 'Fiction'}
+        BookRepository(databases=['admin']).add_book(book)
+
+        with pytest.raises(FanOutError) as error:
+            BookRepository().add_books([book])
+
+        assert error.value.results == {'default': 1}
+        assert list(error.value.errors) == ['admin']
+        assert isinstance(error.value.errors['admin'], IntegrityError)
+
+    def test_atomic_blocks_stay_on_the_calling_thread(self):
+        with transaction.atomic(using='default'):
+            results = fan_out(DATABASES, lambda db: threading.current_thread().name)
+
+        assert set(results.values()) == {threading.current_thread().name}
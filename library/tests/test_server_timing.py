@@ -0,0 +1,110 @@
+"""
+Server-Timing instrumentation tests
+"""
+import json
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+
+from library.tests.factories import BookFactory, BorrowRecordFactory, UserFactory
+from shared.instrumentation import collect, timed
+
+
+def metrics(response):
+    """
+    Parse a Server-Timing header into {metric: {parameter: value}}.
+    """
+    parsed = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *parameters = metric.split(';')
+        parsed[name] = dict(parameter.split('=', 1) for parameter in parameters)
+    return parsed
+
+
+@pytest.mark.django_db(databases=['default', 'admin'])
+class TestServerTiming:
+
+    @pytest.fixture(autouse=True)
+    def frontend(self, settings):
+        settings.ROOT_URLCONF = 'library.endpoints.frontend_urls'
+        settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+        settings.SERVER_TIMING_HEADER = True
+
+    def test_reports_queries_per_database_and_serializer_time(self, client):
+        record = BorrowRecordFactory()
+
+        response = client.get(reverse('user-borrow-records', kwargs={'user_uuid': record.user_id}))
+
+        timing = metrics(response)
+        assert timing['db-default']['desc'].endswith(' queries"')
+        assert float(timing['db-default']['dur']) > 0
+        assert 'serialize' in timing
+        assert float(timing['total']['dur']) >= float(timing['db-default']['dur'])
+
+    def test_reports_publish_time(self, client, settings):
+        settings.EVENT_PUBLISH_MODE = 'outbox'
+        user, book = UserFactory(), BookFactory()
+
+        response = client.post(
+            reverse('borrow-book'), {'user_uuid': str(user.user_uuid), 'book_uuid': str(book.book_uuid), 'days': 7},
+            content_type='application/json'
+        )
+
+        assert response.status_code == 201
+        assert 'publish' in metrics(response)
+
+    def test_async_views_are_instrumented(self):
+        book = BookFactory()
+
+        response = async_to_sync(AsyncClient().get)(reverse('async-book-detail', kwargs={'book_uuid': book.book_uuid}))
+
+        assert response.status_code == 200
+        assert 'total' in metrics(response)
+
+    def test_unsampled_requests_are_left_alone(self, client, settings, caplog):
+        settings.SERVER_TIMING_SAMPLE_RATE = 0.0
+
+        with caplog.at_level(logging.INFO, logger='shared.instrumentation'):
+            response = client.get(reverse('book-list'))
+
+        assert 'Server-Timing' not in response
+        assert not caplog.records
+
+    def test_logs_without_the_header(self, client, settings, caplog):
+        settings.SERVER_TIMING_HEADER = False
+        BookFactory()
+
+        with caplog.at_level(logging.INFO, logger='shared.instrumentation'):
+            response = client.get(reverse('book-list'))
+
+        assert 'Server-Timing' not in response
+        line = json.loads(caplog.records[-1].getMessage())
+        assert line['path'] == reverse('book-list')
+        assert line['status'] == 200
+        assert line['db']['default']['queries'] >= 1
+
+
+class TestTimed:
+
+    def test_spans_add_up_and_are_free_outside_requests(self):
+        with timed('serialize'):
+            pass
+
+        with collect() as timings:
+            for _ in range(2):
+                with timed('serialize'):
+                    pass
+
+        assert set(timings.summary()['spans']) == {'serialize'}
+        assert timings.summary()['spans']['serialize'] >= 0
+
+    def test_nested_timings_add_up_in_the_outer_block(self):
+        with collect() as outer:
+            with collect() as inner:
+                with timed('publish'):
+                    pass
+
+        assert set(outer.summary()['spans']) == set(inner.summary()['spans']) == {'publish'}
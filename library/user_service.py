@@ -9,6 +9,7 @@ from core.domain.models import User
 from library.serializers import BorrowRecordSerializer
 from library.validators import UserSerializer
 from infrastructure.persistence.base_postgres_handler import PostgresHandlerFrontend, PostgresHandlerAdmin
+from shared.instrumentation import timed
 
 class UserService:
     """
@@ -45,8 +46,18 @@ class UserService:
         :return: Serialized data of all users.
         """
         users = self.default_db.list_users()
-        serializer = UserSerializer(users, many=True)
-        return serializer.data
+        with timed('serialize'):
+            serializer = UserSerializer(users, many=True)
+            return serializer.data
+
+    def stream_users(self):
+        """
+        Lazily serialize every enrolled user, one row at a time.
+        :return: Generator of serialized users.
+        """
+        serializer = UserSerializer()
+        for user in self.default_db.iter_users():
+            yield serializer.to_representation(user)
 
     def get_user_borrow_records(self, user_uuid: uuid):
         """
@@ -54,6 +65,7 @@ class UserService:
         :param user_uuid:
         :return: Serialized borrow records.
         """
-        borrow_records = self.default_db.get_borrow_record(user_uuid=user_uuid, book_uuid=None)
-        serializer = BorrowRecordSerializer(borrow_records, many=True)
-        return serializer.data  # Adjust if serialization is required
+        borrow_records = self.default_db.list_user_borrow_records(user_uuid)
+        with timed('serialize'):
+            serializer = BorrowRecordSerializer(borrow_records, many=True)
+            return serializer.data
@@ -1,11 +1,17 @@
 """
 Validator for application
 """
+import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.utils.timezone import now
 from rest_framework import serializers
 
+from core.domain.services import LibraryService
+from library.serializers import to_domain_book
+from shared.pagination import decode_cursor
+
 class BorrowSerializer(serializers.Serializer):
     """
     Serializer for borrow-related input.
@@ -59,8 +65,8 @@ class BorrowSerializer(serializers.Serializer):
         if not book:
             raise serializers.ValidationError("User not found.")
 
-        if not book.availability_status:
-            raise serializers.ValidationError(f"Book '{book.title}' is not available for borrowing.")
+        if not LibraryService().is_book_available(to_domain_book(book)):
+            raise serializers.ValidationError(f"Book '{book['title']}' is not available for borrowing.")
 
         # Calculate borrow_date and due_date based on the input days
         borrow_date = now()
@@ -102,3 +108,82 @@ class UserSerializer(serializers.Serializer):
         if not value:
             raise serializers.ValidationError("Lastname must not be empty.")
         return value
+
+
+class PageSerializer(serializers.Serializer):
+    """
+    Serializer for keyset pagination input.
+    """
+    cursor = serializers.CharField(required=False, allow_blank=True)
+    page_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.CATALOGUE_MAX_PAGE_SIZE,
+    )
+
+    def validate_cursor(self, value):
+        """
+        Decode the opaque cursor into the key to continue from.
+        :param value: Cursor token.
+        :return: Decoded key or None for the first page.
+        """
+        if not value:
+            return None
+        try:
+            return str(uuid.UUID(decode_cursor(value)))
+        except (TypeError, ValueError, AttributeError):
+            raise serializers.ValidationError("Invalid cursor.")
+
+
+class FilterSerializer(PageSerializer):
+    """
+    Serializer for catalogue filter input.
+    """
+    match = serializers.ChoiceField(choices=['exact', 'fuzzy'], default='exact')
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """
+    Serializer for publisher/category autocomplete input.
+    """
+    field = serializers.ChoiceField(choices=['publisher', 'category'])
+    # A single character carries no selective trigram, so it would scan the whole catalogue
+    q = serializers.CharField(min_length=2, max_length=255)
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.AUTOCOMPLETE_MAX_LIMIT,
+        default=settings.AUTOCOMPLETE_LIMIT,
+    )
+
+
+class SearchSerializer(PageSerializer):
+    """
+    Serializer for full-text search input.
+    """
+    q = serializers.CharField(max_length=200)
+
+    def validate_q(self, value):
+        """
+        Validate that the search terms are non-empty.
+        :param value: Search terms.
+        :return: Stripped search terms.
+        """
+        value = value.strip()
+        if not value:
+            raise serializers.ValidationError("Search terms must not be empty.")
+        return value
+
+    def validate_cursor(self, value):
+        """
+        Decode the opaque cursor into the rank and ID to continue from.
+        :param value: Cursor token.
+        :return: Decoded [rank, uuid] key or None for the first page.
+        """
+        if not value:
+            return None
+        try:
+            rank, book_uuid = decode_cursor(value)
+            return [float(rank), str(uuid.UUID(book_uuid))]
+        except (TypeError, ValueError, AttributeError):
+            raise serializers.ValidationError("Invalid cursor.")
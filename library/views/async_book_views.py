@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+
+from library.book_service import BookService
+
+
+class AsyncReadView(View):
+    """
+    Base class for the async read endpoints.
+    Async views cannot run inside ATOMIC_REQUESTS, so these read-only views opt out on every database.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        for alias in settings.DATABASES:
+            view = transaction.non_atomic_requests(using=alias)(view)
+        return view
+
+
+class AsyncBookListView(AsyncReadView):
+    """
+    Async API view to list all available books.
+    """
+    async def get(self, request):
+        cursor = request.GET.get("cursor")
+        page_size = request.GET.get("page_size")
+        book_service = BookService()
+        try:
+            books = await book_service.alist_available_books(cursor, page_size)
+            return JsonResponse(books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return JsonResponse({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncBookDetailView(AsyncReadView):
+    """
+    Async API view to get a single book by its ID.
+    """
+    async def get(self, request, book_uuid):
+        book_service = BookService()
+        try:
+            book = await book_service.aget_book_by_id(book_uuid)
+        except NotFound as e:
+            return JsonResponse({"errors": e.detail}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(book, status=status.HTTP_200_OK)
+
+
+class AsyncBookAvailabilityView(AsyncReadView):
+    """
+    Async API view to check book availability.
+    """
+    async def get(self, request, book_uuid):
+        book_service = BookService()
+        try:
+            available = await book_service.aget_book_availability(book_uuid)
+        except NotFound as e:
+            return JsonResponse({"errors": e.detail}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({"available": available}, status=status.HTTP_200_OK)
+
+
+class AsyncBookFilterView(AsyncReadView):
+    """
+    Async API view to filter books by publisher and category.
+    """
+    async def get(self, request):
+        publisher = request.GET.get("publisher")
+        category = request.GET.get("category")
+        cursor = request.GET.get("cursor")
+        page_size = request.GET.get("page_size")
+        match = request.GET.get("match")
+        book_service = BookService()
+        try:
+            filtered_books = await book_service.afilter_books(publisher, category, cursor, page_size, match)
+            return JsonResponse(filtered_books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return JsonResponse({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
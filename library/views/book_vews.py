@@ -2,11 +2,13 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from uuid import UUID
 
 from library.book_service import BookService
 from core.domain.models import Book as BookRecord
 from library.models import Book
+from library.renderers import NDJSONRenderer, stream_requested, streaming_response
 
 
 class BookListView(APIView):
@@ -14,9 +16,14 @@ class BookListView(APIView):
     API view to list all available books.
     """
     def get(self, request):
+        cursor = request.query_params.get("cursor")
+        page_size = request.query_params.get("page_size")
         book_service = BookService()
-        books = book_service.list_available_books()
-        return Response(books, status=status.HTTP_200_OK)
+        try:
+            books = book_service.list_available_books(cursor, page_size)
+            return Response(books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class BorrowBookView(APIView):
@@ -49,6 +56,9 @@ class AddBookView(APIView):
             return Response(new_book, status=status.HTTP_201_CREATED)
         except ValidationError as e:
             return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            # Raised by the domain model for a book missing its title, publisher or category
+            return Response({"errors": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class RemoveBookView(APIView):
@@ -70,9 +80,14 @@ class RemoveBookView(APIView):
 class BorrowedBookListView(APIView):
     """
     API view to list all borrowed books.
+    Pass `?stream=1` or `Accept: application/x-ndjson` to stream the rows.
     """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+
     def get(self, request):
         book_service = BookService()
+        if stream_requested(request):
+            return streaming_response(request, book_service.stream_borrowed_books())
         borrowed_books = book_service.list_borrowed_books()
         return Response(borrowed_books, status=status.HTTP_200_OK)
 
@@ -105,15 +120,56 @@ class BookFilterView(APIView):
     def get(self, request):
         publisher = request.query_params.get("publisher")
         category = request.query_params.get("category")
+        cursor = request.query_params.get("cursor")
+        page_size = request.query_params.get("page_size")
+        match = request.query_params.get("match")
         book_service = BookService()
-        filtered_books = book_service.filter_books(publisher, category)
-        return Response(filtered_books, status=status.HTTP_200_OK)
+        try:
+            filtered_books = book_service.filter_books(publisher, category, cursor, page_size, match)
+            return Response(filtered_books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+class BookAutocompleteView(APIView):
+    """
+    API view to suggest publisher or category values while the user types.
+    """
+    def get(self, request):
+        field = request.query_params.get("field")
+        query = request.query_params.get("q")
+        limit = request.query_params.get("limit")
+        book_service = BookService()
+        try:
+            suggestions = book_service.autocomplete(field, query, limit)
+            return Response({"results": suggestions}, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+class BookSearchView(APIView):
+    """
+    API view to search books by title.
+    """
+    def get(self, request):
+        query = request.query_params.get("q")
+        cursor = request.query_params.get("cursor")
+        page_size = request.query_params.get("page_size")
+        book_service = BookService()
+        try:
+            matching_books = book_service.search_books(query, cursor, page_size)
+            return Response(matching_books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
 
 class UnavailableBooksView(APIView):
     """
     API view to list books that are not available for borrowing.
     """
     def get(self, request):
+        cursor = request.query_params.get("cursor")
+        page_size = request.query_params.get("page_size")
         book_service = BookService()
-        unavailable_books = book_service.list_unavailable_books()
-        return Response(unavailable_books, status=status.HTTP_200_OK)
\ No newline at end of file
+        try:
+            unavailable_books = book_service.list_unavailable_books(cursor, page_size)
+            return Response(unavailable_books, status=status.HTTP_200_OK)
+        except ValidationError as e:
+            return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
@@ -0,0 +1,28 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework import status
+
+from infrastructure.cache.cache_counters import COUNTERS
+from infrastructure.cache.event_metrics import EventMetrics
+from library.renderers import PrometheusRenderer
+
+
+class EventMetricsView(APIView):
+    """
+    API view exposing the event pipeline metrics to Prometheus: applied and failed events,
+    publish to apply delay, processing time and SQL time per database, per topic and action.
+    """
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(EventMetrics().render(), status=status.HTTP_200_OK)
+
+
+class CacheMetricsView(APIView):
+    """
+    API view exposing the cache counters to Prometheus: hits, misses, invalidations and errors per cache.
+    """
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(COUNTERS.render(), status=status.HTTP_200_OK)
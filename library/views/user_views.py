@@ -2,18 +2,25 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from uuid import UUID
 
 from core.domain.models import User
+from library.renderers import NDJSONRenderer, stream_requested, streaming_response
 from library.user_service import UserService
 
 
 class UserListView(APIView):
     """
     API view to list all users.
+    Pass `?stream=1` or `Accept: application/x-ndjson` to stream the rows.
     """
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer]
+
     def get(self, request):
         user_service = UserService()
+        if stream_requested(request):
+            return streaming_response(request, user_service.stream_users())
         users = user_service.list_users()
         return Response(users, status=status.HTTP_200_OK)
 
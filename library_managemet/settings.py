@@ -40,11 +40,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     "library"
 ]
 
 MIDDLEWARE = [
+    # First, so the timings it reports cover every other middleware
+    'shared.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -157,6 +160,12 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        # One JSON line of timings per sampled request
+        'shared.instrumentation': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -167,15 +176,95 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_BROKER_URL = config('REDIS_URL')
 CELERY_RESULT_BACKEND = config('REDIS_URL')
 
+# Events are delivered at least once: tasks are acknowledged after they ran and requeued if the
+# worker dies, and the worker skips events it already applied (see EVENT_DEDUP_TTL)
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=4, cast=int)
+# Redelivery of unacknowledged tasks, must outlast the longest task
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': config('CELERY_VISIBILITY_TIMEOUT', default=3600, cast=int)}
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': config('REDIS_URL'),
-    }
+    },
+    # Used in place of 'default' by the benchmark suite, so its invalidations never reach the served caches
+    'benchmark': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL'),
+        'KEY_PREFIX': 'benchmark',
+    },
 }
 
 CACHES_EXPIRY = 4000
 
+# Keyset pagination for the catalogue endpoints
+CATALOGUE_PAGE_SIZE = config('CATALOGUE_PAGE_SIZE', default=50, cast=int)
+CATALOGUE_MAX_PAGE_SIZE = config('CATALOGUE_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Suggestions returned by the publisher/category autocomplete endpoint
+AUTOCOMPLETE_LIMIT = config('AUTOCOMPLETE_LIMIT', default=10, cast=int)
+AUTOCOMPLETE_MAX_LIMIT = config('AUTOCOMPLETE_MAX_LIMIT', default=50, cast=int)
+
+# Rows per statement for the repositories' bulk add/update/remove methods
+REPOSITORY_BATCH_SIZE = config('REPOSITORY_BATCH_SIZE', default=1000, cast=int)
+
+# How repositories run an operation over several databases: 'serial' one after the other,
+# 'parallel' concurrently on a bounded pool of threads, each with its own connections. Pool threads keep
+# their connections open between operations, whatever CONN_MAX_AGE says, so up to REPOSITORY_FANOUT_WORKERS
+# connections per database stay open in each process that fans out; one an error left unusable is reopened
+REPOSITORY_FANOUT = config('REPOSITORY_FANOUT', default='serial')
+REPOSITORY_FANOUT_WORKERS = config('REPOSITORY_FANOUT_WORKERS', default=4, cast=int)
+
+# Key ranges holding at most this many rows are compared row by row by the reconcile command
+RECONCILE_LEAF_SIZE = config('RECONCILE_LEAF_SIZE', default=1000, cast=int)
+
+# Rows fetched per round trip from the server-side cursor of streamed responses
+STREAM_CHUNK_SIZE = config('STREAM_CHUNK_SIZE', default=2000, cast=int)
+
 CELERY_ALWAYS_EAGER = False
 
+# Event publishing: 'direct' sends one task per event, 'batch' buffers committed events and sends one
+# task per run of same-topic events at the end of the request or task, or once a threshold is reached,
+# 'outbox' writes events to the source database in the request transaction for the relay to send
+EVENT_PUBLISH_MODE = config('EVENT_PUBLISH_MODE', default='direct')
+EVENT_BATCH_SIZE = config('EVENT_BATCH_SIZE', default=500, cast=int)
+EVENT_BATCH_MAX_DELAY = config('EVENT_BATCH_MAX_DELAY', default=1.0, cast=float)
+
+# Seconds the worker remembers applied event ids, and retries of events failing on transient errors
+EVENT_DEDUP_TTL = config('EVENT_DEDUP_TTL', default=86400, cast=int)
+EVENT_MAX_RETRIES = config('EVENT_MAX_RETRIES', default=10, cast=int)
+
+# Outbox relay, run by Celery beat every OUTBOX_RELAY_INTERVAL seconds for at most
+# OUTBOX_RELAY_MAX_BATCHES batches of EVENT_BATCH_SIZE events per database
+OUTBOX_RELAY_INTERVAL = config('OUTBOX_RELAY_INTERVAL', default=1.0, cast=float)
+OUTBOX_RELAY_MAX_BATCHES = config('OUTBOX_RELAY_MAX_BATCHES', default=100, cast=int)
+
+# Incremental sync between the databases, run by Celery beat every SYNC_INTERVAL seconds: rows modified
+# since the last run are copied in batches, leaving the last SYNC_SETTLE_SECONDS for the next run
+SYNC_INTERVAL = config('SYNC_INTERVAL', default=300.0, cast=float)
+SYNC_BATCH_SIZE = config('SYNC_BATCH_SIZE', default=1000, cast=int)
+SYNC_MAX_BATCHES = config('SYNC_MAX_BATCHES', default=100, cast=int)
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=5.0, cast=float)
+
+# Share of requests instrumented by ServerTimingMiddleware: their queries and SQL time per database,
+# serializer and event publish time are logged, and sent in a Server-Timing header if SERVER_TIMING_HEADER
+SERVER_TIMING_SAMPLE_RATE = config('SERVER_TIMING_SAMPLE_RATE', default=0.01, cast=float)
+SERVER_TIMING_HEADER = config('SERVER_TIMING_HEADER', default=True, cast=bool)
+
+CELERY_BEAT_SCHEDULE = {
+    'relay-outbox': {
+        'task': 'library.tasks.relay_outbox',
+        'schedule': OUTBOX_RELAY_INTERVAL,
+        # A run that could not start in time is superseded by the next one
+        'options': {'expires': OUTBOX_RELAY_INTERVAL},
+    },
+    'sync-databases': {
+        'task': 'library.tasks.sync_databases',
+        'schedule': SYNC_INTERVAL,
+        'options': {'expires': SYNC_INTERVAL},
+    },
+}
+
 AUTH_USER_MODEL = 'library.User'
\ No newline at end of file
@@ -2,12 +2,19 @@
 Broker
 """
 import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
 
 from core.domain.models import BorrowRecord
 from infrastructure.repositories.book_repository import BookRepository
+from infrastructure.repositories.outbox_repository import OutboxRepository
 from infrastructure.repositories.borrow_repository import BorrowRepository
 from infrastructure.repositories.user_repository import UserRepository
 from library_managemet.celery import app
+from shared.brokers.event_buffer import BUFFER
+from shared.instrumentation import timed
 
 LOG = logging.getLogger(__name__)
 
@@ -25,46 +32,119 @@ class DataBaseBroker:
         self.book_repository = BookRepository(databases=[source])
         self.user_repository = UserRepository(databases=[source])
         self.borrow_repository = BorrowRepository(databases=[source])
+        self.outbox_repository = OutboxRepository(databases=[source])
 
     def publish(self, topic, event):
         """
         Publish an event to a specific topic.
+        In batch mode the event is buffered once the surrounding transaction commits
+        and sent later together with other events of the same topic. In outbox mode it is written
+        to the source database in the surrounding transaction and sent by the outbox relay.
         :param topic: Event topic.
-        :param event: Event payload.
+        :param event: Event payload, stamped with its publish time for the worker to measure its delay.
+        """
+        event = {**event, "published_at": time.time()}
+        with timed('publish'):
+            if settings.EVENT_PUBLISH_MODE == 'outbox':
+                self.outbox_repository.append(topic, event)
+            elif settings.EVENT_PUBLISH_MODE == 'batch':
+                transaction.on_commit(lambda: BUFFER.add(topic, event), using=self.source)
+            else:
+                app.send_task('library.tasks.process_event', args=[topic, event])
+        LOG.info(f"application.tasks.process_event with: {topic}, {event}, mode {settings.EVENT_PUBLISH_MODE}")
+
+    def flush(self):
+        """
+        Send the events buffered in batch mode right away.
         """
-        app.send_task('library.tasks.process_event', args=[topic, event])
-        LOG.info(f"application.tasks.process_event with: {topic}, {event}")
+        BUFFER.flush()
 
-    def list_available_books(self):
+    def list_available_books(self, after=None, page_size=None):
         """
-        List all available books.
-        :return:
+        List a page of available books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
         """
-        return self.book_repository.list_available_books()
+        return self.book_repository.list_available_books(after, page_size)
 
-    def list_unavailable_books(self):
+    async def alist_available_books(self, after=None, page_size=None):
         """
-        List all unavailable books.
-        :return:
+        Async version of list_available_books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
         """
-        return self.book_repository.list_unavailable_books()
+        return await self.book_repository.alist_available_books(after, page_size)
+
+    def list_unavailable_books(self, after=None, page_size=None):
+        """
+        List a page of unavailable books.
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
+        """
+        return self.book_repository.list_unavailable_books(after, page_size)
 
     def get_book_by_id(self, book_uuid):
         """
         Fetch a single book by its ID.
         :param book_uuid:
-        :return:
+        :return: Serialized book, as BookSerializer renders it, or None if not found.
         """
         return self.book_repository.get_book_by_id(book_uuid)
 
-    def filter_books(self, publisher=None, category=None):
+    async def aget_book_by_id(self, book_uuid):
         """
-        Filter books by publisher or category.
+        Async version of get_book_by_id.
+        :param book_uuid:
+        :return: Serialized book, as BookSerializer renders it, or None if not found.
+        """
+        return await self.book_repository.aget_book_by_id(book_uuid)
+
+    def filter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
+        """
+        Filter a page of books by publisher or category.
         :param publisher:
         :param category:
+        :param after:
+        :param page_size:
+        :param fuzzy:
+        :return: Page of serialized books.
+        """
+        return self.book_repository.filter_books(publisher, category, after, page_size, fuzzy)
+
+    async def afilter_books(self, publisher=None, category=None, after=None, page_size=None, fuzzy=False):
+        """
+        Async version of filter_books.
+        :param publisher:
+        :param category:
+        :param after:
+        :param page_size:
+        :param fuzzy:
+        :return: Page of serialized books.
+        """
+        return await self.book_repository.afilter_books(publisher, category, after, page_size, fuzzy)
+
+    def suggest_values(self, field, query, limit):
+        """
+        Suggest distinct publisher or category values for a partial input.
+        :param field:
+        :param query:
+        :param limit:
         :return:
         """
-        return self.book_repository.filter_books(publisher, category)
+        return self.book_repository.suggest_values(field, query, limit)
+
+    def search_books(self, query, after=None, page_size=None):
+        """
+        Full-text search of book titles.
+        :param query:
+        :param after:
+        :param page_size:
+        :return: Page of serialized books.
+        """
+        return self.book_repository.search_books(query, after, page_size)
 
     def list_users(self):
         """
@@ -73,11 +153,18 @@ class DataBaseBroker:
         """
         return self.user_repository.list_users()
 
+    def iter_users(self):
+        """
+        Lazily iterate over all users enrolled in the library.
+        :return:
+        """
+        return self.user_repository.iter_users()
+
     def get_user_by_id(self, user_uuid):
         """
         Fetch a user by their ID.
         :param user_uuid:
-        :return:
+        :return: Serialized user, as UserSerializer renders it, or None if not found.
         """
         return self.user_repository.get_user_by_id(user_uuid)
 
@@ -100,9 +187,24 @@ class DataBaseBroker:
         """
         return self.borrow_repository.get_borrow_record(user_uuid, book_uuid)
 
+    def list_user_borrow_records(self, user_uuid):
+        """
+        Fetch the borrow records of a user.
+        :param user_uuid:
+        :return:
+        """
+        return self.borrow_repository.list_user_borrow_records(user_uuid)
+
     def list_borrow_records(self):
         """
         Fetch all borrow_record.
         :return:
         """
         return self.borrow_repository.list_borrow_records()
+
+    def iter_borrow_records(self):
+        """
+        Lazily iterate over all borrow_record.
+        :return:
+        """
+        return self.borrow_repository.iter_borrow_records()
@@ -0,0 +1,102 @@
+"""
+Event buffer for batched publishing
+"""
+import atexit
+import logging
+import threading
+from itertools import groupby
+
+from celery.signals import task_postrun
+from django.conf import settings
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from library_managemet.celery import app
+
+LOG = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    """
+    Process-wide buffer of committed events, in the order they were committed.
+    Events are flushed at the end of each request and Celery task, once the buffer holds
+    EVENT_BATCH_SIZE events, and by a timer EVENT_BATCH_MAX_DELAY seconds after the first
+    buffered event, so processes serving no requests, such as management commands, never hold
+    events until they exit. A flush sends consecutive events of the same topic as one batch,
+    so the worker applies events in commit order across topics too. Events a flush failed to send,
+    e.g. while the broker is down, stay buffered for the next one.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.timer = None
+        # Guards the buffer; the send lock keeps concurrent flushes from sending out of order
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+
+    def add(self, topic, event):
+        """
+        Buffer an event, flushing if the size threshold is reached.
+        :param topic: Event topic.
+        :param event: Event payload.
+        """
+        with self.lock:
+            self.events.append((topic, event))
+            size = len(self.events)
+            self._schedule()
+        if size >= settings.EVENT_BATCH_SIZE:
+            self.flush()
+
+    def _schedule(self):
+        """
+        Start the timer flushing the buffer EVENT_BATCH_MAX_DELAY seconds from now, unless one is running.
+        Called with the lock held.
+        """
+        if self.timer is None and self.events:
+            self.timer = threading.Timer(settings.EVENT_BATCH_MAX_DELAY, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """
+        Send every buffered event, one batch task per run of consecutive events of the same topic,
+        split in batches of EVENT_BATCH_SIZE events.
+        Flushes run after the response is returned, so a failure to send is logged rather than raised,
+        and the events not sent are put back in the buffer, to be sent by the next flush.
+        """
+        with self.send_lock:
+            with self.lock:
+                events, self.events = self.events, []
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            sent = 0
+            try:
+                for topic, run in groupby(events, key=lambda item: item[0]):
+                    run = [event for _, event in run]
+                    for start in range(0, len(run), settings.EVENT_BATCH_SIZE):
+                        chunk = run[start:start + settings.EVENT_BATCH_SIZE]
+                        app.send_task('library.tasks.process_events', args=[topic, chunk])
+                        sent += len(chunk)
+                        LOG.info(f"library.tasks.process_events with: {topic}, {len(chunk)} events")
+            except Exception as e:
+                LOG.error(f"Sending events failed, {len(events) - sent} events kept buffered: {e!r}")
+                with self.lock:
+                    # Ahead of the events buffered in the meantime, so the commit order holds
+                    self.events[:0] = events[sent:]
+                    self._schedule()
+
+
+BUFFER = EventBuffer()
+
+
+@receiver(request_finished)
+def flush_events(**kwargs):
+    """
+    Flush the events buffered while handling a request.
+    """
+    BUFFER.flush()
+
+
+task_postrun.connect(flush_events, weak=False)
+atexit.register(flush_events)
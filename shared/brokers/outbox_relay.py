@@ -0,0 +1,43 @@
+"""
+Outbox relay
+"""
+import logging
+
+from django.conf import settings
+
+from infrastructure.repositories.outbox_repository import OutboxRepository
+from library_managemet.celery import app
+
+LOG = logging.getLogger(__name__)
+
+
+def send_batch(topic, events):
+    """
+    Send a run of events of one topic to the worker as a single batch task.
+    :param topic: Event topic.
+    :param events: Event payloads, in publish order.
+    """
+    app.send_task('library.tasks.process_events', args=[topic, events])
+    LOG.info(f"library.tasks.process_events with: {topic}, {len(events)} events")
+
+
+def relay_outbox(databases=None, max_batches=None):
+    """
+    Drain the outbox of each database in batches of EVENT_BATCH_SIZE events, until it is empty
+    or max_batches batches were sent, so one run never holds up the next scheduled one for long.
+    :param databases: Database identifiers, defaults to all databases.
+    :param max_batches: Maximum number of batches per database, defaults to OUTBOX_RELAY_MAX_BATCHES.
+    :return: Dictionary of the number of events relayed for each database.
+    """
+    databases = databases or list(settings.DATABASES)
+    max_batches = max_batches or settings.OUTBOX_RELAY_MAX_BATCHES
+    repository = OutboxRepository(databases=databases)
+    relayed = {}
+    for db in databases:
+        relayed[db] = 0
+        for _ in range(max_batches):
+            count = repository.drain(db, settings.EVENT_BATCH_SIZE, send_batch)
+            relayed[db] += count
+            if count < settings.EVENT_BATCH_SIZE:
+                break
+    return relayed
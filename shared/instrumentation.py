@@ -0,0 +1,207 @@
+"""
+Per-request instrumentation
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+LOG = logging.getLogger(__name__)
+
+# Timings of the sampled request being served, None outside of one
+_CURRENT = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Queries and SQL time per database alias, and time spent in named spans, for one request.
+    Fanned out operations record from pool threads, hence the lock.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = {}
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def add_query(self, alias, seconds):
+        """
+        Record a query.
+        :param alias: Database alias it ran on.
+        :param seconds: Time it took.
+        """
+        with self.lock:
+            count, total = self.queries.get(alias, (0, 0.0))
+            self.queries[alias] = (count + 1, total + seconds)
+
+    def add_span(self, name, seconds):
+        """
+        Record time spent in a span; spans entered several times add up.
+        :param name: Span name, e.g. 'serialize'.
+        :param seconds: Time spent.
+        """
+        with self.lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def merge(self, other):
+        """
+        Add the queries and spans of other timings, collected in a nested block.
+        :param other: RequestTimings.
+        """
+        for alias, (count, seconds) in other.queries.items():
+            with self.lock:
+                total_count, total_seconds = self.queries.get(alias, (0, 0.0))
+                self.queries[alias] = (total_count + count, total_seconds + seconds)
+        for name, seconds in other.spans.items():
+            self.add_span(name, seconds)
+
+    def summary(self):
+        """
+        The timings in milliseconds.
+        :return dict:
+        """
+        return {
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'db': {
+                alias: {'queries': count, 'ms': round(seconds * 1000, 3)}
+                for alias, (count, seconds) in self.queries.items()
+            },
+            'spans': {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()},
+        }
+
+
+def server_timing(summary):
+    """
+    Format request timings as a Server-Timing header value.
+    :param summary: RequestTimings.summary().
+    :return str:
+    """
+    metrics = [f'db-{alias};dur={db["ms"]};desc="{db["queries"]} queries"' for alias, db in summary['db'].items()]
+    metrics += [f'{name};dur={ms}' for name, ms in summary['spans'].items()]
+    metrics.append(f'total;dur={summary["total_ms"]}')
+    return ', '.join(metrics)
+
+
+@contextmanager
+def collect():
+    """
+    Collect the query and span timings of a block, such as a request or a run of events applied by the worker.
+    Timings of a block nested in another are added to the outer ones as well.
+    :return: RequestTimings filled while the block runs.
+    """
+    parent = _CURRENT.get()
+    timings = RequestTimings()
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        _CURRENT.reset(token)
+        if parent is not None:
+            parent.merge(timings)
+
+
+@contextmanager
+def timed(name):
+    """
+    Time a block as a span of the current request; does nothing when the request is not sampled.
+    :param name: Span name, e.g. 'serialize' or 'publish'.
+    """
+    timings = _CURRENT.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_span(name, time.perf_counter() - start)
+
+
+def _query_timer(alias):
+    """
+    Build the execute wrapper timing the queries of a connection.
+    :param alias: Database alias of the connection.
+    :return: Execute wrapper.
+    """
+    def wrapper(execute, sql, params, many, context):
+        timings = _CURRENT.get()
+        if timings is None:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add_query(alias, time.perf_counter() - start)
+    wrapper.times_queries = True
+    return wrapper
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver adding the query timer to every new connection once.
+    Installed on the connection rather than around each request, so queries from any thread
+    the request context reaches, such as the fan-out pool, are counted.
+    """
+    if not any(getattr(wrapper, 'times_queries', False) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(_query_timer(connection.alias))
+
+
+class ServerTimingMiddleware:
+    """
+    Record queries and SQL time per database, serializer and event publish time for a sample of requests,
+    and report them in a Server-Timing header and a structured log line.
+    SERVER_TIMING_SAMPLE_RATE sets the share of requests sampled; the others only cost a random draw,
+    and a context variable lookup per query. Querysets first evaluated while serializing run their queries
+    inside the serialize span, and count in the database figures as well. Streamed bodies are produced after the response leaves the
+    middleware, so only the work done before is counted for them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        with collect() as timings:
+            response = self.get_response(request)
+        return self._report(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        with collect() as timings:
+            response = await self.get_response(request)
+        return self._report(request, response, timings)
+
+    @staticmethod
+    def _sampled():
+        """
+        Draw whether to instrument a request.
+        """
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def _report(request, response, timings):
+        """
+        Add the Server-Timing header and log the timings.
+        """
+        summary = timings.summary()
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(summary)
+        LOG.info(json.dumps({
+            'method': request.method, 'path': request.path, 'status': response.status_code, **summary
+        }))
+        return response
@@ -0,0 +1,56 @@
+"""
+Keyset pagination helpers
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from django.conf import settings
+
+
+@dataclass
+class Page:
+    """
+    A single page of results from a keyset query.
+    """
+    items: List[Any] = field(default_factory=list)
+    next_key: Optional[Any] = None
+
+
+def clamp_page_size(page_size=None) -> int:
+    """
+    Bound a requested page size to the configured limits.
+    :param page_size: Requested page size or None for the default.
+    :return int:
+    """
+    if page_size is None:
+        return settings.CATALOGUE_PAGE_SIZE
+    return max(1, min(int(page_size), settings.CATALOGUE_MAX_PAGE_SIZE))
+
+
+def encode_cursor(key) -> Optional[str]:
+    """
+    Encode the last key of a page into an opaque cursor token.
+    :param key: JSON serializable key, or None when there are no more pages.
+    :return: Cursor token or None.
+    """
+    if key is None:
+        return None
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str):
+    """
+    Decode an opaque cursor token back into the key it was built from.
+    :param token: Cursor token.
+    :return: The decoded key.
+    :raises ValueError: If the token is malformed.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor.")